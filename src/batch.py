@@ -0,0 +1,492 @@
+"""
+Batched Checkers games on NumPy arrays
+
+BatchGame plays many independent games at once. The boards are one
+(number of boards) x width x width int8 array, and the moves of every board
+are found and played with array operations instead of one Python call per
+piece, which is what makes it quick enough for balance testing with
+thousands of random games.
+
+The rules are the same as Game's: captures are not forced, a piece that
+jumps has to keep jumping while it can (kings follow Game's rules about
+landing on squares they have already jumped from), pieces are crowned on the
+last row, a team that can't move loses, and a game where neither team can
+move or no piece has been jumped for 40 moves is a draw. Jump sequences
+are found for every board at once too, one jump at a time, following the
+same rules as bitboard.py's man_trails and king_trails.
+
+Squares hold 0 if they are empty, otherwise piece_kind of the piece plus 1
+(the same values as MailboxBoard.cells).
+
+Examples:
+    1) Make 1000 games on a regular 8x8 board and play one random move in
+       each:
+        batch = BatchGame(3, 1000)
+        batch.apply_moves(*batch.random_moves())
+    2) Get the moves every board's side to move can make:
+        steps, captures = batch.legal_masks()
+    3) Play 10000 random games and count the wins:
+        batch.play_random(10000)
+"""
+import numpy as np
+
+from bitboard import geometry
+from checkers import BORDER, DIRECTIONS, MAN_DIRECTIONS, piece_kind
+
+# Values of the squares of a board
+EMPTY = 0
+RED_MAN = piece_kind("Red", False) + 1
+RED_KING = piece_kind("Red", True) + 1
+BLACK_MAN = piece_kind("Black", False) + 1
+BLACK_KING = piece_kind("Black", True) + 1
+
+# Value of the squares around a board when it is padded to look at
+# neighbours; never empty and never a piece
+OFF_BOARD = -1
+
+# Teams by the index used in BatchGame's arrays (black_to_move, winner and
+# the columns of since)
+TEAMS = ("Red", "Black")
+
+# A game is a draw once a team has made this many moves without jumping
+DRAW_MOVES = 40
+
+
+class BatchGame:
+    """
+    Class for playing many games of Checkers at once
+    """
+    def __init__(self, n=3, num_boards=1024, seed=None):
+        """
+        Constructor for the BatchGame class. Every board starts in the
+        starting position.
+        Args:
+            n (int): number of rows of pieces; the board is 2n + 2 squares
+            wide
+            num_boards (int): number of games to play at once
+            seed (int): seed for the random moves, or None
+        """
+        # Width/length of the boards
+        self.width = (2 * n) + 2
+        # the number of rows of pieces per team
+        self._num_rows = n
+        # number of games played at once
+        self.num_boards = num_boards
+        # random numbers for picking moves
+        self.rng = np.random.default_rng(seed)
+        # square (row * width + col) next to each square in each of the
+        # DIRECTIONS, the square jumped over and the one landed on in each
+        # of them, or -1 off the board (from bitboard.py's lookup tables)
+        geo = geometry(self.width)
+        self._step_to = np.array(geo.steps, np.intp)
+        self._jump_over = np.array([[jump[0] if jump else -1 for jump in jumps]
+                                    for jumps in geo.jumps], np.intp)
+        self._jump_land = np.array([[jump[1] if jump else -1 for jump in jumps]
+                                    for jumps in geo.jumps], np.intp)
+        # whether the men of each team (by index in TEAMS) move in each of
+        # the DIRECTIONS
+        self._man_dirs = np.array([[d in MAN_DIRECTIONS[team]
+                                    for d in range(len(DIRECTIONS))]
+                                   for team in TEAMS])
+        # change in the flat square index (row * width + col) for one step in
+        # each of the DIRECTIONS
+        self._offsets = np.array([dr * self.width + dc
+                                  for dr, dc in DIRECTIONS])
+
+        # the starting position
+        self._start = np.zeros((self.width, self.width), np.int8)
+        for row in range(self.width):
+            for col in range(self.width):
+                if (row + col) % 2 == 1:
+                    if row < n:
+                        self._start[row, col] = BLACK_MAN
+                    elif row >= self.width - n:
+                        self._start[row, col] = RED_MAN
+
+        # the boards, one square per int8
+        self.boards = np.empty((num_boards, self.width, self.width), np.int8)
+        # whether Black (rather than Red) moves next on each board
+        self.black_to_move = np.empty(num_boards, bool)
+        # moves each team (column 0 Red, column 1 Black) has made since it
+        # last jumped a piece, on each board
+        self.since = np.empty((num_boards, 2), np.int16)
+        # index in TEAMS of the winner of each board, or -1
+        self.winner = np.empty(num_boards, np.int8)
+        # whether each board's game is a draw
+        self.draw = np.empty(num_boards, bool)
+        # whether each board's game is over
+        self.done = np.empty(num_boards, bool)
+        # legal_masks for the side to move, once they have been worked out
+        self._masks = None
+        # legal_masks of Black in the starting position, for boards that
+        # are started again
+        steps, captures = self._team_masks(self._start[None])
+        self._start_masks = (steps[1][0], captures[1][0])
+        self.reset()
+
+    def reset(self, which=None):
+        """
+        Starts new games
+        Args:
+            which: boolean array or index array of the boards to start again,
+            or None for all of them
+        Returns: None
+        """
+        if which is None:
+            which = slice(None)
+        self.boards[which] = self._start
+        self.black_to_move[which] = True
+        self.since[which] = 0
+        self.winner[which] = -1
+        self.draw[which] = False
+        self.done[which] = False
+        if self._masks is not None:
+            self._masks[0][which] = self._start_masks[0]
+            self._masks[1][which] = self._start_masks[1]
+
+    def legal_masks(self, black=None):
+        """
+        Finds the simple moves and jumps of every piece of one team on every
+        board. Only the first jump of a jump sequence is given.
+        Args:
+            black: boolean array with one entry per board, whether to look at
+            Black's pieces (True) or Red's; None for the side to move
+        Returns(tuple): (steps, captures), two boolean arrays of shape
+        (number of boards, 4, width, width). steps[b, d, row, col] is True if
+        the piece on (row, col) of board b can move one square in direction
+        DIRECTIONS[d], and captures[b, d, row, col] if it can jump in it.
+        """
+        to_move = black is None
+        if to_move:
+            if self._masks is not None:
+                return self._masks
+            black = self.black_to_move
+        steps, captures = self._team_masks(self.boards)
+        b = black[:, None, None, None]
+        masks = (np.where(b, steps[1], steps[0]),
+                 np.where(b, captures[1], captures[0]))
+        if to_move:
+            self._masks = masks
+        return masks
+
+    def _team_masks(self, boards):
+        """
+        Finds the legal_masks of both teams at once
+        Args:
+            boards: int8 array of shape (number of boards, width, width)
+        Returns(tuple): (steps, captures), each a pair of Red's and Black's
+        arrays, shaped like the ones legal_masks returns
+        """
+        width = self.width
+        # as uint8, OFF_BOARD is 255, so (square - RED_MAN) < 2 only holds
+        # for Red's pieces and (square - BLACK_MAN) < 2 for Black's
+        padded = np.pad(boards, ((0, 0), (BORDER, BORDER), (BORDER, BORDER)),
+                        constant_values=OFF_BOARD).view(np.uint8)
+        inner = padded[:, BORDER:BORDER + width, BORDER:BORDER + width]
+        red_kings = inner == RED_KING
+        red_pieces = red_kings | (inner == RED_MAN)
+        black_kings = inner == BLACK_KING
+        black_pieces = black_kings | (inner == BLACK_MAN)
+        shape = (len(boards), 4, width, width)
+        steps = (np.empty(shape, bool), np.empty(shape, bool))
+        captures = (np.empty(shape, bool), np.empty(shape, bool))
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            near = padded[:, BORDER + dr:BORDER + dr + width,
+                          BORDER + dc:BORDER + dc + width]
+            far = padded[:, BORDER + 2 * dr:BORDER + 2 * dr + width,
+                         BORDER + 2 * dc:BORDER + 2 * dc + width]
+            near_empty = near == EMPTY
+            far_empty = far == EMPTY
+            # men only move up the board (Red) or down it (Black)
+            red = red_pieces if dr == -1 else red_kings
+            black = black_pieces if dr == 1 else black_kings
+            np.logical_and(red, near_empty, out=steps[0][:, d])
+            np.logical_and(black, near_empty, out=steps[1][:, d])
+            np.logical_and(red & far_empty, (near - BLACK_MAN) < 2,
+                           out=captures[0][:, d])
+            np.logical_and(black & far_empty, (near - RED_MAN) < 2,
+                           out=captures[1][:, d])
+        return steps, captures
+
+    def random_moves(self):
+        """
+        Picks a random move on every board whose game isn't over, the way
+        RandomBot does: a random piece out of the ones that can move, then a
+        random one of the squares list_moves gives for it
+        Args: None
+        Returns(tuple): (origins, ends, captured) to give to apply_moves
+        """
+        steps, captures = self.legal_masks()
+        num_boards, width = self.num_boards, self.width
+        boards = np.arange(num_boards)
+        playing = ~self.done
+
+        movable = (steps | captures).any(axis=1).reshape(num_boards, -1)
+        pick = self.rng.random(movable.shape)
+        pick[~movable] = -1
+        origins = pick.argmax(axis=1)
+        rows, cols = np.divmod(origins, width)
+
+        # pieces that can't jump: a random one of their simple moves
+        piece_steps = steps[boards, :, rows, cols]
+        pick = self.rng.random(piece_steps.shape)
+        pick[~piece_steps] = -1
+        ends = origins + self._offsets[pick.argmax(axis=1)]
+
+        # pieces that can jump: a random one of their jump sequences' ends
+        # and simple moves
+        captured = np.zeros((num_boards, width * width), bool)
+        jumping = np.nonzero(playing &
+                             captures[boards, :, rows, cols].any(axis=1))[0]
+        if len(jumping):
+            ends[jumping], jumped = self._jump_moves(jumping, origins[jumping])
+            which, step = np.nonzero(jumped >= 0)
+            captured[jumping[which], jumped[which, step]] = True
+
+        origins[~playing] = -1
+        ends[~playing] = -1
+        return origins, ends, captured.reshape(num_boards, width, width)
+
+    def _pieces(self, which, origins):
+        """
+        Looks up the squares of some boards and the directions a piece on
+        each of them can move in
+        Args:
+            which: index array of the boards
+            origins: int array with the square (row * width + col) of the
+            piece on each of those boards
+        Returns(tuple): the boards' squares, as an int8 array of shape
+        (len(which), width * width), and a boolean array of shape
+        (len(which), 4) of whether each piece moves in each of the
+        DIRECTIONS
+        """
+        flat = self.boards.reshape(self.num_boards, -1)[which]
+        black = self.black_to_move[which]
+        is_king = flat[np.arange(len(which)), origins] == \
+            np.where(black, BLACK_KING, RED_KING)
+        return flat, self._man_dirs[black.astype(np.intp)] | is_king[:, None]
+
+    def _jump_trails(self, which, origins):
+        """
+        Finds every jump sequence of the pieces on some boards, following the
+        same rules as bitboard.py's man_trails and king_trails (and listing
+        them in the same order). The sequences of all the boards are grown
+        together, one jump at a time.
+        Args:
+            which: index array of the boards
+            origins: int array with the square (row * width + col) of the
+            piece on each of those boards
+        Returns(tuple): int arrays with, for each sequence, the index in
+        which of its board, the square it ends on and its number of jumps,
+        and an int array of shape (number of sequences, longest sequence) of
+        the squares of the pieces it jumps, padded with -1. They are sorted
+        by board.
+        """
+        num = len(which)
+        flat, allowed = self._pieces(which, origins)
+        empty = flat == EMPTY
+        opponent_man = np.where(self.black_to_move[which], RED_MAN,
+                                BLACK_MAN)[:, None]
+        opponents = (flat == opponent_man) | (flat == opponent_man + 1)
+
+        # sequences that may go on: their board, the square they are on, the
+        # square they jumped from to get there (-1 for none), the squares
+        # they have been on, the directions they jumped in and the squares
+        # they jumped over
+        board = np.arange(num)
+        sq = origins
+        prev = np.full(num, -1)
+        path = origins[:, None]
+        dirs = np.empty((num, 0), np.intp)
+        overs = np.empty((num, 0), np.intp)
+        # the finished sequences, as (board, end, dirs, overs) arrays
+        found = []
+        while len(board):
+            over = self._jump_over[sq]
+            land = self._jump_land[sq]
+            on = board[:, None]
+            jump = allowed[board] & (over >= 0) & opponents[on, over]
+            # a piece never lands on a square it has been on, except that a
+            # king may end its sequence on the square it started from (but
+            # not by jumping straight back to it)
+            go_on = jump & empty[on, land] & \
+                ~(land[:, :, None] == path[:, None, :]).any(axis=2)
+            back = jump & (land == origins[on]) & \
+                (prev != origins[board])[:, None]
+            if dirs.shape[1]:
+                stop = ~(go_on | back).any(axis=1)
+                found.append((board[stop], sq[stop], dirs[stop],
+                              overs[stop]))
+            i, d = np.nonzero(back)
+            found.append((board[i], land[i, d], np.column_stack([dirs[i], d]),
+                          np.column_stack([overs[i], over[i, d]])))
+            i, d = np.nonzero(go_on)
+            board, prev, sq = board[i], sq[i], land[i, d]
+            path = np.column_stack([path[i], sq])
+            dirs = np.column_stack([dirs[i], d])
+            overs = np.column_stack([overs[i], over[i, d]])
+
+        board, end, dirs, overs = zip(*found)
+        board = np.concatenate(board)
+        end = np.concatenate(end)
+        length = np.concatenate([np.full(len(part), part.shape[1])
+                                 for part in dirs])
+        dirs = _pad_columns(dirs)
+        overs = _pad_columns(overs)
+        # the order the recursive search finds them in is the order of their
+        # directions, first jump first (no sequence starts with another one)
+        order = np.lexsort(tuple(dirs[:, ::-1].T) + (board,))
+        return board[order], end[order], length[order], overs[order]
+
+    def _jump_moves(self, which, origins):
+        """
+        Picks random moves for pieces that can jump, out of the ends of
+        their jump sequences and their simple moves, like RandomBot
+        Args:
+            which: index array of the boards
+            origins: int array with the square (row * width + col) of the
+            piece on each of those boards
+        Returns(tuple): an int array of the squares the pieces end on, and an
+        int array of shape (len(which), longest sequence) of the squares of
+        the pieces they jump, padded with -1
+        """
+        num = len(which)
+        board, end, length, overs = self._jump_trails(which, origins)
+        num_trails = np.bincount(board, minlength=num)
+        first_trail = np.cumsum(num_trails) - num_trails
+
+        flat, allowed = self._pieces(which, origins)
+        step_to = self._step_to[origins]
+        can_step = allowed & (step_to >= 0) & \
+            (flat[np.arange(num)[:, None], step_to] == EMPTY)
+
+        # every sequence and simple move is as likely as the others
+        pick = (self.rng.random(num) *
+                (num_trails + can_step.sum(axis=1))).astype(np.intp)
+        jumps = pick < num_trails
+        ends = end[np.where(jumps, first_trail + pick, 0)]
+        nth_step = np.where(jumps, 0, pick - num_trails)
+        step = (np.cumsum(can_step, axis=1) > nth_step[:, None]).argmax(axis=1)
+        ends = np.where(jumps, ends, step_to[np.arange(num), step])
+
+        # like Game.move_piece, the longest sequence to the square is played
+        # (the first one found, if there are several)
+        i = np.nonzero(jumps[board] & (end == ends[board]))[0]
+        i = i[np.lexsort((i, -length[i], board[i]))]
+        first = np.ones(len(i), bool)
+        first[1:] = board[i][1:] != board[i][:-1]
+        i = i[first]
+        jumped = np.full((num, overs.shape[1]), -1, np.intp)
+        jumped[board[i]] = overs[i]
+        return ends, jumped
+
+    def apply_moves(self, origins, ends, captured=None):
+        """
+        Plays one move on each board: moves the pieces, removes the jumped
+        pieces, crowns pieces on the last row, updates the draw counters and
+        the side to move, and works out which games are over. The moves are
+        not checked.
+        Args:
+            origins: int array with the square (row * width + col) of the
+            piece to move on each board, or -1 to not move on that board
+            ends: int array with the square each piece moves to
+            captured: boolean array of shape (number of boards, width, width)
+            of the squares of jumped pieces, or None if there are none
+        Returns: None
+        """
+        num_boards = self.num_boards
+        flat = self.boards.reshape(num_boards, -1)
+        moving = np.nonzero(origins >= 0)[0]
+        pieces = flat[moving, origins[moving]]
+        flat[moving, origins[moving]] = EMPTY
+        if captured is None:
+            took = np.zeros(len(moving), bool)
+        else:
+            captured = captured.reshape(num_boards, -1)[moving]
+            took = captured.any(axis=1)
+            flat[moving] = np.where(captured, EMPTY, flat[moving])
+        flat[moving, ends[moving]] = pieces
+
+        first_row = self.boards[:, 0, :]
+        first_row[first_row == RED_MAN] = RED_KING
+        last_row = self.boards[:, -1, :]
+        last_row[last_row == BLACK_MAN] = BLACK_KING
+
+        team = self.black_to_move[moving].astype(np.intp)
+        self.since[moving, team] = np.where(took, 0,
+                                            self.since[moving, team] + 1)
+        self.black_to_move[moving] = ~self.black_to_move[moving]
+        self._update_status(moving)
+
+    def _update_status(self, which):
+        """
+        Works out which games are over after a move, and saves the moves of
+        the side to move for random_moves
+        Args:
+            which: index array of the boards that moved
+        Returns: None
+        """
+        num_boards = self.num_boards
+        steps, captures = self._team_masks(self.boards)
+        red_stuck, black_stuck = (
+            ~(steps[i].reshape(num_boards, -1).any(axis=1) |
+              captures[i].reshape(num_boards, -1).any(axis=1))
+            for i in range(2))
+        b = self.black_to_move[:, None, None, None]
+        self._masks = (np.where(b, steps[1], steps[0]),
+                       np.where(b, captures[1], captures[0]))
+
+        red_stuck = red_stuck[which]
+        black_stuck = black_stuck[which]
+        self.winner[which] = np.where(black_stuck, 0,
+                                      np.where(red_stuck, 1, -1))
+        self.draw[which] = (red_stuck & black_stuck) | \
+            (self.since[which].max(axis=1) >= DRAW_MOVES)
+        self.done[which] = (self.winner[which] >= 0) | self.draw[which]
+
+    def play_random(self, num_games):
+        """
+        Plays games between two RandomBots until num_games of them are over,
+        starting a new game on a board as soon as its game ends
+        Args:
+            num_games (int): number of games to play
+        Returns(dict): number of games won by each team ("Red" and "Black");
+        the rest were draws
+        """
+        wins = {team: 0 for team in TEAMS}
+        self.reset()
+        started = min(num_games, self.num_boards)
+        # boards that aren't needed are marked as over and never counted
+        self.done[started:] = True
+        finished = 0
+        while finished < num_games:
+            playing = ~self.done
+            self.apply_moves(*self.random_moves())
+            ended = np.nonzero(playing & self.done)[0]
+            for team, count in zip(TEAMS, np.bincount(
+                    self.winner[ended][self.winner[ended] >= 0],
+                    minlength=2)):
+                wins[team] += int(count)
+            finished += len(ended)
+            restart = ended[:num_games - started]
+            if len(restart):
+                self.reset(restart)
+                started += len(restart)
+        return wins
+
+
+def _pad_columns(parts):
+    """
+    Stacks 2-D int arrays with different numbers of columns, padding the
+    shorter rows with -1
+    Args:
+        parts: the arrays
+    Returns: one array with the rows of all of them
+    """
+    stacked = np.full((sum(len(part) for part in parts),
+                       max(part.shape[1] for part in parts)), -1, np.intp)
+    row = 0
+    for part in parts:
+        stacked[row:row + len(part), :part.shape[1]] = part
+        row += len(part)
+    return stacked
@@ -0,0 +1,1097 @@
+"""
+Bitboard engine for Checkers
+
+BitboardGame has the same public API as checkers.Game, but instead of walking
+the game's MailboxBoard it keeps each team's men and kings as Python int 
+bitmasks: bit (row * width + col) is set if that square holds such a piece.
+Moves and jumps are found with shifts, masks and per-square lookup tables.
+
+The game_board, red_pieces and black_pieces attributes inherited from Game are
+still there for the TUI and GUI. The moves actually played (move_piece,
+jump_piece) are played on them too, but only when one of them is next read,
+so games that only ever look at the bitmasks (like bot simulations) never
+pay for it; the Piece objects are the same ones as before those moves. The
+bitmasks are what every query reads. make_move and unmake_move, which are
+meant for looking ahead, only touch the bitmasks.
+
+Examples:
+    1) Make a new game on a regular 8x8 board:
+        game = BitboardGame(3)
+    2) Use it anywhere a Game is used:
+        game.all_team_moves("Black")
+        game.move_piece((2, 1), (3, 0), "Black")
+"""
+# DIRECTIONS is in the order Game looks at directions in, so move lists come
+# out in the same order as Game's
+from checkers import (DIRECTIONS, KING_DIRECTIONS, MAN_DIRECTIONS, Game, Move,
+                      UndoRecord, piece_kind)
+
+# Teams in the order their bitmasks come in (see BitboardGame._board_state)
+TEAMS = ("Red", "Black")
+
+
+class Geometry:
+    """
+    Masks and lookup tables for a board of a given width
+    """
+    def __init__(self, width):
+        """
+        Constructor for the Geometry class
+        Parameters:
+            width(int): width/length of the (square) board
+        """
+        self.width = width
+        self.size = width * width
+        # every square on the board
+        self.full = (1 << self.size) - 1
+        # (row, col) tuple of every square index
+        self.positions = [(sq // width, sq % width) for sq in range(self.size)]
+
+        # squares that pieces of each team get crowned on
+        self.promotion_rows = {
+            "Red": (1 << width) - 1,
+            "Black": ((1 << width) - 1) << (width * (width - 1)),
+        }
+
+        # offset of the neighbouring square in each direction, and the squares
+        # a piece has to be on for that neighbour to exist (not wrapping around
+        # the side of the board)
+        not_left = 0
+        not_right = 0
+        for sq in range(self.size):
+            if sq % width != 0:
+                not_left |= 1 << sq
+            if sq % width != width - 1:
+                not_right |= 1 << sq
+        self.offsets = tuple(dr * width + dc for dr, dc in DIRECTIONS)
+        self.source_masks = tuple(not_right if dc == 1 else not_left
+                                  for _, dc in DIRECTIONS)
+
+        # steps[sq][d]: square next to sq in direction d, or -1
+        # jumps[sq][d]: (square jumped over, landing square), or None
+        self.steps = []
+        self.jumps = []
+        for row, col in self.positions:
+            steps = []
+            jumps = []
+            for dr, dc in DIRECTIONS:
+                if 0 <= row + dr < width and 0 <= col + dc < width:
+                    steps.append((row + dr) * width + col + dc)
+                else:
+                    steps.append(-1)
+                if 0 <= row + 2 * dr < width and 0 <= col + 2 * dc < width:
+                    jumps.append(((row + dr) * width + col + dc,
+                                  (row + 2 * dr) * width + col + 2 * dc))
+                else:
+                    jumps.append(None)
+            self.steps.append(tuple(steps))
+            self.jumps.append(tuple(jumps))
+
+
+_GEOMETRIES = {}
+
+
+def geometry(width):
+    """
+    Returns the (shared) Geometry for a board width, building it on first use
+    Parameters:
+        width(int): width of the board
+    Returns(Geometry): the tables for that width
+    """
+    geo = _GEOMETRIES.get(width)
+    if geo is None:
+        geo = Geometry(width)
+        _GEOMETRIES[width] = geo
+    return geo
+
+
+def movers(geo, men, kings, opponents, empty, man_dirs):
+    """
+    Finds every piece that has at least one simple move or jump, for all of a
+    team's pieces at once
+    Parameters:
+        geo(Geometry): tables for the board
+        men(int): bitmask of the team's pieces that are not kings
+        kings(int): bitmask of the team's kings
+        opponents(int): bitmask of every piece of the other team
+        empty(int): bitmask of the empty squares
+        man_dirs(tuple): directions the team's men move in
+    Returns(int): bitmask of the pieces that can move
+    """
+    result = 0
+    for d in KING_DIRECTIONS:
+        pieces = kings | men if d in man_dirs else kings
+        if pieces:
+            offset = geo.offsets[d]
+            mask = geo.source_masks[d]
+            if offset > 0:
+                free = (empty >> offset) & mask
+                jumpable = ((opponents & free) >> offset) & mask
+            else:
+                free = (empty << -offset) & mask
+                jumpable = ((opponents & free) << -offset) & mask
+            result |= pieces & (free | jumpable)
+    return result
+
+
+def team_steps(geo, men, kings, opponents, empty, man_dirs):
+    """
+    Finds the simple moves and the jumps of all of a team's pieces at once
+    Parameters:
+        geo(Geometry): tables for the board
+        men(int): bitmask of the team's pieces that are not kings
+        kings(int): bitmask of the team's kings
+        opponents(int): bitmask of every piece of the other team
+        empty(int): bitmask of the empty squares
+        man_dirs(tuple): directions the team's men move in
+    Returns(tuple): list of the bitmask of the pieces that can make a simple
+    move in each direction of DIRECTIONS, and bitmask of the pieces that can
+    jump
+    """
+    steps = []
+    jumpers = 0
+    for d in KING_DIRECTIONS:
+        pieces = kings | men if d in man_dirs else kings
+        offset = geo.offsets[d]
+        mask = geo.source_masks[d]
+        if offset > 0:
+            free = (empty >> offset) & mask
+            jumpers |= pieces & ((opponents & free) >> offset) & mask
+        else:
+            free = (empty << -offset) & mask
+            jumpers |= pieces & ((opponents & free) << -offset) & mask
+        steps.append(pieces & free)
+    return steps, jumpers
+
+
+def square_moves(geo, sq, dirs, is_king, opponents, empty):
+    """
+    Lists every square the piece on sq can move to: the ends of its jump
+    sequences first, then its simple moves, in the same order as
+    Game.list_moves
+    Parameters:
+        geo(Geometry): tables for the board
+        sq(int): square the piece is on
+        dirs(tuple): directions the piece moves in
+        is_king(bool): whether the piece is a king
+        opponents(int): bitmask of the other team's pieces
+        empty(int): bitmask of the empty squares
+    Returns(list): list of square indexes
+    """
+    if is_king:
+        ends = [trail[-1] for trail in
+                king_trails(geo, sq, sq, -1, 0, opponents, empty)]
+    else:
+        ends = [trail[-1] for trail in
+                man_trails(geo, sq, dirs, opponents, empty)]
+    steps = geo.steps[sq]
+    for d in dirs:
+        target = steps[d]
+        if target >= 0 and empty >> target & 1:
+            ends.append(target)
+    return ends
+
+
+def man_trails(geo, sq, dirs, opponents, empty):
+    """
+    Lists every jump sequence a piece that is not a king can make from sq.
+    Like Game.jump_trail_piece, only sequences that cannot be continued are
+    returned, and jumped pieces stay on the board while looking.
+    Parameters:
+        geo(Geometry): tables for the board
+        sq(int): square the piece is on
+        dirs(tuple): directions the piece moves in
+        opponents(int): bitmask of the other team's pieces
+        empty(int): bitmask of the empty squares
+    Returns(list): list of lists of landing squares
+    """
+    trails = []
+    jumps = geo.jumps[sq]
+    for d in dirs:
+        jump = jumps[d]
+        if jump is not None:
+            over, land = jump
+            if opponents >> over & 1 and empty >> land & 1:
+                rest = man_trails(geo, land, dirs, opponents, empty)
+                if rest:
+                    for trail in rest:
+                        trails.append([land] + trail)
+                else:
+                    trails.append([land])
+    return trails
+
+
+def king_trails(geo, sq, origin, prev, visited, opponents, empty):
+    """
+    Lists every jump sequence a king can make from sq, following the same
+    rules as Game.jump_trail_king: a king may not land on a square it has
+    already passed through, and may end a sequence by landing back on the
+    square it started from (but not by jumping straight back to it).
+    Parameters:
+        geo(Geometry): tables for the board
+        sq(int): square the king is on
+        origin(int): square the king started from
+        prev(int): square the king jumped from to get to sq, or -1
+        visited(int): bitmask of the squares the king has jumped from
+        opponents(int): bitmask of the other team's pieces
+        empty(int): bitmask of the empty squares
+    Returns(list): list of lists of landing squares
+    """
+    trails = []
+    jumps = geo.jumps[sq]
+    for d in KING_DIRECTIONS:
+        jump = jumps[d]
+        if jump is not None and opponents >> jump[0] & 1:
+            land = jump[1]
+            if empty >> land & 1 and land != origin and not visited >> land & 1:
+                rest = king_trails(geo, land, origin, sq, visited | 1 << sq,
+                                   opponents, empty)
+                if rest:
+                    for trail in rest:
+                        trails.append([land] + trail)
+                else:
+                    trails.append([land])
+            elif land == origin and origin != prev:
+                trails.append([land])
+    return trails
+
+
+def piece_children(geo, bits, t, sq):
+    """
+    Goes through the positions the moves of one piece lead to, playing each
+    move the way Game.move_piece does (the longest jump sequence to a square,
+    and the first of those if there are several)
+    Parameters:
+        geo(Geometry): tables for the board
+        bits(list): bitmasks of the red men, red kings, black men and black
+        kings
+        t(int): index in TEAMS of the piece's team
+        sq(int): square the piece is on
+    Returns(generator): the square the piece ends on and a list of the four
+    bitmasks after the move, for each move
+    """
+    team = TEAMS[t]
+    men, kings = bits[2 * t], bits[2 * t + 1]
+    opponents = bits[2 - 2 * t] | bits[3 - 2 * t]
+    empty = geo.full ^ (men | kings | opponents)
+    bit = 1 << sq
+    is_king = kings & bit
+    if is_king:
+        dirs = KING_DIRECTIONS
+        trails = king_trails(geo, sq, sq, -1, 0, opponents, empty)
+    else:
+        dirs = MAN_DIRECTIONS[team]
+        trails = man_trails(geo, sq, dirs, opponents, empty)
+    best = {}
+    for trail in trails:
+        if len(trail) > len(best.get(trail[-1], ())):
+            best[trail[-1]] = trail
+    for d in dirs:
+        target = geo.steps[sq][d]
+        if target >= 0 and empty >> target & 1:
+            best[target] = []
+    promotion = geo.promotion_rows[team]
+    for end, trail in best.items():
+        removed = 0
+        prev = sq
+        for land in trail:
+            removed |= 1 << ((prev + land) // 2)
+            prev = land
+        end_bit = 1 << end
+        child = list(bits)
+        if is_king:
+            child[2 * t + 1] = (kings ^ bit) | end_bit
+        elif end_bit & promotion:
+            child[2 * t] = men ^ bit
+            child[2 * t + 1] = kings | end_bit
+        else:
+            child[2 * t] = (men ^ bit) | end_bit
+        child[2 - 2 * t] &= ~removed
+        child[3 - 2 * t] &= ~removed
+        yield end, child
+
+
+def children(geo, bits, t):
+    """
+    Goes through the positions a team's moves lead to, as piece_children 
+    plays them
+    Parameters:
+        geo(Geometry): tables for the board
+        bits(list): bitmasks of the red men, red kings, black men and black
+        kings
+        t(int): index in TEAMS of the team to move
+    Returns(generator): the square moved from, the square moved to and a
+    list of the four bitmasks after the move, for each move
+    """
+    men, kings = bits[2 * t], bits[2 * t + 1]
+    opponents = bits[2 - 2 * t] | bits[3 - 2 * t]
+    empty = geo.full ^ (men | kings | opponents)
+    can_move = movers(geo, men, kings, opponents, empty, 
+                      MAN_DIRECTIONS[TEAMS[t]])
+    while can_move:
+        bit = can_move & -can_move
+        can_move ^= bit
+        sq = bit.bit_length() - 1
+        for end, child in piece_children(geo, bits, t, sq):
+            yield sq, end, child
+
+
+class BitboardGame(Game):
+    """
+    Class for representing a game of Checkers, stored as bitmasks
+    """
+    def __init__(self, n=3):
+        """
+        Constructor for the BitboardGame class
+        Args:
+            n (int): number of rows of pieces; the board is 2n + 2 squares wide
+        """
+        # lookup tables shared by every game with this width
+        self._geo = geometry((2 * n) + 2)
+        # moves played with move_piece or jump_piece that game_board, 
+        # red_pieces and black_pieces haven't caught up with yet, as the
+        # arguments to _sync_pieces
+        self._unsynced = []
+        super().__init__(n)
+
+    @property
+    def game_board(self):
+        """
+        The board of Piece objects, brought up to date with the moves played
+        so far
+        """
+        if self._unsynced:
+            self._sync_views()
+        return self._game_board
+
+    @game_board.setter
+    def game_board(self, board):
+        self._game_board = board
+
+    def _load_pieces(self):
+        """
+        Brings the pieces of each team up to date with the moves played so
+        far, and fills them in from the board if restore left them to be
+        filled in later
+        Parameters: None
+        Returns: None
+        """
+        if self._unsynced:
+            self._sync_views()
+        super()._load_pieces()
+
+    def _sync_views(self):
+        """
+        Plays the moves that game_board, red_pieces and black_pieces haven't
+        caught up with yet on them
+        Parameters: None
+        Returns: None
+        """
+        unsynced, self._unsynced = self._unsynced, []
+        for change in unsynced:
+            self._sync_pieces(*change)
+
+    def _initialize_checkers(self):
+        """
+        Adds all the pieces to the board in starting positions and to the
+        respective team sets, and sets the bitmasks to match
+        Parameters: None
+        Returns: None
+        """
+        super()._initialize_checkers()
+        self._load_bits()
+
+    def _load_bits(self):
+        """
+        Rebuilds the bitmasks from the pieces on game_board
+        Parameters: None
+        Returns: None
+        """
+        self._red_men = 0
+        self._red_kings = 0
+        self._black_men = 0
+        self._black_kings = 0
+        for piece in self.red_pieces:
+            bit = 1 << (piece.y_pos * self.width + piece.x_pos)
+            if piece.is_king:
+                self._red_kings |= bit
+            else:
+                self._red_men |= bit
+        for piece in self.black_pieces:
+            bit = 1 << (piece.y_pos * self.width + piece.x_pos)
+            if piece.is_king:
+                self._black_kings |= bit
+            else:
+                self._black_men |= bit
+
+    def _board_state(self):
+        """
+        Returns the pieces on the board in the form stored in a Snapshot
+        Parameters: None
+        Returns(tuple): the red men, red kings, black men and black kings
+        bitmasks
+        """
+        return (self._red_men, self._red_kings, self._black_men,
+                self._black_kings)
+
+    def _board_from_cells(self, cells):
+        """
+        Turns a flat board into the form stored in a Snapshot
+        Parameters:
+            cells(bytes): one byte per square, as in 
+            MailboxBoard.to_cells
+        Returns(tuple): the red men, red kings, black men and black kings
+        bitmasks
+        """
+        bits = [0, 0, 0, 0]
+        for sq, code in enumerate(cells):
+            if code:
+                bits[code - 1] |= 1 << sq
+        return tuple(bits)
+
+    def to_cells(self):
+        """
+        Returns the pieces on the board as a flat board, read from the
+        bitmasks
+        Parameters: None
+        Returns(bytes): one byte per square, as in Game.to_cells
+        """
+        cells = bytearray(self.width * self.width)
+        for code, bits in enumerate(self._board_state(), 1):
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                cells[bit.bit_length() - 1] = code
+        return bytes(cells)
+
+    def _load_board(self, bits):
+        """
+        Replaces the pieces with the ones in bitmasks from _board_state, and
+        copies them to game_board's bytes; red_pieces and black_pieces are
+        made from those when they are next needed
+        Parameters:
+            bits(tuple): the four bitmasks
+        Returns: None
+        """
+        (self._red_men, self._red_kings, self._black_men,
+         self._black_kings) = bits
+        # a new list, since a clone starts out sharing this one
+        self._unsynced = []
+        super()._load_board(self.to_cells())
+
+    def _team_bits(self, team):
+        """
+        Returns the bitmasks needed to generate moves for a team
+        Parameters:
+            team(str): "Red" or "Black"
+        Returns(tuple): (men, kings, opponents, empty) bitmasks
+        """
+        occupied = (self._red_men | self._red_kings |
+                    self._black_men | self._black_kings)
+        empty = self._geo.full ^ occupied
+        if team == "Red":
+            return (self._red_men, self._red_kings,
+                    self._black_men | self._black_kings, empty)
+        return (self._black_men, self._black_kings,
+                self._red_men | self._red_kings, empty)
+
+    def _square_info(self, sq):
+        """
+        Finds out what is on a square
+        Parameters:
+            sq(int): the square index
+        Returns(tuple): (team, is_king), or (None, False) if it is empty
+        """
+        if self._red_men >> sq & 1:
+            return "Red", False
+        if self._black_men >> sq & 1:
+            return "Black", False
+        if self._red_kings >> sq & 1:
+            return "Red", True
+        if self._black_kings >> sq & 1:
+            return "Black", True
+        return None, False
+
+    def _trails(self, sq, team, is_king):
+        """
+        Lists every jump sequence the piece on sq can make
+        Parameters:
+            sq(int): the square index
+            team(str): team of the piece
+            is_king(bool): whether the piece is a king
+        Returns(list): list of lists of landing squares
+        """
+        _, _, opponents, empty = self._team_bits(team)
+        if is_king:
+            return king_trails(self._geo, sq, sq, -1, 0, opponents, empty)
+        return man_trails(self._geo, sq, MAN_DIRECTIONS[team], opponents, empty)
+
+    def _square_moves(self, sq, team, is_king):
+        """
+        Lists every square the piece on sq can move to, in the same order as
+        Game.list_moves
+        Parameters:
+            sq(int): the square index
+            team(str): team of the piece
+            is_king(bool): whether the piece is a king
+        Returns(list): list of square indexes
+        """
+        _, _, opponents, empty = self._team_bits(team)
+        dirs = KING_DIRECTIONS if is_king else MAN_DIRECTIONS[team]
+        return square_moves(self._geo, sq, dirs, is_king, opponents, empty)
+
+    def _has_moves(self, team):
+        """
+        Determines if any piece of a team can move
+        Parameters:
+            team(str): "Red" or "Black"
+        Returns(bool): whether the team has at least one move
+        """
+        men, kings, opponents, empty = self._team_bits(team)
+        return movers(self._geo, men, kings, opponents, empty,
+                      MAN_DIRECTIONS[team]) != 0
+
+    def _apply_bits(self, old_sq, new_sq, team, is_king, removed):
+        """
+        Plays a move on the bitmasks only. The move must be valid.
+        Parameters:
+            old_sq(int): square the piece starts on
+            new_sq(int): square the piece ends on
+            team(str): team of the piece
+            is_king(bool): whether the piece is a king
+            removed(int): bitmask of the squares of the jumped pieces
+        Returns(tuple): (bitmask of the men captured, bitmask of the kings
+        captured, whether the piece was crowned)
+        """
+        geo = self._geo
+        old_bit = 1 << old_sq
+        new_bit = 1 << new_sq
+        moved = old_bit | new_bit if old_sq != new_sq else 0
+        promoted = False
+        if team == "Red":
+            men_taken = self._black_men & removed
+            kings_taken = self._black_kings & removed
+            self._black_men ^= men_taken
+            self._black_kings ^= kings_taken
+            if is_king:
+                self._red_kings ^= moved
+            else:
+                self._red_men ^= moved
+                if new_bit & geo.promotion_rows["Red"]:
+                    self._red_men ^= new_bit
+                    self._red_kings |= new_bit
+                    promoted = True
+        else:
+            men_taken = self._red_men & removed
+            kings_taken = self._red_kings & removed
+            self._red_men ^= men_taken
+            self._red_kings ^= kings_taken
+            if is_king:
+                self._black_kings ^= moved
+            else:
+                self._black_men ^= moved
+                if new_bit & geo.promotion_rows["Black"]:
+                    self._black_men ^= new_bit
+                    self._black_kings |= new_bit
+                    promoted = True
+        return men_taken, kings_taken, promoted
+
+    def _sync_pieces(self, old_pos, new_pos, captured, promoted):
+        """
+        Brings game_board, red_pieces and black_pieces up to date after a move
+        was played on the bitmasks
+        Parameters:
+            old_pos(tup): original position of the piece
+            new_pos(tup): new position of the piece
+            captured(int): bitmask of the squares of the jumped pieces
+            promoted(bool): whether the piece was crowned
+        Returns: None
+        """
+        board = self.game_board
+        piece = board.get_piece(old_pos)
+        while captured:
+            bit = captured & -captured
+            captured ^= bit
+            pos = self._geo.positions[bit.bit_length() - 1]
+            victim = board.get_piece(pos)
+            if victim is not None:
+                self._remove_piece(pos, victim.team)
+        self._relocate_piece(old_pos, new_pos)
+        if promoted:
+            self._crown(piece, True)
+
+    def make_move(self, move):
+        """
+        Plays a move on the bitmasks and returns what is needed to take it back
+        with unmake_move. The move is not checked, so it must be one of the
+        moves given by list_moves. game_board, red_pieces and black_pieces are
+        not updated; use move_piece to play a move for real.
+        Parameters:
+            move: a Move, or an (old_pos, new_pos) pair of tuple(int, int)
+        Returns(UndoRecord): the record to give to unmake_move
+        """
+        if not isinstance(move, Move):
+            move = self._lookup_move(move[0], move[1])
+        width = self.width
+        old_pos, new_pos = move
+        old_sq = old_pos[0] * width + old_pos[1]
+        new_sq = new_pos[0] * width + new_pos[1]
+        removed = 0
+        for row, col in move.captured:
+            removed |= 1 << (row * width + col)
+        team, is_king = self._square_info(old_sq)
+        since_red = self.since_piece_removed_red
+        since_black = self.since_piece_removed_black
+        cache = self._save_cache()
+        position = (self._hash, self.side_to_move)
+        men_taken, kings_taken, promoted = self._apply_bits(
+            old_sq, new_sq, team, is_king, removed)
+        self._update_hash(old_sq, new_sq, team, is_king, men_taken,
+                          kings_taken, promoted)
+        self._bump_version()
+        if men_taken or kings_taken:
+            since = 0
+        elif team == "Red":
+            since = since_red + 1
+        else:
+            since = since_black + 1
+        if team == "Red":
+            self.since_piece_removed_red = since
+        else:
+            self.since_piece_removed_black = since
+        return UndoRecord(old_pos, new_pos, (team, is_king),
+                          (men_taken, kings_taken), promoted,
+                          since_red, since_black, cache, position)
+
+    def _update_hash(self, old_sq, new_sq, team, is_king, men_taken,
+                     kings_taken, promoted):
+        """
+        Updates position_hash and side_to_move after _apply_bits
+        Parameters:
+            old_sq(int): square the piece started on
+            new_sq(int): square the piece ended on
+            team(str): team of the piece
+            is_king(bool): whether the piece was a king before the move
+            men_taken(int): bitmask of the men that were captured
+            kings_taken(int): bitmask of the kings that were captured
+            promoted(bool): whether the piece was crowned
+        Returns: None
+        """
+        keys = self._zobrist
+        opponent = "Black" if team == "Red" else "Red"
+        h = self._hash ^ keys[4 * old_sq + piece_kind(team, is_king)] ^ \
+            keys[4 * new_sq + piece_kind(team, is_king or promoted)]
+        for taken, kind in ((men_taken, piece_kind(opponent, False)),
+                            (kings_taken, piece_kind(opponent, True))):
+            while taken:
+                bit = taken & -taken
+                taken ^= bit
+                h ^= keys[4 * (bit.bit_length() - 1) + kind]
+        if self.side_to_move == team:
+            self.side_to_move = opponent
+            h ^= keys[-1]
+        self._hash = h
+
+    def unmake_move(self, record):
+        """
+        Takes back a move played by make_move. Moves must be taken back in
+        the opposite order they were made in.
+        Parameters:
+            record(UndoRecord): the record returned by make_move
+        Returns: None
+        """
+        team, is_king = record.piece
+        men_taken, kings_taken = record.captured
+        old_bit = 1 << (record.old_pos[0] * self.width + record.old_pos[1])
+        new_bit = 1 << (record.new_pos[0] * self.width + record.new_pos[1])
+        moved = old_bit | new_bit if old_bit != new_bit else 0
+        if team == "Red":
+            self._black_men |= men_taken
+            self._black_kings |= kings_taken
+            if is_king:
+                self._red_kings ^= moved
+            elif record.promoted:
+                self._red_kings ^= new_bit
+                self._red_men |= old_bit
+            else:
+                self._red_men ^= moved
+        else:
+            self._red_men |= men_taken
+            self._red_kings |= kings_taken
+            if is_king:
+                self._black_kings ^= moved
+            elif record.promoted:
+                self._black_kings ^= new_bit
+                self._black_men |= old_bit
+            else:
+                self._black_men ^= moved
+        self.since_piece_removed_red = record.since_red
+        self.since_piece_removed_black = record.since_black
+        self._restore_cache(record.cache)
+        self._hash, self.side_to_move = record.position
+
+    def _play(self, move, keep_counters=False):
+        """
+        Plays a valid move on the bitmasks, and on the board views when they
+        are next read
+        Parameters:
+            move(Move): the move to play
+            keep_counters(bool): whether to leave the draw counters as they 
+            were
+        Returns: None
+        """
+        record = self.make_move(move)
+        if keep_counters:
+            self.since_piece_removed_red = record.since_red
+            self.since_piece_removed_black = record.since_black
+        self._unsynced.append((record.old_pos, record.new_pos, 
+                               record.captured[0] | record.captured[1],
+                               record.promoted))
+
+    def reset_game(self):
+        """
+        Resets the game, putting the pieces back to where they were initially
+        and refilling the red and black piece set
+        Parameters:None
+        Returns:None
+        """
+        # the board views are rebuilt, so the moves they haven't caught up
+        # with don't matter any more
+        self._unsynced = []
+        super().reset_game()
+
+    def make_king(self):
+        """
+        Turns every piece that reaches the last row of the opposite side and
+        isn't a king into a king
+        Parameters:None
+        Returns:None
+        """
+        rows = self._geo.promotion_rows
+        crowned_red = self._red_men & rows["Red"]
+        crowned_black = self._black_men & rows["Black"]
+        self._red_men ^= crowned_red
+        self._red_kings |= crowned_red
+        self._black_men ^= crowned_black
+        self._black_kings |= crowned_black
+        super().make_king()
+
+    def move_piece(self, old_pos, new_pos=None, team=None,
+                   checking_winner=False):
+        """
+        Moves the piece at the old position to the new position if the move is
+        valid, and notifies the player if invalid. Pieces that reach the end
+        of the board are crowned, and jumped pieces are removed.
+        Parameters:
+            old_pos: tuple(int, int), or a Move (then new_pos is left out)
+            new_pos: tuple(int, int)
+            team(str): team of piece being moved
+            checking_winner(bool): if the game is checking for a winner
+        Returns: None
+        """
+        if isinstance(old_pos, Move):
+            old_pos, new_pos = old_pos
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            self._play(move, keep_counters=checking_winner)
+        else:
+            print("invalid move")
+
+    def jump_piece(self, old_pos, new_pos, team):
+        """
+        Makes a piece jump from one spot to another, only under the condition
+        that it is a valid jump
+         Parameters:
+            old_pos(tup): the original positon
+            new_pos(tup): new position
+            team: team of the piece at the original position
+        Returns:None
+        """
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            self._play(move, keep_counters=True)
+
+    def _compute_hash(self):
+        """
+        Computes position_hash from scratch, from the bitmasks
+        Parameters: None
+        Returns(int): the hash
+        """
+        keys = self._zobrist
+        h = 0
+        for pieces, kind in ((self._red_men, 0), (self._red_kings, 1),
+                             (self._black_men, 2), (self._black_kings, 3)):
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                h ^= keys[4 * (bit.bit_length() - 1) + kind]
+        if self.side_to_move == "Red":
+            h ^= keys[-1]
+        return h
+
+    def _find_team_moves(self, team):
+        """
+        Generates the dictionary returned by all_team_moves. The simple moves
+        are found for all the pieces at once, a direction at a time, and jump
+        sequences are only followed for the pieces that can jump.
+        Args:
+            Team (TeamColor): the team to get moves for
+        Returns:
+            dict{tup(int, int): [tup(int, int)]} : dict mapping positions to
+            possible next positions for the piece at each position
+        """
+        geo = self._geo
+        positions = geo.positions
+        man_dirs = MAN_DIRECTIONS[team]
+        men, kings, opponents, empty = self._team_bits(team)
+        steps, jumpers = team_steps(geo, men, kings, opponents, empty,
+                                    man_dirs)
+        # a key for every piece that can move, in square order, with the
+        # ends of its jump sequences first (as in square_moves)
+        can_move = jumpers | steps[0] | steps[1] | steps[2] | steps[3]
+        team_moves = {}
+        while can_move:
+            bit = can_move & -can_move
+            can_move ^= bit
+            sq = bit.bit_length() - 1
+            if not jumpers & bit:
+                team_moves[positions[sq]] = []
+            elif kings & bit:
+                team_moves[positions[sq]] = [
+                    positions[trail[-1]] for trail in
+                    king_trails(geo, sq, sq, -1, 0, opponents, empty)]
+            else:
+                team_moves[positions[sq]] = [
+                    positions[trail[-1]] for trail in
+                    man_trails(geo, sq, man_dirs, opponents, empty)]
+        # then the simple moves, in the order of DIRECTIONS
+        for offset, pieces in zip(geo.offsets, steps):
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                sq = bit.bit_length() - 1
+                team_moves[positions[sq]].append(positions[sq + offset])
+        return team_moves
+
+    def _find_team_move_objects(self, team):
+        """
+        Generates the dictionary returned by all_team_moves with as_moves.
+        A piece whose moves all end on the next row has no jumps, so its
+        Moves are made straight from all_team_moves; only the pieces that
+        can jump go through list_moves for their jump sequences.
+        Args:
+            Team (TeamColor): the team to get moves for
+        Returns:
+            dict{tup(int, int): [Move]} : dict mapping positions to the Moves
+            of the piece at each position
+        """
+        team_moves = {}
+        for pos, ends in self.all_team_moves(team).items():
+            row = pos[0]
+            for end in ends:
+                if end[0] - row not in (1, -1):
+                    team_moves[pos] = self.list_moves(pos, as_moves=True)
+                    break
+            else:
+                team_moves[pos] = [Move(pos, (end,)) for end in ends]
+        return team_moves
+
+    def iter_team_moves(self, team):
+        """
+        Yields an (old_pos, new_pos) pair for every move a team can make, in
+        the same order as all_team_moves lists them, working out each piece's
+        moves only when the caller gets to them
+        Args:
+            Team (TeamColor): the team to get moves for
+        Returns(generator): the (old_pos, new_pos) pairs
+        """
+        men, kings, opponents, empty = self._team_bits(team)
+        can_move = movers(self._geo, men, kings, opponents, empty,
+                          MAN_DIRECTIONS[team])
+        positions = self._geo.positions
+        while can_move:
+            bit = can_move & -can_move
+            can_move ^= bit
+            pos = positions[bit.bit_length() - 1]
+            for new_pos in self.list_moves(pos):
+                yield (pos, new_pos)
+
+    def has_any_move(self, team):
+        """
+        Determines if a team can make at least one move, with one pass over
+        its bitmasks
+        Args:
+            Team (TeamColor): the team to check
+        Returns(bool): whether the team has a move
+        """
+        return self._has_moves(team)
+
+    def iter_moves(self, pos):
+        """
+        Yields the positions the piece at a position can go to, in the same
+        order as list_moves. A single piece's moves are quick to find on the
+        bitmasks, so they are found (and cached) all at once.
+        Parameters:
+            pos(tup): the position
+        Returns(generator): the positions
+        """
+        yield from self.list_moves(pos)
+
+    def can_move(self, pos):
+        """
+        Determines if the piece at position specified by pos has available
+        moves, without listing them
+        Args:
+            pos (tuple) - a tuple representing the position of the Piece
+        Return (bool) whether the piece at given position has available moves
+        """
+        sq = pos[0] * self.width + pos[1]
+        team, _ = self._square_info(sq)
+        if team is None:
+            return False
+        men, kings, opponents, empty = self._team_bits(team)
+        bit = 1 << sq
+        return movers(self._geo, men & bit, kings & bit, opponents, empty,
+                      MAN_DIRECTIONS[team]) != 0
+
+    def _find_moves(self, pos):
+        """
+        Generates what list_moves returns
+        Parameters:
+            pos(tup): the position
+        Returns(tuple): list of tuples of all the positions a piece can go to
+        (empty if there is no piece at pos), and list of the jump sequences
+        (tuples of landing positions) that the first positions are the ends of
+        """
+        sq = pos[0] * self.width + pos[1]
+        team, is_king = self._square_info(sq)
+        if team is None:
+            return [], []
+        positions = self._geo.positions
+        trails = [tuple([positions[land] for land in trail])
+                  for trail in self._trails(sq, team, is_king)]
+        _, _, _, empty = self._team_bits(team)
+        steps = self._geo.steps[sq]
+        ends = [trail[-1] for trail in trails]
+        for d in KING_DIRECTIONS if is_king else MAN_DIRECTIONS[team]:
+            target = steps[d]
+            if target >= 0 and empty >> target & 1:
+                ends.append(positions[target])
+        return ends, trails
+
+    def _lookup_move(self, old_pos, new_pos):
+        """
+        Finds the Move from one position to another. A jump sequence always
+        ends an even number of rows away, so a move to a neighbouring square
+        is a simple move, which is checked on the bitmasks without listing
+        the piece's moves.
+        Parameters:
+            old_pos(tup): position of the piece
+            new_pos(tup): position it would move to
+        Returns(Move or None): the move, or None if it is not a valid move
+        """
+        width = self.width
+        if abs(new_pos[0] - old_pos[0]) != 1 or \
+                not 0 <= old_pos[0] < width or not 0 <= old_pos[1] < width:
+            return super()._lookup_move(old_pos, new_pos)
+        old_sq = old_pos[0] * width + old_pos[1]
+        team, is_king = self._square_info(old_sq)
+        if team is None:
+            return None
+        _, _, _, empty = self._team_bits(team)
+        positions = self._geo.positions
+        steps = self._geo.steps[old_sq]
+        for d in KING_DIRECTIONS if is_king else MAN_DIRECTIONS[team]:
+            target = steps[d]
+            if target >= 0 and positions[target] == new_pos and \
+                    empty >> target & 1:
+                return Move(positions[old_sq], (positions[target],))
+        return None
+
+    def can_jump(self, pos, team, is_king):
+        """
+        Determines if a piece can jump at a position
+        Parameters:
+            pos(tup): position of the piece
+            team: team of piece
+            is_king(bool): whether to look at the jumps of a king
+        Returns(bool): If the piece can jump at that position
+        """
+        sq = pos[0] * self.width + pos[1]
+        spot_team, spot_is_king = self._square_info(sq)
+        if is_king and spot_team is not None and not spot_is_king:
+            return False
+        _, _, opponents, empty = self._team_bits(team)
+        dirs = KING_DIRECTIONS if is_king else MAN_DIRECTIONS[team]
+        jumps = self._geo.jumps[sq]
+        for d in dirs:
+            jump = jumps[d]
+            if jump is not None and opponents >> jump[0] & 1 and \
+            empty >> jump[1] & 1:
+                return True
+        return False
+
+    def jump_trail_piece(self, pos, team):
+        """
+        Returns a sequences representing all the possible ways a piece can jump
+            Parameters:
+            pos(tup): position of the piece
+            team: team of piece
+        Returns(list): A list of lists of all the sequences a piece can jump
+        through
+        """
+        _, _, opponents, empty = self._team_bits(team)
+        positions = self._geo.positions
+        return [[positions[sq] for sq in trail] for trail in
+                man_trails(self._geo, pos[0] * self.width + pos[1],
+                           MAN_DIRECTIONS[team], opponents, empty)]
+
+    def jump_trail_king(self, pos, original_pos, prev_pos, already_jumped, team):
+        """
+        Returns a sequences representing all the possible ways a king piece can
+        jump
+            Parameters:
+            pos(tup): position of the piece
+            original_pos(tup): position the king started from
+            prev_pos(tup): position the king jumped from to reach pos, or None
+            already_jumped(list): all the spots the king piece has already
+            jumped through
+            team: team of piece
+        Returns(list): A list of list of all the sequences a king piece
+        can jump throuogh
+        """
+        width = self.width
+        _, _, opponents, empty = self._team_bits(team)
+        visited = 0
+        for row, col in already_jumped:
+            visited |= 1 << (row * width + col)
+        prev = -1 if prev_pos is None else prev_pos[0] * width + prev_pos[1]
+        positions = self._geo.positions
+        return [[positions[sq] for sq in trail] for trail in
+                king_trails(self._geo, pos[0] * width + pos[1],
+                            original_pos[0] * width + original_pos[1], prev,
+                            visited, opponents, empty)]
+
+    def list_moves_piece(self, pos, team):
+        """
+        Lists all the moves a piece can make
+        Parameters:
+            pos(tup): The position of the piece
+            team(str): The team of the piece
+        Returns(lst): List of all locations a piece can go to
+        """
+        positions = self._geo.positions
+        return [positions[end] for end in
+                self._square_moves(pos[0] * self.width + pos[1], team, False)]
+
+    def list_moves_king(self, pos, team):
+        """
+        Lists all the moves a king can make
+        Parameters:
+            pos(tup): The position of the king
+            team(str): The team of the piece
+        Returns(lst): List of all locations a king can go to
+        """
+        positions = self._geo.positions
+        return [positions[end] for end in
+                self._square_moves(pos[0] * self.width + pos[1], team, True)]
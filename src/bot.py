@@ -17,12 +17,24 @@ https://www.thesprucecrafts.com/how-to-win-at-checkers-411170
 The order and implementation of these strategies is in the SmartBot class 
 docstring. 
 """
+import multiprocessing
+import os
 import random
+import time
 from typing import Union 
 
 import click
 from checkers import Board, Game, Piece
+from bitboard import BitboardGame
+from batch import BatchGame
 from mocks import CheckersGameBotMock
+import perft
+from records import FORMATS, GameRecord, RecordWriter
+from positiondb import PositionDBWriter
+from tablebase import Tablebase, build_tablebase
+from ordering import ORDERERS, MoveOrderer
+from mcts import DEFAULT_PLAYOUTS, DRAW_MOVES, MCTSBot
+from transposition import SharedTable
 
 #
 # BOTS
@@ -79,9 +91,12 @@ class SmartBot:
       center of the board (source #1). If there are multiple such moves, 
       choose one at random.
     - Otherwise, pick a move at random.
+    With a tablebase, positions that are in it are played perfectly instead,
+    when the bot is the side to move (the tablebase only knows the best 
+    move of the side to move).
     """
 
-    def __init__(self, game, color, opponent_color):
+    def __init__(self, game, color, opponent_color, tablebase=None):
         """
         Constructor
 
@@ -89,11 +104,13 @@ class SmartBot:
             game: initial game the bot will play on
             color: Bot's team color
             opponent_color: Opponent's color
+            tablebase: Tablebase to look endgames up in, or None
         """
 
         self._game = game
         self._color = color
         self._opponent_color = opponent_color
+        self._tablebase = tablebase
 
     def suggest_move(self, game): 
         """
@@ -102,12 +119,22 @@ class SmartBot:
         Args:
             game (Game): the game to play, updated with each move
 
-        Returns: tup(tup(int, int), tup(int, int)) -- suggested move
+        Returns: Move -- suggested move, which unpacks like 
+        tup(tup(int, int), tup(int, int))
         """
+        # endgames in the tablebase have a known best move for the side to 
+        # move
+        if self._tablebase is not None and game.side_to_move == self._color:
+            move = self._tablebase.best_move(game)
+            if move is not None:
+                return move
+
         # assumming that when there is at least one opportunity to jump, 
         # all_team_moves consists only of those jumping moves
         #move_dict = self._game.all_team_moves(self._color) # but self.color works?
-        move_dict = game.all_team_moves(self._color)
+        # Move objects already know their jumps, so scoring them doesn't 
+        # search for the jump sequence again
+        move_dict = game.all_team_moves(self._color, as_moves=True)
 
         # if there is just one move in the dictionary (ie if there is one 
         # key and that key just has one tuple in its list):
@@ -127,11 +154,11 @@ class SmartBot:
         # (returns if so), and adds all the moves that will become a king to
         # a new dict (king strategy by thesprucecrafts)
         for start_pos, list_moves in move_dict.items(): 
-            for end_pos in list_moves:
-                row, col = end_pos
+            for move in list_moves:
+                end_pos = move.end
                 
                 if game.is_winning_move(start_pos, end_pos, self._color, self._color): 
-                    return (start_pos, end_pos)
+                    return move
 
                 if game.is_winning_move(start_pos, end_pos, 
                                         self._color, self._opponent_color):
@@ -140,7 +167,7 @@ class SmartBot:
                 #if self._game.will_king(start_pos, end_pos, self._color): 
                 if game.will_king(start_pos, end_pos, self._color):
                     temp_lst = king_moves.get((start_pos), [])
-                    temp_lst.append(end_pos)
+                    temp_lst.append(move)
                     king_moves[start_pos] = temp_lst
 
         # if there is only one king move, take it
@@ -156,25 +183,22 @@ class SmartBot:
         # loops through the consider dict to find the moves with the most jumps
         # (jump strategy by HobbyLark)
         for start_pos, list_moves in consider.items():
-            for end_pos in list_moves:
+            for move in list_moves:
                 
                 # if the number of jumps is greater than the current max, 
                 # reset max_moves and the current max
                 
 
-                #if self._game.num_jumps(start_pos, end_pos, self._color) > max_jumps:
-                if game.num_jumps(start_pos, end_pos, self._color) > max_jumps:
-                    #max_jumps = self._game.num_jumps(start_pos, end_pos, self._color)
-                    max_jumps = game.num_jumps(start_pos, end_pos, self._color)
-                    max_moves = {start_pos : [end_pos]} # reset dict
+                if move.num_jumps > max_jumps:
+                    max_jumps = move.num_jumps
+                    max_moves = {start_pos : [move]} # reset dict
                 
                 # if the number of jumps is equal to the current max, add it
                 # to max_moves
                 
-                #elif self._game.num_jumps(start_pos, end_pos, self._color) == max_jumps:
-                elif game.num_jumps(start_pos, end_pos, self._color) == max_jumps:
+                elif move.num_jumps == max_jumps:
                     lst = max_moves.get((start_pos), [])
-                    lst.append(end_pos)
+                    lst.append(move)
                     max_moves[start_pos] = lst
                 # if the number of jumps is fewer than the max, don't consider
         
@@ -191,19 +215,19 @@ class SmartBot:
         # loops through consider2 dict to find moves towards the center 
         # (centermost strategy suggested by both HobbyLark and thesprucecrafts)
         for start_pos, list_moves in consider2.items():
-            for end_pos in list_moves:
-                row, col = end_pos
+            for move in list_moves:
+                row, col = move.end
                 
                 # if the distance from the center of the board is smaller 
                 # than the previous minimum, reset the minimum and the options
                 # dict
                 if abs(col - (center)) < dist_from_center:
                     dist_from_center = abs(col - (center))
-                    centermost = {start_pos : [end_pos]}
+                    centermost = {start_pos : [move]}
                 # if the distance is equal ot the minimum, add it to the
                 # options dict
                 elif abs(col - (center)) == dist_from_center:
-                    centermost.get(start_pos, []).append(end_pos)
+                    centermost.get(start_pos, []).append(move)
         
         # if there is only one centermost move, take it
         if self._one_move(centermost) is not None:
@@ -211,13 +235,11 @@ class SmartBot:
         elif centermost == {}: 
             # randomly pick from the max_jump move options 
             og_pos = random.choice(list(consider2))
-            end_pos = random.choice(consider2[og_pos])
-            return (og_pos, end_pos)
+            return random.choice(consider2[og_pos])
         else: 
             # if there is more than one centermost move, randomly pick 
             og_pos = random.choice(list(centermost))
-            end_pos = random.choice(centermost[og_pos])
-            return (og_pos, end_pos)
+            return random.choice(centermost[og_pos])
 
     def _one_move(self, dic): 
         """
@@ -225,21 +247,534 @@ class SmartBot:
         wise returns none. 
 
         Args: 
-            dic (dict{tup(int, int)} : [tup(int, int)]) - the given dictionary
+            dic (dict{tup(int, int)} : [Move]) - the given dictionary
         
         Returns: 
-            (tup((int, int), (int, int) or None) - the key and value if there
-            is only one key in the dictionary and one item in the list of that
-            key value, otherwise None
+            (Move or None) - the move if there is only one key in the 
+            dictionary and one item in the list of that key value, otherwise
+            None
         
         I found the syntax for this here: 
         https://stackoverflow.com/questions/46042430/best-way-to-get-a-single-
         key-from-a-dictionary 
         """
         if len(dic) == 1 and len(dic[next(iter(dic))]) == 1:
-            return (next(iter(dic)), dic[next(iter(dic))][0])
+            return dic[next(iter(dic))][0]
         return None
                 
+
+# Score of a piece for AlphaBetaBot's evaluation, and what each row a man has
+# moved towards the end of the board adds to it
+MAN_VALUE = 100
+KING_VALUE = 160
+ADVANCE_VALUE = 5
+
+# Score of a won game for AlphaBetaBot (more than any evaluation can add up
+# to); wins that come sooner score higher
+WIN_SCORE = 10 ** 9
+
+# AlphaBetaBot's evaluation tables for each board width (see _eval_tables)
+_EVAL_TABLES = {}
+
+# Size of the table a parallel AlphaBetaBot's workers share, in MB
+SEARCH_TABLE_MB = 16
+
+# What a score in the shared table is: the exact score, or a bound on it 
+# when the search of the position was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Random numbers mixed into a position's key in the shared table for the 
+# number of moves Red (first list) or Black (second list) has left before 
+# the 40-move draw (see _table_key)
+_draw_rng = random.Random(0xD8A3)
+DRAW_KEYS = tuple(tuple(_draw_rng.getrandbits(64) 
+                        for _ in range(DRAW_MOVES + 1)) for _ in range(2))
+
+
+def _eval_tables(width):
+    """
+    Returns AlphaBetaBot's evaluation of every kind of piece on every square
+    of a board of a given width, from Red's point of view
+
+    Args: 
+        width (int): width of the board
+
+    Returns: list -- for each square value of MailboxBoard.cells (0 to 4), 
+    a list of the score of that piece on each square (row * width + col)
+    """
+    tables = _EVAL_TABLES.get(width)
+    if tables is None:
+        rows = [sq // width for sq in range(width * width)]
+        tables = [[0] * (width * width),
+                  [MAN_VALUE + ADVANCE_VALUE * (width - 1 - row) 
+                   for row in rows],
+                  [KING_VALUE] * (width * width),
+                  [-(MAN_VALUE + ADVANCE_VALUE * row) for row in rows],
+                  [-KING_VALUE] * (width * width)]
+        _EVAL_TABLES[width] = tables
+    return tables
+
+
+def _table_entry(score, bound, ply):
+    """
+    Packs a score into a number for the shared table. Wins and losses are 
+    stored as the number of moves from the position rather than from the 
+    start of the search, so they are right wherever the position is found.
+
+    Args:
+        score (int): the score
+        bound (int): EXACT, LOWER or UPPER
+        ply (int): number of moves played since the search started
+
+    Returns: int -- the number to store
+    """
+    if score > WIN_SCORE // 2:
+        score += ply
+    elif score < -WIN_SCORE // 2:
+        score -= ply
+    return (score + WIN_SCORE + 1) << 2 | bound
+
+
+def _table_key(game, depth):
+    """
+    Returns the key a position's score is kept under in the shared table: 
+    its position_hash, plus the number of moves each team has left before 
+    the 40-move draw if that draw can come within the search, since the 
+    score then depends on it
+
+    Args:
+        game (Game): the game
+        depth (int): number of moves searched ahead from the position
+
+    Returns: int -- the key
+    """
+    key = game.position_hash
+    for keys, since in zip(DRAW_KEYS, (game.since_piece_removed_red, 
+                                       game.since_piece_removed_black)):
+        left = DRAW_MOVES - since
+        if left <= depth:
+            key ^= keys[max(left, 0)]
+    return key
+
+
+def _table_score(entry, ply):
+    """
+    Unpacks a number packed by _table_entry
+
+    Args:
+        entry (int): the stored number
+        ply (int): number of moves played since the search started
+
+    Returns: tup(int, int) -- the score and its bound
+    """
+    score = (entry >> 2) - WIN_SCORE - 1
+    if score > WIN_SCORE // 2:
+        score -= ply
+    elif score < -WIN_SCORE // 2:
+        score += ply
+    return score, entry & 3
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside AlphaBetaBot's search when its time is up
+    """
+
+
+class AlphaBetaBot:
+    """
+    Bot that searches a number of moves ahead with negamax and alpha-beta 
+    pruning, and scores the positions at the end of the search by material 
+    (kings are worth more than men) and how far each man has advanced. Moves 
+    are tried out with make_move and taken back with unmake_move, so the 
+    game is never copied. The bot always searches its own moves first: if 
+    the game says the other team is to move, the search starts with one of 
+    the bot's moves anyway and the other team replies to it. The game's own
+    status is used for wins and draws, including the 40-move rule, and
+    positions are scored the way simulate counts them: a game with a winner
+    is a win for it, even when it is also a draw. Moves are tried in the order given by an 
+    orderer (see ordering.py): by default jumps first, then crowning moves,
+    then killer moves, then the rest by their history score.
+    With a time limit, it searches with iterative deepening instead: one 
+    move ahead, then two, and so on until the time is up, and plays the best
+    move of the deepest search that finished.
+    With more than one worker, it searches in parallel (Lazy SMP): every 
+    worker process searches the whole tree with iterative deepening, each 
+    starting from a different first move, and they share what they find 
+    through a SharedTable of scores, so each one skips the positions the 
+    others have already searched as deep or deeper. A score is kept under 
+    the position and, when the 40-move draw can come within the search, the
+    draw counters too, so it is never reused where the draw would change 
+    it. The move of the worker that searched 
+    deepest is played (the first one to finish, at a fixed depth, after 
+    which the others are stopped).
+    """
+
+    # number of moves searched ahead if no depth is given
+    DEFAULT_DEPTH = 4
+
+    # deepest search when searching to a time limit
+    MAX_DEPTH = 64
+
+    # the clock is checked every this many positions
+    CLOCK_INTERVAL = 64
+
+    def __init__(self, game, color, opponent_color, depth=DEFAULT_DEPTH,
+                 time_limit_ms=None, orderer=None, workers=1):
+        """
+        Constructor
+
+        Args: 
+            game: initial game the bot will play on
+            color: Bot's team color
+            opponent_color: Opponent's color
+            depth: number of moves (of both teams) to search ahead
+            time_limit_ms: time to search for each move in milliseconds, or 
+            None to always search depth moves ahead
+            orderer: Orderer that sorts the moves before they are searched, 
+            or None for a MoveOrderer
+            workers: number of processes to search on (0 for one per CPU)
+        """
+        self._game = game
+        self._color = color
+        self._opponent_color = opponent_color
+        self._depth = depth
+        self._time_limit_ms = time_limit_ms
+        self._orderer = MoveOrderer() if orderer is None else orderer
+        self._workers = workers or os.cpu_count() or 1
+        # time.perf_counter() value the current search has to stop at, or 
+        # None
+        self._deadline = None
+        # the worker processes, started on the first search that uses them
+        self._pool = None
+        # scores shared by the worker processes (see _table_score), or None
+        # when searching on one process
+        self._table = None
+        # Event set to stop the worker processes' searches, or None
+        self._stop = None
+        # number of positions looked at by the last search
+        self.nodes = 0
+        # number of moves ahead the last search finished searching
+        self.depth_reached = 0
+
+    def suggest_move(self, game):
+        """
+        Suggests the move with the best score after searching ahead; the 
+        first one if several are as good
+
+        Args:
+            game (Game): the game to play, updated with each move
+
+        Returns: Move -- suggested move, which unpacks like 
+        tup(tup(int, int), tup(int, int))
+        """
+        if self._workers > 1:
+            return self._parallel_move(game)
+        self.nodes = 0
+        self._orderer.new_search()
+        moves = self._ordered_moves(game, 0, self._color)
+        if self._time_limit_ms is None:
+            self.depth_reached = self._depth
+            return self._search_root(game, moves, self._depth)[0]
+
+        self._deadline = time.perf_counter() + self._time_limit_ms / 1000
+        try:
+            return self._deepen(game, moves, self.MAX_DEPTH)
+        finally:
+            self._deadline = None
+
+    def _parallel_move(self, game):
+        """
+        Has every worker process search the game (see _worker_search) and
+        picks the move of the one that searched deepest
+
+        Args:
+            game (Game): the game to play
+
+        Returns: Move -- suggested move, as from suggest_move
+        """
+        if self._pool is None:
+            self._table = SharedTable.with_size_mb(SEARCH_TABLE_MB, 
+                                                   deeper=True)
+            self._stop = multiprocessing.Event()
+            self._pool = multiprocessing.Pool(
+                self._workers, initializer=_init_search_worker,
+                initargs=(self._color, self._opponent_color, self._depth, 
+                          self._time_limit_ms, self._orderer, self._table, 
+                          self._stop))
+        self._stop.clear()
+        position = (type(game), game._num_rows, game.snapshot())
+        results = []
+        for result in self._pool.imap_unordered(
+                _worker_search, [position + (k,) 
+                                 for k in range(self._workers)]):
+            # at a fixed depth, the first worker to finish has the answer
+            if self._time_limit_ms is None:
+                self._stop.set()
+            results.append(result)
+        self.nodes = sum(nodes for _, _, nodes in results)
+        # the first of the deepest
+        best, self.depth_reached, _ = max(results, key=lambda r: r[1])
+        return best
+
+    def worker_search(self, game, k):
+        """
+        Searches as worker k of a parallel search: with iterative deepening
+        to depth moves (or until the time is up), starting from the k-th 
+        first move, so that the workers begin with different parts of the 
+        tree
+
+        Args:
+            game (Game): the game to play
+            k (int): number of the worker, from 0
+
+        Returns: tup -- the Move found (or None if there are no moves), 
+        the number of moves searched ahead and the number of positions 
+        looked at
+        """
+        self.nodes = 0
+        self._orderer.new_search()
+        moves = self._ordered_moves(game, 0, self._color)
+        if moves:
+            k %= len(moves)
+            moves = moves[k:] + moves[:k]
+        if self._time_limit_ms is not None:
+            self._deadline = time.perf_counter() + self._time_limit_ms / 1000
+        try:
+            best = self._deepen(game, moves, self.MAX_DEPTH 
+                                if self._time_limit_ms else self._depth)
+        finally:
+            self._deadline = None
+        return best, self.depth_reached, self.nodes
+
+    def _deepen(self, game, moves, max_depth):
+        """
+        Searches with iterative deepening: one move ahead, then two, and so 
+        on up to max_depth, until the search is stopped
+
+        Args:
+            game (Game): the game
+            moves (list): the Moves of the side to move, in the order to 
+            search them; it is reordered
+            max_depth (int): the most moves to search ahead
+
+        Returns: Move -- the best move of the deepest search that finished
+        """
+        self.depth_reached = 0
+        # until a search finishes, the move that looks best without one
+        best = moves[0] if moves else None
+        try:
+            for depth in range(1, max_depth + 1):
+                if len(moves) <= 1:
+                    break
+                best, score = self._search_root(game, moves, depth)
+                self.depth_reached = depth
+                # the best move so far is searched first next time, which 
+                # makes the pruning work best
+                moves.remove(best)
+                moves.insert(0, best)
+                # once a win or loss is certain, searching deeper won't
+                # change it
+                if abs(score) >= WIN_SCORE - self.MAX_DEPTH:
+                    break
+        except SearchTimeout:
+            pass
+        return best
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared table, if there are
+        any. A bot that searches on more than one worker has to be closed
+        once it is no longer needed.
+
+        Returns: None
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._table.close()
+            self._table.unlink()
+            self._table = None
+
+    def _search_root(self, game, moves, depth):
+        """
+        Searches every one of the bot's moves to a given depth
+
+        Args:
+            game (Game): the game
+            moves (list): the Moves of the bot's team
+            depth (int): number of moves to search ahead
+
+        Returns: tup(Move, int) -- the best move (the first one if several 
+        are as good) and its score
+        """
+        best = None
+        alpha = -WIN_SCORE - 1
+        for move in moves:
+            record = game.make_move(move)
+            try:
+                score = -self._negamax(game, depth - 1, -WIN_SCORE - 1, 
+                                       -alpha, 1)
+            finally:
+                game.unmake_move(record)
+            if best is None or score > alpha:
+                best = move
+                alpha = score
+        return best, alpha
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """
+        Scores the current position for the side to move by searching ahead
+
+        Args:
+            game (Game): the game, in the position to score
+            depth (int): number of moves left to search
+            alpha (int): score the side to move is already sure of
+            beta (int): score the other team is already sure of; once this
+            is reached the other team won't let the game get here
+            ply (int): number of moves played since the search started
+
+        Returns: int -- the score
+        """
+        self.nodes += 1
+        if self.nodes % self.CLOCK_INTERVAL == 0 and (
+                self._deadline is not None and 
+                time.perf_counter() > self._deadline or 
+                self._stop is not None and self._stop.is_set()):
+            raise SearchTimeout()
+        status = game.status
+        if status.is_done:
+            # like simulate, a winner counts even if the game is also a draw
+            # (when neither team can move)
+            if status.winner is None:
+                return 0
+            if status.winner == game.side_to_move:
+                return WIN_SCORE - ply
+            return ply - WIN_SCORE
+        if depth <= 0:
+            return self.evaluate(game)
+        table = self._table
+        if table is not None:
+            key = _table_key(game, depth)
+            entry = table.probe(key, depth)
+            if entry is not None:
+                score, bound = _table_score(entry, ply)
+                if bound == EXACT or bound == LOWER and score >= beta or \
+                        bound == UPPER and score <= alpha:
+                    return score
+            alpha_before = alpha
+        best = -WIN_SCORE - 1
+        for move in self._ordered_moves(game, ply):
+            record = game.make_move(move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, 
+                                       ply + 1)
+            finally:
+                game.unmake_move(record)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self._orderer.cutoff(game, move, ply, depth)
+                        break
+        if table is not None:
+            if best <= alpha_before:
+                bound = UPPER
+            elif best >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, depth, _table_entry(best, bound, ply))
+        return best
+
+    def _ordered_moves(self, game, ply, team=None):
+        """
+        Lists the moves of a team, the ones most likely to be best first, as
+        sorted by the orderer
+
+        Args:
+            game (Game): the game
+            ply (int): number of moves played since the search started
+            team (str): the team, or None for the side to move
+
+        Returns: list -- the Moves
+        """
+        if team is None:
+            team = game.side_to_move
+        moves = [move for moves in game.all_team_moves(
+                     team, as_moves=True).values() 
+                 for move in moves]
+        return self._orderer.order(game, moves, ply)
+
+    def evaluate(self, game):
+        """
+        Scores a position for the side to move without searching: the 
+        difference between the teams' piece scores
+
+        Args:
+            game (Game): the game
+
+        Returns: int -- the score
+        """
+        tables = _eval_tables(game.width)
+        score = 0
+        for sq, code in enumerate(game.to_cells()):
+            if code:
+                score += tables[code][sq]
+        return score if game.side_to_move == "Red" else -score
+
+# The bot of a parallel AlphaBetaBot's worker process, and the games it has
+# searched on by their class and n
+_worker_bot = None
+_worker_games = {}
+
+
+def _init_search_worker(color, opponent_color, depth, time_limit_ms, orderer,
+                        table, stop):
+    """
+    Sets up a worker process of a parallel AlphaBetaBot
+
+    Args:
+        color (str): the bot's team color
+        opponent_color (str): the opponent's color
+        depth (int): number of moves to search ahead
+        time_limit_ms (int): time to search each move for, or None
+        orderer (Orderer): the bot's orderer; each worker orders its moves 
+        with its own copy
+        table (SharedTable): the table the workers share
+        stop (Event): set to stop the search
+
+    Returns: None
+    """
+    global _worker_bot
+    _worker_bot = AlphaBetaBot(None, color, opponent_color, depth, 
+                               time_limit_ms, orderer)
+    _worker_bot._table = table
+    _worker_bot._stop = stop
+
+
+def _worker_search(task):
+    """
+    Searches a position in a worker process (see AlphaBetaBot.worker_search)
+
+    Args:
+        task (tup): the class of the game, its n, the position as a 
+        Snapshot, and the worker's number
+
+    Returns: tup -- the result of worker_search
+    """
+    game_class, n, snapshot, k = task
+    game = _worker_games.get((game_class, n))
+    if game is None:
+        game = game_class(n)
+        _worker_games[(game_class, n)] = game
+    game.restore(snapshot)
+    return _worker_bot.worker_search(game, k)
+
 #
 # SIMULATION CODE
 #
@@ -250,7 +785,9 @@ class BotPlayer:
     """
 
     def __init__(self, name, game, color,
-                 opponent_color):
+                 opponent_color, tablebase=None, 
+                 depth=AlphaBetaBot.DEFAULT_DEPTH, time_limit_ms=None,
+                 playouts=DEFAULT_PLAYOUTS, workers=1):
         """
         Constructor
 
@@ -259,18 +796,43 @@ class BotPlayer:
             game: Game to play 
             color: Bot's color
             opponent_color: Opponent's color
+            tablebase: Tablebase for the smart bot to play endgames from, or
+            None
+            depth: number of moves the alpha-beta bot searches ahead
+            time_limit_ms: time the alpha-beta and MCTS bots search each 
+            move for, in milliseconds, or None to search to depth (or run 
+            playouts playouts)
+            playouts: number of playouts the MCTS bot runs per move (on each
+            worker)
+            workers: number of processes the alpha-beta and MCTS bots search
+            on (0 for one per CPU)
         """
         self.name = name
 
         if self.name == "random":
             self.bot = RandomBot(game, color, opponent_color)
         elif self.name == "smart":
-            self.bot = SmartBot(game, color, opponent_color)
+            self.bot = SmartBot(game, color, opponent_color, tablebase)
+        elif self.name == "alphabeta":
+            self.bot = AlphaBetaBot(game, color, opponent_color, depth, 
+                                    time_limit_ms, workers=workers)
+        elif self.name == "mcts":
+            self.bot = MCTSBot(game, color, opponent_color, playouts,
+                               time_limit_ms, workers)
         self.color = color
         self.wins = 0
+
+    def close(self):
+        """
+        Stops the bot's worker processes, if it has any
+
+        Returns: None
+        """
+        if isinstance(self.bot, (AlphaBetaBot, MCTSBot)):
+            self.bot.close()
     
 
-def simulate(game, n, bots):
+def simulate(game, n, bots, recorder=None):
     """
     Simulate multiple games between two bots
 
@@ -279,12 +841,25 @@ def simulate(game, n, bots):
         n: The number of matches to play
         bots: Dictionary mapping piece colors to BotPlayer objects
         (the bots that will face off in each match) 
+        recorder: RecordWriter to write each game's moves and result to as
+        it finishes, or None
     
     Returns: None
     """
+    # a BatchGame plays all of its games at once, with random moves
+    if isinstance(game, BatchGame):
+        if any(bot.name != "random" for bot in bots.values()):
+            raise ValueError("a BatchGame can only play random bots")
+        if recorder is not None:
+            raise ValueError("a BatchGame can't record its games")
+        for color, wins in game.play_random(n).items():
+            bots[color].wins += wins
+        return
+
     for _ in range(n):
         # Reset the game
         game.reset_game() 
+        moves = []
 
         # the starting player is Black
         current = bots["Black"] 
@@ -293,6 +868,8 @@ def simulate(game, n, bots):
             og_pos, new_pos = current.bot.suggest_move(game) 
             game.move_piece(og_pos, new_pos, current.color) 
             old_color = current.color
+            if recorder is not None:
+                moves.append((og_pos, new_pos))
 
             # update the player 
             if current.color == "Black": 
@@ -300,39 +877,115 @@ def simulate(game, n, bots):
             elif current.color == "Red":
                 current = bots["Black"]
             
-        if game.is_winner("Red"): 
-            bots["Red"].wins += 1
-        elif game.is_winner("Black"):
-            bots["Black"].wins += 1
+        status = game.status
+        if status.winner is not None: 
+            bots[status.winner].wins += 1
+        if recorder is not None:
+            recorder.write(GameRecord((game.width - 2) // 2, moves, 
+                                      status.winner, status.draw_reason))
+
+
+ENGINES = {"grid": Game, "bitboard": BitboardGame}
 
 
-@click.command(name="checkers-bot")
+@click.group(name="checkers-bot", invoke_without_command=True)
 @click.option("-n", "--num-games", type=click.INT, default=1000)
-@click.option("--player1", type=click.Choice(['random', 'smart'], 
-              case_sensitive=False), default='smart')
-@click.option("--player2", type=click.Choice(['random', 'smart'], 
-              case_sensitive=False), default='random')
+@click.option("--player1", type=click.Choice(['random', 'smart', 'alphabeta',
+              'mcts'], case_sensitive=False), default='smart')
+@click.option("--player2", type=click.Choice(['random', 'smart', 'alphabeta',
+              'mcts'], case_sensitive=False), default='random')
 @click.option("-s", "--board-size", type=click.INT, default=3)
+@click.option("--engine", type=click.Choice(['grid', 'bitboard'],
+              case_sensitive=False), default='grid')
+@click.option("--batch-size", type=click.INT, default=0)
+@click.option("--record", type=click.Path(dir_okay=False), default=None)
+@click.option("--record-format", type=click.Choice(FORMATS + ("db",), 
+              case_sensitive=False), default='jsonl')
+@click.option("--tablebase", type=click.Path(exists=True, dir_okay=False), 
+              default=None)
+@click.option("--search-depth", type=click.INT, 
+              default=AlphaBetaBot.DEFAULT_DEPTH)
+@click.option("--bot-time", type=click.INT, default=None)
+@click.option("--playouts", type=click.INT, default=DEFAULT_PLAYOUTS)
+@click.option("-w", "--workers", type=click.INT, default=1)
 
 
-def cmd(num_games, player1, player2, board_size):
+@click.pass_context
+def cmd(ctx, num_games, player1, player2, board_size, engine, batch_size,
+        record, record_format, tablebase, search_depth, bot_time, playouts,
+        workers):
     """
     Runs a simulation in the command line. 
 
     Args: 
         num_games (int): number of matches to play
-        player1 (str): type of bot (random or smart)
-        player2 (str): type of bot (random or smart)
+        player1 (str): type of bot (random, smart, alphabeta or mcts)
+        player2 (str): type of bot (random, smart, alphabeta or mcts)
         board_size (int): number of rows in the board
+        engine (str): game engine to use (grid or bitboard)
+        batch_size (int): number of games to play at once with NumPy (only
+        for two random bots), or 0 to play them one at a time with the engine
+        record (str): file to add each game's moves and result to, or None
+        record_format (str): format of the record file (jsonl, binary, or db
+        for a position database, see positiondb.py)
+        tablebase (str): tablebase file for smart bots to play endgames 
+        from (see tablebase.py), or None
+        search_depth (int): number of moves alphabeta bots search ahead
+        bot_time (int): milliseconds alphabeta and mcts bots search each
+        move for (alphabeta bots deepen the search until the time is up), or 
+        None to search to search_depth (or run playouts playouts)
+        playouts (int): number of playouts mcts bots run per move, on each
+        worker
+        workers (int): number of processes alphabeta and mcts bots search 
+        on (0 for one per CPU)
     """
-    game = Game(board_size)
+    # the options above are for the simulation, which only runs when no
+    # other command (like perft) is given
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if batch_size > 0:
+        if player1 != "random" or player2 != "random":
+            raise click.UsageError(
+                "--batch-size needs --player1 random and --player2 random")
+        if record is not None:
+            raise click.UsageError("--record can't be used with --batch-size")
+        game = BatchGame(board_size, batch_size)
+    else:
+        game = ENGINES[engine](board_size)
+
+    if tablebase is not None:
+        try:
+            tablebase = Tablebase(tablebase)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        if tablebase.n != board_size:
+            raise click.UsageError(f"the tablebase is for --board-size "
+                                   f"{tablebase.n}")
 
-    bot1 = BotPlayer(player1, game, "Black", "Red")
-    bot2 = BotPlayer(player2, game, "Red", "Black")
+    bot1 = BotPlayer(player1, game, "Black", "Red", tablebase, search_depth,
+                     bot_time, playouts, workers)
+    bot2 = BotPlayer(player2, game, "Red", "Black", tablebase, search_depth,
+                     bot_time, playouts, workers)
 
     bots = {"Black": bot1, "Red": bot2}
 
-    simulate(game, num_games, bots) 
+    try:
+        if record is None:
+            simulate(game, num_games, bots) 
+        elif record_format == "db":
+            try:
+                recorder = PositionDBWriter(record, board_size)
+            except ValueError as e:
+                raise click.UsageError(str(e))
+            with recorder:
+                simulate(game, num_games, bots, recorder)
+        else:
+            with RecordWriter(record, record_format) as recorder:
+                simulate(game, num_games, bots, recorder)
+    finally:
+        bot1.close()
+        bot2.close()
 
     bot1_wins = bots["Black"].wins 
     bot2_wins = bots["Red"].wins 
@@ -343,5 +996,175 @@ def cmd(num_games, player1, player2, board_size):
     print(f"Ties: {100 * ties / num_games:.2f}%")
 
 
+@cmd.command(name="perft")
+@click.option("-s", "--board-size", type=click.INT, default=None)
+@click.option("-d", "--depth", type=click.INT, default=None)
+@click.option("--divide", is_flag=True)
+@click.option("--engine", type=click.Choice(['grid', 'bitboard'],
+              case_sensitive=False), default='grid')
+@click.option("-w", "--workers", type=click.INT, default=1)
+@click.option("--table-mb", type=click.INT, default=perft.TABLE_MB)
+def perft_cmd(board_size, depth, divide, engine, workers, table_mb):
+    """
+    Counts move sequences (perft) and reports nodes per second. With 
+    --board-size, counts from the starting position for that number of rows
+    (to --depth moves, 4 by default). Otherwise checks every reference count 
+    in perft.py (up to --depth moves), and fails if any of them is wrong.
+    With more than one worker, the counting is split across processes that 
+    share a transposition table.
+
+    Args: 
+        board_size (int): number of rows of pieces, or None
+        depth (int): number of moves in each sequence
+        divide (bool): print the count for each first move
+        engine (str): game engine to use (grid or bitboard)
+        workers (int): number of processes (0 for one per CPU)
+        table_mb (int): size of the shared transposition table in MB
+    """
+    game_class = ENGINES[engine]
+    workers = workers or None
+    if board_size is not None:
+        depth = 4 if depth is None else depth
+        result, seconds = perft.timed_perft(game_class(board_size), depth, 
+                                            divide, workers, table_mb)
+        if divide:
+            for (og_pos, new_pos), count in result.items():
+                print(f"{og_pos} -> {new_pos}: {count}")
+            result = sum(result.values())
+        print(f"perft({depth}) = {result} in {seconds:.2f}s "
+              f"({result / max(seconds, 1e-9):,.0f} nodes/s)")
+        return
+
+    total_nodes = 0
+    total_seconds = 0
+    failed = 0
+    for name, d, expected, nodes, seconds in perft.check_reference(
+            game_class, depth, workers, table_mb):
+        status = "ok" if nodes == expected else f"FAILED (expected {expected})"
+        failed += nodes != expected
+        total_nodes += nodes
+        total_seconds += seconds
+        print(f"{name:<20} depth {d}: {nodes:>10} {status:<10} "
+              f"{seconds:7.2f}s {nodes / max(seconds, 1e-9):>12,.0f} nodes/s")
+    print(f"total: {total_nodes} nodes in {total_seconds:.2f}s "
+          f"({total_nodes / max(total_seconds, 1e-9):,.0f} nodes/s)")
+    if failed:
+        raise click.ClickException(f"{failed} perft count(s) were wrong")
+
+
+@cmd.command(name="tablebase")
+@click.option("-s", "--board-size", type=click.INT, default=2)
+@click.option("-k", "--max-pieces", type=click.INT, default=4)
+@click.option("-o", "--output", type=click.Path(dir_okay=False), 
+              required=True)
+def tablebase_cmd(board_size, max_pieces, output):
+    """
+    Builds an endgame tablebase: the result of perfect play from every 
+    position with up to --max-pieces pieces (see tablebase.py).
+
+    Args: 
+        board_size (int): number of rows of pieces
+        max_pieces (int): the most pieces a position can have
+        output (str): file to write the tablebase to
+    """
+    start = time.perf_counter()
+    tablebase = build_tablebase(board_size, max_pieces, output)
+    seconds = time.perf_counter() - start
+    counts = tablebase.counts()
+    print(f"{sum(counts.values())} positions in {seconds:.2f}s: "
+          f"{counts['win']} wins, {counts['loss']} losses and "
+          f"{counts['draw']} draws for the side to move")
+
+
+@cmd.command(name="ordering")
+@click.option("-d", "--depth", type=click.INT, default=6)
+@click.option("--engine", type=click.Choice(['grid', 'bitboard'],
+              case_sensitive=False), default='bitboard')
+def ordering_cmd(depth, engine):
+    """
+    Compares the move orderers in ordering.py: searches every reference 
+    position in perft.py to --depth moves with an alpha-beta bot using each
+    orderer, and reports how many positions each search looked at.
+
+    Args: 
+        depth (int): number of moves to search ahead
+        engine (str): game engine to use (grid or bitboard)
+    """
+    game_class = ENGINES[engine]
+    totals = dict.fromkeys(ORDERERS, 0)
+    print(f"{'position':<18}" + "".join(f"{name:>22}" for name in ORDERERS))
+    for name, (_, _, side, _) in perft.REFERENCE.items():
+        game = perft.reference_game(game_class, name)
+        other = "Red" if side == "Black" else "Black"
+        row = f"{name:<18}"
+        for orderer_name, orderer_class in ORDERERS.items():
+            bot = AlphaBetaBot(game, side, other, depth, 
+                               orderer=orderer_class())
+            start = time.perf_counter()
+            bot.suggest_move(game)
+            seconds = time.perf_counter() - start
+            totals[orderer_name] += bot.nodes
+            row += f"{bot.nodes:>12} ({seconds:6.2f}s)"
+        print(row)
+    print(f"{'total':<18}" + "".join(f"{nodes:>22}" 
+                                     for nodes in totals.values()))
+    baseline = max(totals["none"], 1)
+    for orderer_name, nodes in totals.items():
+        print(f"{orderer_name}: {100 * nodes / baseline:.1f}% of the "
+              f"positions searched without ordering")
+
+
+@cmd.command(name="search")
+@click.option("-d", "--depth", type=click.INT, default=6)
+@click.option("-w", "--workers", type=click.INT, default=0)
+@click.option("--engine", type=click.Choice(['grid', 'bitboard'],
+              case_sensitive=False), default='bitboard')
+def search_cmd(depth, workers, engine):
+    """
+    Times parallel search: searches every reference position in perft.py 
+    to --depth moves with an alpha-beta bot on 1, 2, 4, ... processes, up
+    to --workers, and reports the time each took and the speedup over one
+    process.
+
+    Args: 
+        depth (int): number of moves to search ahead
+        workers (int): the most processes to search on (0 for one per CPU)
+        engine (str): game engine to use (grid or bitboard)
+    """
+    game_class = ENGINES[engine]
+    workers = workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != workers:
+        counts.append(workers)
+    totals = dict.fromkeys(counts, 0)
+    print(f"{'position':<18}" + "".join(f"{f'{w} workers':>12}" 
+                                        for w in counts))
+    for name, (_, _, side, _) in perft.REFERENCE.items():
+        game = perft.reference_game(game_class, name)
+        other = "Red" if side == "Black" else "Black"
+        row = f"{name:<18}"
+        for count in counts:
+            bot = AlphaBetaBot(game, side, other, depth, workers=count)
+            try:
+                if count > 1:
+                    # start the processes before timing
+                    bot.suggest_move(game_class(1))
+                start = time.perf_counter()
+                bot.suggest_move(game)
+                seconds = time.perf_counter() - start
+            finally:
+                bot.close()
+            totals[count] += seconds
+            row += f"{seconds:>11.2f}s"
+        print(row)
+    print(f"{'total':<18}" + "".join(f"{seconds:>11.2f}s" 
+                                     for seconds in totals.values()))
+    for count, seconds in totals.items():
+        print(f"{count} workers: {totals[1] / max(seconds, 1e-9):.2f}x "
+              f"as fast as 1")
+
+
 if __name__ == "__main__": 
     cmd()
\ No newline at end of file
@@ -14,7 +14,160 @@ Examples:
         board.all_team_moves(team)
     5) How to check whether there is a winner and, if so, who the winner is:
         board.is_winner(team)
+    6) How to try a move out and take it back again:
+        record = game.make_move(((2, 1), (3, 0)))
+        game.unmake_move(record)
+    7) How to get a number that identifies the current position:
+        game.position_hash
+    8) How to see if the game is over, who won, or why it is a draw:
+        game.status
+    9) How to get moves that know which pieces they jump, and play one:
+        move = game.list_moves((2, 1), as_moves=True)[0]
+        game.move_piece(move)
+    10) How to save a position and go back to it, or make a separate copy:
+        saved = game.snapshot()
+        game.restore(saved)
+        branch = game.clone()
+    11) How to count the positions reachable in a number of moves:
+        game.perft(4)
+    12) How to read a square of the flat board that move generation uses:
+        game.game_board.cells[game.game_board.square((2, 1))]
+    13) How to check for moves without listing all of them:
+        game.has_any_move("Red")
+        first = next(game.iter_team_moves("Red"), None)
+    14) How to save a position in a few bytes or as text, and load it again:
+        data = game.to_bytes()
+        game = Game.from_bytes(data)
+        text = game.to_fen()    # like "B:R21,22,K30:B1,2,K5:C0,3"
+        game = Game.from_fen(text, 3)
 """
+import copy
+import random
+import struct
+from collections.abc import Set
+from typing import NamedTuple, Optional, Tuple
+
+#Zobrist keys for each board width, made the first time they are needed
+_ZOBRIST_KEYS = {}
+
+def zobrist_keys(width):
+    """
+    Returns the random 64-bit numbers used to hash positions on a board of a 
+    given width. There is one for every (square, team, king) combination, at
+    index 4 * (row * width + col) + piece_kind(team, is_king), and a last one
+    that is mixed in when Red is the side to move. The generator is seeded 
+    with the width, so every process gets the same numbers.
+    Parameters:
+        width(int): width of the board
+    Returns(list): list of 4 * width * width + 1 ints
+    """
+    keys = _ZOBRIST_KEYS.get(width)
+    if keys is None:
+        rng = random.Random(width)
+        keys = [rng.getrandbits(64) for _ in range(4 * width * width + 1)]
+        _ZOBRIST_KEYS[width] = keys
+    return keys
+
+def piece_kind(team, is_king):
+    """
+    Numbers the four kinds of pieces from 0 to 3, for indexing zobrist_keys
+    Parameters:
+        team(str): "Red" or "Black"
+        is_king(bool): whether the piece is a king
+    Returns(int): 0 for red men, 1 for red kings, 2 for black men and 3 for 
+    black kings
+    """
+    if team == "Red":
+        return 1 if is_king else 0
+    return 3 if is_king else 2
+
+# Start of Game.to_bytes: n, flags (bit 0 set when Red is to move), 
+# since_piece_removed_red and since_piece_removed_black
+POSITION_HEADER = struct.Struct("<HBHH")
+
+# Flag in POSITION_HEADER for Red being the side to move
+RED_TO_MOVE = 1
+
+# Letters used for the teams in Game.to_fen
+FEN_TEAMS = {"Red": "R", "Black": "B"}
+
+# bytes.translate tables for Game.to_bytes and Game.load_bytes: from square
+# values to "1" where the value is a given code and "0" elsewhere, and from
+# "0"/"1" to a byte of 0 or the code
+_KIND_BITS = {code: bytes(ord("1") if value == code else ord("0")
+                          for value in range(256))
+              for code in range(1, 5)}
+_KIND_CODES = {code: bytes.maketrans(b"01", bytes((0, code)))
+               for code in range(1, 5)}
+
+def dark_cells(cells, width):
+    """
+    Picks the dark squares out of a flat board. Dark square i (counting from
+    0, left to right and top to bottom) is square number i + 1 in Game.to_fen.
+    Parameters:
+        cells(bytes): one byte per square (row * width + col)
+        width(int): width of the board
+    Returns(bytes): one byte per dark square
+    """
+    return b"".join(cells[row * width + (row + 1) % 2:(row + 1) * width:2]
+                    for row in range(width))
+
+def cells_from_dark(dark, width):
+    """
+    Turns the dark squares from dark_cells back into a flat board
+    Parameters:
+        dark(bytes): one byte per dark square
+        width(int): width of the board
+    Returns(bytearray): one byte per square, 0 on the light squares
+    """
+    cells = bytearray(width * width)
+    half = width // 2
+    for row in range(width):
+        cells[row * width + (row + 1) % 2:(row + 1) * width:2] = \
+            dark[row * half:(row + 1) * half]
+    return cells
+
+# The four diagonal directions as (row step, col step), in the order moves
+# are looked for in (row - 1 before row + 1, col + 1 before col - 1)
+DIRECTIONS = ((-1, 1), (-1, -1), (1, 1), (1, -1))
+
+# Indexes into DIRECTIONS that go up (-1) or down (1) a row
+ROW_DIRECTIONS = {-1: (0, 1), 1: (2, 3)}
+
+# Indexes into DIRECTIONS that a piece that is not a king can move in
+MAN_DIRECTIONS = {"Red": ROW_DIRECTIONS[-1], "Black": ROW_DIRECTIONS[1]}
+KING_DIRECTIONS = (0, 1, 2, 3)
+
+# Width of the border of off-board squares around a MailboxBoard; two squares,
+# so a jump from any square lands inside the array
+BORDER = 2
+
+# Value of the border squares of a MailboxBoard
+OFF_BOARD = 0xFF
+
+# Values of a MailboxBoard square (piece_kind plus 1) holding a piece that can
+# be jumped by each team
+OPPONENT_CODES = {"Red": (3, 4), "Black": (1, 2)}
+
+#MoveTables for each board shape, made the first time they are needed
+_MOVE_TABLES = {}
+
+def move_tables(num_rows, num_columns):
+    """
+    Returns the (shared) MoveTables for a board shape, building them on 
+    first use
+    Parameters:
+        num_rows(int): number of rows of the board
+        num_columns(int): number of columns of the board
+    Returns(MoveTables): the tables
+    """
+    shape = (num_rows, num_columns)
+    tables = _MOVE_TABLES.get(shape)
+    if tables is None:
+        tables = MoveTables(num_rows, num_columns)
+        _MOVE_TABLES[shape] = tables
+    return tables
+
 class Board:
     """Class for representing an empty board of any size"""
     def __init__(self, n=3, a=3):
@@ -86,6 +239,209 @@ class Board:
         """
         self.board[pos[0]][pos[1]] = None
 
+class MoveTables:
+    """
+    Lookup tables for the squares of a MailboxBoard of one shape: which 
+    squares are next to each square and which ones a piece can jump over and
+    land on, for each group of directions pieces move in. Only squares on the
+    board are listed, so move generation doesn't have to work out positions
+    or check bounds.
+    """
+    def __init__(self, num_rows, num_columns):
+        """
+        Constructor for the MoveTables class
+        Parameters:
+            num_rows(int): number of rows of the board
+            num_columns(int): number of columns of the board
+        """
+        #number of rows of the board
+        self.num_rows = num_rows
+        #number of columns of the board
+        self.num_columns = num_columns
+        #distance in a MailboxBoard's cells from a square to the one below it
+        self.stride = num_columns + 2 * BORDER
+        #index in cells of (0, 0)
+        self.first = BORDER * self.stride + BORDER
+        #cells of an empty board: 0 on the board, OFF_BOARD on the border
+        cells = bytearray([OFF_BOARD]) * (self.stride * 
+                                          (num_rows + 2 * BORDER))
+        #(row, col) tuple of each square of cells, or None on the border
+        self.positions = [None] * len(cells)
+        for row in range(num_rows):
+            start = self.first + row * self.stride
+            cells[start:start + num_columns] = bytes(num_columns)
+            for col in range(num_columns):
+                self.positions[start + col] = (row, col)
+        self.empty_cells = bytes(cells)
+        #offset to the next square in each of the DIRECTIONS
+        self.offsets = tuple(dr * self.stride + dc for dr, dc in DIRECTIONS)
+
+        #steps[dirs][sq]: squares next to sq, in the directions with indexes
+        #dirs (a value of ROW_DIRECTIONS or KING_DIRECTIONS)
+        #jumps[dirs][sq]: (square jumped over, landing square) pairs from sq
+        self.steps = {}
+        self.jumps = {}
+        for dirs in (ROW_DIRECTIONS[-1], ROW_DIRECTIONS[1], KING_DIRECTIONS):
+            steps = [()] * len(cells)
+            jumps = [()] * len(cells)
+            for sq, pos in enumerate(self.positions):
+                if pos is None:
+                    continue
+                steps[sq] = tuple(sq + self.offsets[d] for d in dirs 
+                                  if cells[sq + self.offsets[d]] == 0)
+                jumps[sq] = tuple((sq + self.offsets[d], 
+                                   sq + 2 * self.offsets[d]) for d in dirs 
+                                  if cells[sq + 2 * self.offsets[d]] == 0)
+            self.steps[dirs] = steps
+            self.jumps[dirs] = jumps
+
+class MailboxBoard(Board):
+    """
+    Board stored as one bytearray with a border of OFF_BOARD squares around
+    it (a "mailbox" board). Each square is one byte: 0 if it is empty, 
+    otherwise piece_kind of the piece on it plus 1. Because of the border,
+    the squares next to and two away from any square can be read by adding a
+    fixed offset, without checking that they are on the board.
+
+    board is a list-of-lists view of it, and get_piece, add_piece and 
+    remove_piece work as they do for Board. After load_cells, the Piece
+    objects are only made when one of them is first asked for, so loading a
+    board costs no more than copying its bytes.
+    """
+    def _create_board(self):
+        """
+        Initializes an empty board: the bytearray with its border filled in
+        and the dictionary of pieces
+        Args: None
+        Returns(BoardRows): the list-of-lists view of the board
+        """
+        #lookup tables shared by every board of this shape
+        self.tables = move_tables(self._num_rows, self._num_columns)
+        #distance in the bytearray from a square to the one below it
+        self.stride = self.tables.stride
+        #one byte per square, at square(pos); see the class docstring
+        self.cells = bytearray(self.tables.empty_cells)
+        #(row, col) tuple of each square of cells, or None on the border
+        self.positions = self.tables.positions
+        #offset to the next square in each of the DIRECTIONS
+        self.offsets = self.tables.offsets
+        #the pieces on the board, by position, or None until they are made
+        #from cells after load_cells (see _piece_map)
+        self._pieces = {}
+        return BoardRows(self)
+
+    def _piece_map(self):
+        """
+        Returns the pieces on the board by position, first making them from
+        cells if load_cells left them to be made later
+        Parameters: None
+        Returns(dict): Piece of each position that has one
+        """
+        pieces = self._pieces
+        if pieces is None:
+            pieces = {}
+            positions = self.positions
+            for sq, code in enumerate(self.cells):
+                if code and code != OFF_BOARD:
+                    kind = code - 1
+                    pos = positions[sq]
+                    pieces[pos] = Piece(pos, "Red" if kind < 2 else "Black",
+                                        kind % 2 == 1)
+            self._pieces = pieces
+        return pieces
+
+    def square(self, pos):
+        """
+        Returns the index in cells of a position
+        Parameters:
+            pos(tup): the position (row, col)
+        Returns(int): the index
+        """
+        return (pos[0] + BORDER) * self.stride + pos[1] + BORDER
+
+    def add_piece(self, piece):
+        """
+        Adds a piece to the board, or updates the square of a piece that is 
+        already on it (after it was made a king)
+        Parameters (Piece): Piece being added
+        Returns: None
+        """
+        pos = (piece.y_pos, piece.x_pos)
+        self._piece_map()[pos] = piece
+        self.cells[self.square(pos)] = piece_kind(piece.team, 
+                                                  piece.is_king) + 1
+
+    def get_piece(self, pos):
+        """
+        Returns the piece specified at the position.
+        Parameters(tup): Position of the Piece
+        Returns: None if there is not piece at the position or the piece at the
+        position
+        """
+        return self._piece_map().get((int(pos[0]), int(pos[1])))
+
+    def remove_piece(self, pos):
+        """
+        Removes the piece at a position, if there is one
+        Parameters(pos): Position of the piece being removed
+        Returns: None
+        """
+        if self._piece_map().pop(pos, None) is not None:
+            self.cells[self.square(pos)] = 0
+
+    def move_piece(self, old_pos, new_pos):
+        """
+        Moves the piece at one position to another, which must be empty. The
+        piece's own position is not changed.
+        Parameters:
+            old_pos(tup): position of the piece
+            new_pos(tup): position to move it to
+        Returns: None
+        """
+        cells = self.cells
+        old_sq = self.square(old_pos)
+        cells[self.square(new_pos)] = cells[old_sq]
+        cells[old_sq] = 0
+        pieces = self._piece_map()
+        pieces[new_pos] = pieces.pop(old_pos)
+
+    def clear(self):
+        """
+        Removes every piece from the board
+        Parameters: None
+        Returns: None
+        """
+        self.cells[:] = self.tables.empty_cells
+        self._pieces = {}
+
+    def load_cells(self, cells):
+        """
+        Replaces the pieces on the board with the ones in a flat board. Only
+        the bytes are copied; the Piece objects are made when they are first
+        asked for.
+        Parameters:
+            cells(bytes): one byte per square, as given by to_cells
+        Returns: None
+        """
+        width = self._num_columns
+        start = self.tables.first
+        for row in range(self._num_rows):
+            sq = start + row * self.stride
+            self.cells[sq:sq + width] = cells[row * width:(row + 1) * width]
+        self._pieces = None
+
+    def to_cells(self):
+        """
+        Returns the board without its border: one byte per square at 
+        row * number of columns + col, with the same values as cells
+        Parameters: None
+        Returns(bytes): the squares
+        """
+        start = self.tables.first
+        return b"".join(self.cells[row:row + self._num_columns] for row in 
+                        range(start, start + self._num_rows * self.stride, 
+                              self.stride))
+
 class Game:
     """
     Class for representing a board game; in this case, Checkers
@@ -103,22 +459,33 @@ class Game:
         # Color on board determined by even/odd position of x and y
         # n: number of rows of pieces; board length and width is calculated 
         # as 2n + 2
-        # Set containing all Piece and King objects for the red team
-        self.red_pieces = set()
-        # Set containining all Piece and King objects for the black team
-        self.black_pieces = set()
+        # Piece and King objects of each team, by position (see _pieces)
+        self._team_pieces = {"Red": {}, "Black": {}}
+        # Whether _team_pieces matches the board; restore leaves it to be
+        # filled in when it is next needed
+        self._pieces_loaded = True
+        # Read-only set views of the pieces of each team (see red_pieces and
+        # black_pieces)
+        self._red_view = PieceSet(self._team_pieces["Red"])
+        self._black_view = PieceSet(self._team_pieces["Black"])
         # Width/length of the board; the board is a square
         self.width = (2 * n) + 2
         
         # the number of rows of pieces per team
         self._num_rows = n
-        # Runs the create board function, creating a list of lists (grid) with
-        # None objects at each position in the grid
-        self.game_board = Board(n,n)
+        # The board, stored as one bytearray that move generation reads (see
+        # MailboxBoard); game_board.board still gives the Piece objects as a 
+        # list of lists
+        self.game_board = MailboxBoard(n,n)
 
         #Starts the game of checkers and places all pieces
         self._initialize_checkers()
        
+        #what is known about whether the game is over, for the version it was
+        #worked out for: [version, GameStatus or None, {team: whether it is
+        #stuck}], or None when it has to be worked out again
+        self._status = None
+
         #Contains the winner of the game. It is none while there is no winner,
         #and when there is one it is either "Red" or "Black"
         self.winner = None
@@ -134,6 +501,34 @@ class Game:
 
         #indicates if black wants to draw
         self.black_wants_to_draw = False
+
+        #counts the changes made to the board so far. Anything computed from
+        #the board (like the cached moves below) is only valid for the version
+        #it was computed for
+        self._version = 0
+
+        #the highest version number handed out so far
+        self._last_version = 0
+
+        #version of the board that the cached moves belong to
+        self._cache_version = 0
+
+        #all_team_moves results for the current version, by team
+        self._team_moves_cache = {}
+
+        #list_moves results for the current version, by position: a list
+        #holding the positions, the jump sequences and (once asked for) the
+        #Move objects
+        self._moves_cache = {}
+
+        #the team whose turn it is; Black always moves first
+        self.side_to_move = "Black"
+
+        #random numbers used to keep position_hash up to date
+        self._zobrist = zobrist_keys(self.width)
+
+        #Zobrist hash of the pieces on the board and the side to move
+        self._hash = self._compute_hash()
   
     def __str__(self):
         """
@@ -151,6 +546,142 @@ class Game:
             s += "\n"    
         return s
 
+    @property
+    def red_pieces(self):
+        """
+        Read-only set of all Piece and King objects for the red team
+        """
+        self._load_pieces()
+        return self._red_view
+
+    @property
+    def black_pieces(self):
+        """
+        Read-only set of all Piece and King objects for the black team
+        """
+        self._load_pieces()
+        return self._black_view
+
+    @property
+    def _pieces(self):
+        """
+        Piece and King objects of each team, by position, filled in from the
+        board first if restore left them to be filled in later
+        """
+        self._load_pieces()
+        return self._team_pieces
+
+    def _load_pieces(self):
+        """
+        Fills in the pieces of each team from the board, if restore left them
+        to be filled in later
+        Parameters: None
+        Returns: None
+        """
+        if not self._pieces_loaded:
+            for pos, piece in self.game_board._piece_map().items():
+                self._team_pieces[piece.team][pos] = piece
+            self._pieces_loaded = True
+
+    @property
+    def winner(self):
+        """
+        The team that has won by the other resigning, or None
+        """
+        return self._winner
+
+    @winner.setter
+    def winner(self, team):
+        self._winner = team
+        self._status = None
+
+    @property
+    def status(self):
+        """
+        Whether the game is over and why, as a GameStatus. It is only worked
+        out again after the board, the draw offers or the winner change, so 
+        checking it between moves costs O(1) time.
+        """
+        entry = self._status_entry()
+        if entry[1] is None:
+            red_wins = self._team_stuck("Black")
+            black_wins = self._team_stuck("Red")
+            if self._winner is not None:
+                winner = self._winner
+            elif red_wins:
+                winner = "Red"
+            elif black_wins:
+                winner = "Black"
+            else:
+                winner = None
+            since = max(self.since_piece_removed_red, 
+                        self.since_piece_removed_black)
+            if red_wins and black_wins:
+                draw_reason = "no moves"
+            elif since >= 40:
+                draw_reason = "40 moves"
+            elif self.red_wants_to_draw and self.black_wants_to_draw:
+                draw_reason = "agreed"
+            else:
+                draw_reason = None
+            entry[1] = GameStatus(winner, draw_reason, since)
+        return entry[1]
+
+    def _status_entry(self):
+        """
+        Returns what is known about the status of the current version, 
+        starting over if anything it depends on has changed
+        Parameters: None
+        Returns(list): [version, GameStatus or None, {team: is stuck}]
+        """
+        entry = self._status
+        if entry is None or entry[0] != self._version:
+            entry = [self._version, None, {}]
+            self._status = entry
+        return entry
+
+    def _team_stuck(self, team):
+        """
+        Cached version of _is_stuck
+        Args:
+            team(TeamColor) - the team to check
+        Returns (bool): whether the team can't move
+        """
+        stuck = self._status_entry()[2]
+        result = stuck.get(team)
+        if result is None:
+            result = self._is_stuck(team)
+            stuck[team] = result
+        return result
+
+    @property
+    def position_hash(self):
+        """
+        64-bit Zobrist hash of the position: which piece is on every square and
+        which team moves next. Kept up to date as moves are made, so reading it
+        is free. The draw counters and draw offers are not part of it.
+        Returns(int): the hash
+        """
+        return self._hash
+
+    def _compute_hash(self):
+        """
+        Computes position_hash from scratch
+        Parameters: None
+        Returns(int): the hash
+        """
+        keys = self._zobrist
+        h = 0
+        for piece in self.red_pieces:
+            h ^= keys[4 * (piece.y_pos * self.width + piece.x_pos) + 
+                      piece_kind("Red", piece.is_king)]
+        for piece in self.black_pieces:
+            h ^= keys[4 * (piece.y_pos * self.width + piece.x_pos) + 
+                      piece_kind("Black", piece.is_king)]
+        if self.side_to_move == "Red":
+            h ^= keys[-1]
+        return h
+
     def make_king(self):
         """
         Turns every piece that reaches the last row of the opposite side and
@@ -158,20 +689,26 @@ class Game:
         Parameters:None
         Returns:None
         """
+        keys = self._zobrist
+        crowned = False
         for spot in self.game_board.board[0]:
             if spot is not None and spot.is_king is False and (
                 spot.team == "Red"):
-                self._remove_piece((spot.y_pos,spot.x_pos),"Red")
-                spot.is_king = True
-                self.red_pieces.add(spot)
+                self._crown(spot, True)
+                self._hash ^= keys[4 * spot.x_pos] ^ keys[4 * spot.x_pos + 1]
+                crowned = True
                 
         for spot in self.game_board.board[self.width - 1]:
             if (spot is not None and 
                 spot.is_king is False and spot.team == "Black"):
-                self._remove_piece((spot.y_pos,spot.x_pos),"Black")
-                spot.is_king = True
-                self.black_pieces.add(spot)
-                
+                self._crown(spot, True)
+                sq = (self.width - 1) * self.width + spot.x_pos
+                self._hash ^= keys[4 * sq + 2] ^ keys[4 * sq + 3]
+                crowned = True
+        # the cached moves and status only go stale if a piece was crowned
+        if crowned:
+            self._bump_version()
+
     
     def will_king(self,old_pos,new_pos,team):
         """
@@ -183,15 +720,11 @@ class Game:
         Returns(bool): True if the piece will become a king if it moves to that
         postion and false otherwise
         """
-        current_piece = self.game_board.board[old_pos[0]][old_pos[1]]
-        if self.is_valid_move(old_pos,new_pos):
-            if team == "Red" and current_piece.is_king is False and \
-            new_pos[0] == 0:
-                return True
-            if team == "Black" and current_piece.is_king is False and \
-            new_pos[0] == self.width - 1:
-                return True
-            return False
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            record = self.make_move(move)
+            self.unmake_move(record)
+            return record.promoted
     
     def num_jumps(self,old_pos,new_pos,team):
         """
@@ -204,8 +737,9 @@ class Game:
             team(str): team of piece at the original position
         Returns(int):Number of jumps a piece must make from one spot to another
         """
-        if self.find_correct_sequence(old_pos,new_pos,team) is not None: 
-            return len(self.find_correct_sequence(old_pos,new_pos,team))
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            return move.num_jumps
         return 0
 
 
@@ -221,41 +755,12 @@ class Game:
             move was made
         Returns(bool): if this move will make the team win
         """
-        original_set = None
-        exists = False
-        current_piece = self.game_board.get_piece(old_pos)
         is_winner = None
-        original_set_red = set()
-        original_set_black = set()
-        middle_pos = []
-        initial_pos = self.game_board.get_piece(old_pos)
-        initial_pos_is_king = False
-        if initial_pos.is_king is True:
-            initial_pos_is_king = True
-        end_pos = self.game_board.get_piece(new_pos)
-        if abs(new_pos[1] - old_pos[1]) != 1 and \
-        abs(new_pos[0] - old_pos[0]) != 1:
-            for pos in self.middle_positions(old_pos,new_pos,team_making):
-                middle_pos.append(self.game_board.get_piece(pos))
-        for piece in self.red_pieces:
-            original_set_red.add(piece)
-        for piece in self.black_pieces:
-            original_set_black.add(piece)
-        
-        if self.is_valid_move(old_pos,new_pos):
-            self.move_piece(old_pos,new_pos, team_making, True)
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            record = self.make_move(move)
             is_winner = self.is_winner(team_would_win)
-        if middle_pos != [] :       
-            for pos in middle_pos:
-                self.game_board.add_piece(pos) 
-        self.red_pieces = original_set_red
-        self.black_pieces = original_set_black
-        
-        if old_pos != new_pos:
-            initial_pos.update_position(old_pos)
-            initial_pos.is_king = initial_pos_is_king
-            self.game_board.add_piece(initial_pos)
-            self.game_board.board[new_pos[0]][new_pos[1]] = None
+            self.unmake_move(record)
         return is_winner
     
     def is_done(self):
@@ -264,70 +769,134 @@ class Game:
         Parameters: None
         Returns(bool): if the game is over
         """
-        if self.is_winner("Red") or self.is_winner("Black"):
-            return True
-        if self._is_draw():
-            return True
-        if self.red_wants_to_draw is True and self.black_wants_to_draw is True:
-            return True
-        if self.winner is not None:
-            return True
-        return False
+        return self.status.is_done
                 
-    def move_piece(self, old_pos, new_pos, team, checking_winner=False):
+    def move_piece(self, old_pos, new_pos=None, team=None, 
+                   checking_winner=False):
         """
         Ensures the piece is in play, moves the piece at the old position to 
         the new position if the move is valid, and notifies the player 
         if invalid. If the Piece reaches the end of the board and is not 
         already a king, it changes into a King object. If the piece involves
-        jumps, the jump_piece method is called. 
+        jumps, the jumped pieces are removed. 
         Parameters:
-            old_pos: tuple(int, int)
+            old_pos: tuple(int, int), or a Move (then new_pos is left out)
             new_pos: tuple(int, int)
             team(str): team of piece being moved
             checking_winner(bool): if the game is checking for a winner
         Returns: None
         """
-        current_piece = self.game_board.get_piece(old_pos)
-        if new_pos in self.list_moves(old_pos):
-            if abs(new_pos[0] - old_pos[0]) == 1 and \
-            (abs(new_pos[1] - old_pos[1])== 1): 
-                self.game_board.board[new_pos[0]][new_pos[1]] = current_piece
-                self.game_board.board[new_pos[0]][new_pos[1]].update_position(new_pos)
-                self.game_board.board[old_pos[0]][old_pos[1]] = None
-                if team == "Red":
-                    for piece in self.red_pieces:
-                        if piece.x_pos == old_pos[1] and piece.y_pos == old_pos[0]:
-                            self.red_pieces.remove(piece)
-                            self.red_pieces.add(self.game_board.board[new_pos[0]][new_pos[1]])
-                if team == "Black":
-                    for piece in self.black_pieces:
-                        if piece.x_pos == old_pos[1] and \
-                        piece.y_pos == old_pos[0]:
-                            self.black_pieces.remove(piece)
-                            self.black_pieces.add(self.game_board.board[new_pos[0]][new_pos[1]])
-                self.make_king()
-
-                if not checking_winner:
-                    if team == "Red":
-                        self.since_piece_removed_red += 1
-                    if team == "Black":
-                        self.since_piece_removed_black += 1
-            else: 
-                self.jump_piece(old_pos, new_pos, team)
-                if not checking_winner:
-                    if team == "Red":
-                        self.since_piece_removed_red = 0
-                    if team == "Black":
-                        self.since_piece_removed_black = 0
+        if isinstance(old_pos, Move):
+            old_pos, new_pos = old_pos
+        # a Move from an earlier position could have a stale path, so the
+        # one generated for the current position is what gets played
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            if checking_winner:
+                self._apply_move(move)
+            else:
+                self.make_move(move)
         else:
             print("invalid move")
 
+    def make_move(self, move):
+        """
+        Plays a move and returns what is needed to take it back with 
+        unmake_move. The move is not checked, so it must be one of the moves
+        given by list_moves. Costs O(number of jumped pieces) rather than 
+        copying the pieces, so it can be used for looking ahead.
+        Parameters:
+            move: a Move, or an (old_pos, new_pos) pair of tuple(int, int)
+        Returns(UndoRecord): the record to give to unmake_move
+        """
+        if not isinstance(move, Move):
+            move = self._lookup_move(move[0], move[1])
+        old_pos, new_pos = move
+        since_red = self.since_piece_removed_red
+        since_black = self.since_piece_removed_black
+        cache = self._save_cache()
+        position = (self._hash, self.side_to_move)
+        piece, captured, promoted = self._apply_move(move)
+        if captured:
+            since = 0
+        elif piece.team == "Red":
+            since = since_red + 1
+        else:
+            since = since_black + 1
+        if piece.team == "Red":
+            self.since_piece_removed_red = since
+        else:
+            self.since_piece_removed_black = since
+        return UndoRecord(old_pos, new_pos, piece, captured, promoted, 
+                          since_red, since_black, cache, position)
+
+    def unmake_move(self, record):
+        """
+        Takes back a move played by make_move. Moves must be taken back in
+        the opposite order they were made in.
+        Parameters:
+            record(UndoRecord): the record returned by make_move
+        Returns: None
+        """
+        piece = record.piece
+        if record.promoted:
+            self._crown(piece, False)
+        self._relocate_piece(record.new_pos, record.old_pos)
+        for victim in record.captured:
+            self._place_piece(victim)
+        self.since_piece_removed_red = record.since_red
+        self.since_piece_removed_black = record.since_black
+        self._restore_cache(record.cache)
+        self._hash, self.side_to_move = record.position
+
+    def _apply_move(self, move):
+        """
+        Moves a piece, removes the pieces it jumps and crowns it if it reaches 
+        the last row. Does not check the move or change the draw counters.
+        Parameters:
+            move(Move): the move to play
+        Returns(tuple): the moved Piece, a tuple of the captured Pieces and 
+        whether the piece was made a king
+        """
+        old_pos = move.origin
+        new_pos = move.path[-1]
+        board = self.game_board
+        keys = self._zobrist
+        width = self.width
+        piece = board.get_piece(old_pos)
+        team = piece.team
+        h = self._hash ^ keys[4 * (old_pos[0] * width + old_pos[1]) + 
+                              piece_kind(team, piece.is_king)]
+        captured = []
+        for row, col in move.captured:
+            victim = board.get_piece((row, col))
+            # a king can pass over the same piece twice in one sequence
+            if victim is not None:
+                self._remove_piece((row, col), victim.team)
+                captured.append(victim)
+                h ^= keys[4 * (row * width + col) + 
+                          piece_kind(victim.team, victim.is_king)]
+        self._relocate_piece(old_pos, new_pos)
+        promoted = False
+        if piece.is_king is False and (
+            (team == "Red" and new_pos[0] == 0) or 
+            (team == "Black" and new_pos[0] == width - 1)):
+            self._crown(piece, True)
+            promoted = True
+        h ^= keys[4 * (new_pos[0] * width + new_pos[1]) + 
+                  piece_kind(team, piece.is_king)]
+        # the other team moves next
+        if self.side_to_move == team:
+            self.side_to_move = "Black" if team == "Red" else "Red"
+            h ^= keys[-1]
+        self._hash = h
+        self._bump_version()
+        return piece, tuple(captured), promoted
 
     def find_correct_sequence(self, old_pos,new_pos,team):
         """
         Finds the best sequence that a piece should jump through to get to a 
-        destination
+        destination: the longest one, or the first one found if there is a tie
         Parameters:
             old_pos(tup): the original positon
             new_pos(tup): new position
@@ -335,30 +904,10 @@ class Game:
         Returns(list): The best sequence a piece should go through to get to a
         destination
         """
-        choose_sequence = None 
-        current_piece = self.game_board.board[old_pos[0]][old_pos[1]]
-        if current_piece.is_king is False:
-            for sequence in self.jump_trail_piece(old_pos,team):
-                if len(sequence) > 0:
-                    if choose_sequence is None and \
-                    sequence[len(sequence) - 1] == new_pos:
-                        choose_sequence = sequence
-                    elif choose_sequence != None and \
-                    sequence[len(sequence) - 1] == new_pos:
-                        if len(choose_sequence) < len(sequence):
-                            choose_sequence = sequence
-            return choose_sequence
-        if current_piece.is_king is True:
-            for sequence in self.jump_trail_king(old_pos, old_pos, None, [], team):
-                if len(sequence) > 0:
-                    if (choose_sequence == None and 
-                        sequence[len(sequence) - 1] == new_pos):
-                        choose_sequence = sequence
-                    elif choose_sequence != None and \
-                    sequence[len(sequence) - 1] == new_pos:
-                        if len(choose_sequence) < len(sequence):
-                            choose_sequence = sequence
-            return choose_sequence
+        move = self._lookup_move(old_pos, new_pos)
+        if move is None or not move.captured:
+            return None
+        return list(move.path)
     
 
     def middle_positions(self,old_pos,new_pos,team):
@@ -394,41 +943,63 @@ class Game:
             team: team of the piece at the original position
         Returns:None
         """
-        current_piece = self.game_board.board[old_pos[0]][old_pos[1]]
-        if self.is_valid_move(old_pos,new_pos):
-            for pos in self.middle_positions(old_pos,new_pos,team):
-                
-                if team == "Red":
-                    self._remove_piece((int(pos[0]),int(pos[1])),"Black")
-                if team == "Black":
-                    self._remove_piece((int(pos[0]),int(pos[1])),"Red")
-                self.game_board.remove_piece((int(pos[0]),int(pos[1])) )
-            if old_pos != new_pos:
-                self._remove_piece(old_pos,team)
-                self.game_board.board[int(old_pos[0])][int(old_pos[1])] = None
-                self.game_board.board[int(new_pos[0])][int(new_pos[1])] = current_piece
-                self.game_board.board[int(new_pos[0])][int(new_pos[1])].update_position((new_pos[0],new_pos[1]))
-                if team == "Red":
-                    self.red_pieces.add(self.game_board.board[int(new_pos[0])][int(new_pos[1])])
-            
-                if team == "Black":
-                    self.black_pieces.add(self.game_board.board[int(new_pos[0])][int(new_pos[1])])
-                self.make_king()
+        move = self._lookup_move(old_pos, new_pos)
+        if move is not None:
+            self._apply_move(move)
 
         
     def _remove_piece(self, pos,team):
         """
-        Removes a piece at a specific position.
+        Removes a piece at a specific position from the board and from its
+        team.
         Parameters: 
             pos: tuple(int, int)
             team: team of the piece
         Returns: None
         """
-        piece = self.game_board.get_piece(pos)
-        if team == "Black":
-            self.black_pieces.remove(piece)
-        else:
-            self.red_pieces.remove(piece)
+        del self._pieces[team][pos]
+        self.game_board.remove_piece(pos)
+
+    def _place_piece(self, piece):
+        """
+        Puts a piece on the board at its position and adds it to its team
+        Parameters:
+            piece(Piece): the piece
+        Returns: None
+        """
+        self.game_board.add_piece(piece)
+        self._pieces[piece.team][(piece.y_pos, piece.x_pos)] = piece
+
+    def _relocate_piece(self, old_pos, new_pos):
+        """
+        Moves the piece at one position to another, keeping the board and the
+        team's pieces by position in step. Nothing else is checked or changed.
+        Parameters:
+            old_pos(tup): position of the piece
+            new_pos(tup): position to move it to, which must be empty (or
+            old_pos)
+        Returns: None
+        """
+        if old_pos == new_pos:
+            return
+        piece = self.game_board.get_piece(old_pos)
+        by_pos = self._pieces[piece.team]
+        self.game_board.move_piece(old_pos, new_pos)
+        del by_pos[old_pos]
+        by_pos[new_pos] = piece
+        piece.update_position(new_pos)
+
+    def _crown(self, piece, is_king):
+        """
+        Makes a piece on the board a king, or takes that away again
+        Parameters:
+            piece(Piece): the piece
+            is_king(bool): whether it should be a king
+        Returns: None
+        """
+        piece.is_king = is_king
+        self.game_board.add_piece(piece)
+
     def _initialize_checkers(self):
         """
         Adds all the pieces to the board in starting positions and to the 
@@ -439,15 +1010,11 @@ class Game:
         for i in range(self._num_rows):
             for j in range(self.width):
                 if (i + j) % 2 == 1:
-                    piece = Piece((i,j),"Black")
-                    self.game_board.add_piece(piece)
-                    self.black_pieces.add(piece)
+                    self._place_piece(Piece((i,j),"Black"))
         for i in range(self.width - self._num_rows, self.width):
             for j in range(self.width):
                 if (i + j) % 2 == 1:
-                    piece = Piece((i,j),"Red")
-                    self.game_board.add_piece(piece)
-                    self.red_pieces.add(piece)
+                    self._place_piece(Piece((i,j),"Red"))
     
     def reset_game(self):
         """
@@ -456,45 +1023,488 @@ class Game:
         Parameters:None
         Returns:None
         """
-        self.red_pieces = set()
-        self.black_pieces = set()
+        for by_pos in self._team_pieces.values():
+            by_pos.clear()
+        self._pieces_loaded = True
         self.red_wants_to_draw = False
         self.black_wants_to_draw = False
         self.since_piece_removed_black = 0
         self.since_piece_removed_red = 0
-        for i in range(self.width):
-            for j in range(self.width):
-                if self.game_board.board[i][j] is not None:
-                    self.game_board.board[i][j] = None
+        self.game_board.clear()
         self._initialize_checkers()
         self.winner = None
-        
+        self.side_to_move = "Black"
+        self._hash = self._compute_hash()
+        self._bump_version()
+
+    def snapshot(self):
+        """
+        Saves the position, the side to move, the draw counters and offers and
+        the winner, so they can be put back with restore. Costs one copy of
+        the board's flat array, so it can be done often.
+        Parameters: None
+        Returns(Snapshot): the saved state, which can't be changed
+        """
+        return Snapshot(self._board_state(), self.side_to_move, 
+                        self.since_piece_removed_red, 
+                        self.since_piece_removed_black,
+                        self.red_wants_to_draw, self.black_wants_to_draw,
+                        self.winner, self._hash)
+
+    def restore(self, snapshot):
+        """
+        Puts the game back to a state saved by snapshot. Only the board's
+        bytes are copied; the pieces on the board are replaced by new Piece
+        objects when they are next needed.
+        Parameters:
+            snapshot(Snapshot): value returned by snapshot on a game of the
+            same kind and size
+        Returns: None
+        """
+        self._load_board(snapshot.board)
+        self.side_to_move = snapshot.side_to_move
+        self.since_piece_removed_red = snapshot.since_red
+        self.since_piece_removed_black = snapshot.since_black
+        self.red_wants_to_draw = snapshot.red_wants_to_draw
+        self.black_wants_to_draw = snapshot.black_wants_to_draw
+        self.winner = snapshot.winner
+        self._hash = snapshot.position_hash
+        self._bump_version()
+
+    def clone(self):
+        """
+        Makes a copy of the game that can be played on without changing this
+        one
+        Parameters: None
+        Returns(Game): the copy, of the same class as this game
+        """
+        game = copy.copy(self)
+        game.game_board = MailboxBoard(self._num_rows, self._num_rows)
+        game._team_pieces = {"Red": {}, "Black": {}}
+        game._red_view = PieceSet(game._team_pieces["Red"])
+        game._black_view = PieceSet(game._team_pieces["Black"])
+        game._team_moves_cache = {}
+        game._moves_cache = {}
+        game.restore(self.snapshot())
+        return game
+
+    def set_position(self, cells, side_to_move="Black"):
+        """
+        Replaces the pieces on the board, starting a game from that position
+        with the draw counters and offers cleared and no winner
+        Parameters:
+            cells(bytes): one byte per square (row * width + col): 0 if the
+            square is empty, otherwise piece_kind of the piece plus 1
+            side_to_move(str): the team whose turn it is
+        Returns: None
+        """
+        self._set_state(cells, side_to_move, 0, 0)
+
+    def to_bytes(self):
+        """
+        Encodes the position, the side to move and the draw counters (but not
+        draw offers or a resignation) in a few bytes: POSITION_HEADER, then
+        one bitmask per piece_kind over the dark squares (see dark_cells),
+        each (number of dark squares + 7) // 8 bytes long
+        Parameters: None
+        Returns(bytes): the encoded position
+        """
+        dark = dark_cells(self.to_cells(), self.width)
+        size = (len(dark) + 7) // 8
+        parts = [POSITION_HEADER.pack(
+            self._num_rows, RED_TO_MOVE if self.side_to_move == "Red" else 0,
+            self.since_piece_removed_red, self.since_piece_removed_black)]
+        for code in range(1, 5):
+            bits = dark.translate(_KIND_BITS[code])[::-1]
+            parts.append(int(bits, 2).to_bytes(size, "little"))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Makes a game set up in a position from to_bytes
+        Parameters:
+            data(bytes): the encoded position
+        Returns(Game): the game, of this class and of the encoded size
+        """
+        n, = struct.unpack_from("<H", data)
+        game = cls(n)
+        game.load_bytes(data)
+        return game
+
+    def load_bytes(self, data):
+        """
+        Sets up a position from to_bytes on this game, like set_position
+        Parameters:
+            data(bytes): the encoded position, for a board of this size
+        Returns: None
+        """
+        n, flags, since_red, since_black = POSITION_HEADER.unpack_from(data)
+        if n != self._num_rows:
+            raise ValueError(f"position is for n = {n}, not {self._num_rows}")
+        num_dark = self.width * self.width // 2
+        size = (num_dark + 7) // 8
+        if len(data) != POSITION_HEADER.size + 4 * size:
+            raise ValueError("position has the wrong length")
+        dark = 0
+        union = 0
+        count = 0
+        for code in range(1, 5):
+            start = POSITION_HEADER.size + (code - 1) * size
+            mask = int.from_bytes(data[start:start + size], "little")
+            if mask >> num_dark:
+                raise ValueError("position has pieces off the board")
+            union |= mask
+            count += mask.bit_count()
+            # one byte per dark square, holding code where the mask is set
+            dark += int.from_bytes(format(mask, f"0{num_dark}b")[::-1].encode()
+                                   .translate(_KIND_CODES[code]), "big")
+        if union.bit_count() != count:
+            raise ValueError("position has two pieces on the same square")
+        dark = dark.to_bytes(num_dark, "big")
+        self._set_state(cells_from_dark(dark, self.width),
+                        "Red" if flags & RED_TO_MOVE else "Black",
+                        since_red, since_black)
+
+    def to_fen(self):
+        """
+        Writes the position as text, in the style of PDN's FEN tags: the side
+        to move, then each team's pieces as dark square numbers (see
+        dark_cells, counting from 1) with K before kings, then the
+        since_piece_removed_red and since_piece_removed_black counters, like
+        "B:R21,22,K30:B1,2,K5:C0,3"
+        Parameters: None
+        Returns(str): the position
+        """
+        squares = {"Red": [], "Black": []}
+        dark = dark_cells(self.to_cells(), self.width)
+        for i, code in enumerate(dark, 1):
+            if code:
+                kind = code - 1
+                squares["Red" if kind < 2 else "Black"].append(
+                    f"K{i}" if kind % 2 else str(i))
+        return (f"{FEN_TEAMS[self.side_to_move]}"
+                f":R{','.join(squares['Red'])}"
+                f":B{','.join(squares['Black'])}"
+                f":C{self.since_piece_removed_red},"
+                f"{self.since_piece_removed_black}")
+
+    @classmethod
+    def from_fen(cls, text, n=3):
+        """
+        Makes a game set up in a position written by to_fen
+        Parameters:
+            text(str): the position
+            n(int): number of rows of pieces the board size goes with
+        Returns(Game): the game, of this class
+        """
+        game = cls(n)
+        game.load_fen(text)
+        return game
+
+    def load_fen(self, text):
+        """
+        Sets up a position written by to_fen on this game, like set_position.
+        Squares can also be given as ranges, like "R21-32", and the
+        counters can be left out, in which case they are 0.
+        Parameters:
+            text(str): the position
+        Returns: None
+        """
+        fields = text.strip().split(":")
+        teams = {letter: team for team, letter in FEN_TEAMS.items()}
+        if fields[0] not in teams:
+            raise ValueError(f"unknown side to move {fields[0]!r}")
+        num_dark = self.width * self.width // 2
+        dark = bytearray(num_dark)
+        counters = (0, 0)
+        for field in fields[1:]:
+            tag, rest = field[:1], field[1:]
+            if tag == "C":
+                try:
+                    counters = tuple(int(count) for count in rest.split(","))
+                except ValueError:
+                    counters = ()
+                if len(counters) != 2:
+                    raise ValueError(f"bad counters {field!r}")
+                continue
+            if tag not in teams:
+                raise ValueError(f"unknown field {field!r}")
+            base = piece_kind(teams[tag], False) + 1
+            for token in filter(None, rest.split(",")):
+                code = base + token.startswith("K")
+                first, _, last = token.lstrip("K").partition("-")
+                try:
+                    first = int(first)
+                    last = int(last) if last else first
+                except ValueError:
+                    raise ValueError(f"bad square {token!r}") from None
+                if not 1 <= first <= last <= num_dark:
+                    raise ValueError(f"square {token!r} is off the board")
+                for i in range(first - 1, last):
+                    if dark[i]:
+                        raise ValueError(f"two pieces on square {i + 1}")
+                    dark[i] = code
+        self._set_state(cells_from_dark(dark, self.width),
+                        teams[fields[0]], *counters)
+
+    def _set_state(self, cells, side_to_move, since_red, since_black):
+        """
+        Replaces the pieces on the board and sets the side to move and the 
+        draw counters, with the draw offers cleared and no winner
+        Parameters:
+            cells(bytes): one byte per square, as in set_position
+            side_to_move(str): the team whose turn it is
+            since_red(int): since_piece_removed_red
+            since_black(int): since_piece_removed_black
+        Returns: None
+        """
+        self.restore(Snapshot(self._board_from_cells(cells), side_to_move,
+                              since_red, since_black, False, False, None, 0))
+        self._hash = self._compute_hash()
+
+    def perft(self, depth, divide=False, table=None):
+        """
+        Counts the move sequences of a given length that can be played from
+        the current position, starting with side_to_move and taking turns.
+        A position where the side to move has no moves ends a sequence early
+        and isn't counted. The draw rules are not looked at. Used to check
+        and time move generation; the game is left as it was.
+        Parameters:
+            depth(int): number of moves in each sequence
+            divide(bool): count separately for each first move
+            table(SharedTable): transposition table (see transposition.py) 
+            to look counts up in and save them to, so positions reached by
+            different move orders are only counted once; None to not use one
+        Returns(int or dict): the number of sequences, or with divide, a
+        dict from each first move (old_pos, new_pos) to its count
+        """
+        if not divide:
+            return self._perft(depth, table)
+        counts = {}
+        for moves in self.all_team_moves(self.side_to_move, 
+                                         as_moves=True).values():
+            for move in moves:
+                record = self.make_move(move)
+                counts[(move.origin, move.end)] = self._perft(depth - 1, 
+                                                              table)
+                self.unmake_move(record)
+        return counts
+
+    def _perft(self, depth, table=None):
+        """
+        Does the counting for perft
+        Parameters:
+            depth(int): number of moves left to play
+            table(SharedTable): transposition table, or None
+        Returns(int): the number of sequences
+        """
+        if depth == 0:
+            return 1
+        # counts one move from the end are quicker to make than to look up
+        if table is not None and depth > 1:
+            nodes = table.probe(self._hash, depth)
+            if nodes is not None:
+                return nodes
+        team_moves = self.all_team_moves(self.side_to_move, as_moves=True)
+        if depth == 1:
+            return sum(len(moves) for moves in team_moves.values())
+        nodes = 0
+        for moves in team_moves.values():
+            for move in moves:
+                record = self.make_move(move)
+                nodes += self._perft(depth - 1, table)
+                self.unmake_move(record)
+        if table is not None:
+            table.store(self._hash, depth, nodes)
+        return nodes
+
+    def _board_from_cells(self, cells):
+        """
+        Turns a flat board into the form stored in a Snapshot
+        Parameters:
+            cells(bytes): one byte per square, as in 
+            MailboxBoard.to_cells
+        Returns(bytes): the flat board
+        """
+        return bytes(cells)
+
+    def _board_state(self):
+        """
+        Returns the pieces on the board in the form stored in a Snapshot
+        Parameters: None
+        Returns(bytes): the board without its border (see 
+        MailboxBoard.to_cells)
+        """
+        return self.game_board.to_cells()
+
+    def to_cells(self):
+        """
+        Returns the pieces on the board as a flat board, as it is right now
+        (for BitboardGame, including moves played with make_move). Reading
+        it doesn't make any Piece objects, so searches and other code that
+        only needs to know what is on each square should use it.
+        Parameters: None
+        Returns(bytes): one byte per square, at row * width + col: 0 if the
+        square is empty, otherwise piece_kind of the piece on it plus 1 (as
+        in MailboxBoard.to_cells)
+        """
+        return self.game_board.to_cells()
+
+    def _load_board(self, cells):
+        """
+        Replaces the pieces on the board with the ones in a flat board from
+        _board_state. The Piece objects are made when they are next needed
+        (see MailboxBoard.load_cells and _pieces).
+        Parameters:
+            cells(bytes): one byte per square, as in 
+            MailboxBoard.to_cells
+        Returns: None
+        """
+        self.game_board.load_cells(cells)
+        for by_pos in self._team_pieces.values():
+            by_pos.clear()
+        self._pieces_loaded = False
+
+    def _bump_version(self):
+        """
+        Gives the board a new version number after it changes. Numbers are 
+        never reused, even when unmake_move goes back to an earlier version.
+        Parameters: None
+        Returns: None
+        """
+        self._last_version += 1
+        self._version = self._last_version
+
+    def _save_cache(self):
+        """
+        Returns the current version, cached moves and status, so they can be 
+        put back
+        with _restore_cache when the board returns to this exact state
+        Parameters: None
+        Returns(tuple): the saved cache state
+        """
+        return (self._version, self._cache_version, self._team_moves_cache,
+                self._moves_cache, self._status)
+
+    def _restore_cache(self, saved):
+        """
+        Puts back a version and cached moves saved by _save_cache
+        Parameters:
+            saved(tuple): value returned by _save_cache
+        Returns: None
+        """
+        (self._version, self._cache_version, self._team_moves_cache,
+         self._moves_cache, self._status) = saved
+
+    def _check_cache(self):
+        """
+        Throws away the cached moves if the board has changed since they were
+        generated. New dictionaries are made rather than clearing the old ones,
+        since callers may still be looking at them.
+        Parameters: None
+        Returns: None
+        """
+        if self._cache_version != self._version:
+            self._cache_version = self._version
+            self._team_moves_cache = {}
+            self._moves_cache = {}
+
     
-    def all_team_moves(self, team): 
+    def all_team_moves(self, team, as_moves=False): 
         """
         Maps the location of each piece that has at least one valid move to 
         a list of valid next moves, ultimately returning a dictionary of all 
-        possible moves for that team. 
+        possible moves for that team. The result is cached until the board
+        changes, so it must not be modified by the caller.
         Args: 
             Team (TeamColor): the team to get moves for
+            as_moves (bool): list Move objects (see list_moves) instead of 
+            positions
         Returns: 
             dict{tup(int, int): [tup(int, int)]} : dict mapping positions to 
             possible next positions for the piece at each position
             
         """
+        self._check_cache()
+        team_moves = self._team_moves_cache.get((team, as_moves))
+        if team_moves is None:
+            if as_moves:
+                team_moves = self._find_team_move_objects(team)
+            else:
+                team_moves = self._find_team_moves(team)
+            self._team_moves_cache[(team, as_moves)] = team_moves
+        return team_moves
+
+    def _find_team_move_objects(self, team):
+        """
+        Generates the dictionary returned by all_team_moves with as_moves
+        Args: 
+            Team (TeamColor): the team to get moves for
+        Returns: 
+            dict{tup(int, int): [Move]} : dict mapping positions to the Moves
+            of the piece at each position
+        """
+        return {pos: self.list_moves(pos, as_moves=True) 
+                for pos in self.all_team_moves(team)}
+
+    def _find_team_moves(self, team):
+        """
+        Generates the dictionary returned by all_team_moves
+        Args: 
+            Team (TeamColor): the team to get moves for
+        Returns: 
+            dict{tup(int, int): [tup(int, int)]} : dict mapping positions to 
+            possible next positions for the piece at each position
+        """
         team_moves ={}
-        if team == "Red":
-            for piece in self.red_pieces:
-                if self.can_move((piece.y_pos,piece.x_pos)):
-                    team_moves[(piece.y_pos,piece.x_pos)] = \
-                    self.list_moves((piece.y_pos,piece.x_pos))
-        if team == "Black":
-            for piece in self.black_pieces:
-                if self.can_move((piece.y_pos,piece.x_pos)):
-                    team_moves[(piece.y_pos,piece.x_pos)] = \
-                    self.list_moves((piece.y_pos,piece.x_pos))
+        for pos in self._pieces.get(team, ()):
+            moves = self.list_moves(pos)
+            if moves:
+                team_moves[pos] = moves
         
         return team_moves
+
+    def iter_team_moves(self, team):
+        """
+        Yields an (old_pos, new_pos) pair for every move a team can make, in
+        the same order as all_team_moves lists them. Each piece's moves are 
+        only worked out when the caller gets to them, so stopping early (like
+        when looking for one move that does something) skips the rest. The 
+        board must not change while iterating.
+        Args: 
+            Team (TeamColor): the team to get moves for
+        Returns(generator): the (old_pos, new_pos) pairs
+        """
+        self._check_cache()
+        team_moves = self._team_moves_cache.get((team, False))
+        if team_moves is not None:
+            for pos, moves in team_moves.items():
+                for new_pos in moves:
+                    yield (pos, new_pos)
+            return
+        for pos in self._pieces.get(team, ()):
+            for new_pos in self.iter_moves(pos):
+                yield (pos, new_pos)
+
+    def has_any_move(self, team):
+        """
+        Determines if a team can make at least one move. Stops at the first
+        piece that can move, and only looks at the squares around each piece
+        rather than listing its moves.
+        Args: 
+            Team (TeamColor): the team to check
+        Returns(bool): whether the team has a move
+        """
+        self._check_cache()
+        for as_moves in (False, True):
+            team_moves = self._team_moves_cache.get((team, as_moves))
+            if team_moves is not None:
+                return len(team_moves) > 0
+        for pos in self._pieces.get(team, ()):
+            if self._piece_can_move(pos):
+                return True
+        return False
                         
     def is_winner(self, team): 
         """
@@ -504,15 +1514,19 @@ class Game:
         Returns (bool): whether the specified team is a winner
         """
         if team == "Red":
-            if len(self.black_pieces) == 0 or \
-            len(self.all_team_moves("Black")) == 0:
-                return True
-            return False
+            return self._team_stuck("Black")
         if team == "Black":
-            if len(self.red_pieces) == 0 or \
-            len(self.all_team_moves("Red")) == 0:
-                return True
-            return False
+            return self._team_stuck("Red")
+
+    def _is_stuck(self, team):
+        """
+        Determines if a team has no pieces or no moves left, which makes the
+        other team the winner
+        Args:
+            team(TeamColor) - the team to check
+        Returns (bool): whether the team can't move
+        """
+        return not self.has_any_move(team)
 
     def can_move(self, pos):
         """
@@ -522,8 +1536,35 @@ class Game:
             pos (tuple) - a tuple representing the position of the Piece
         Return (bool) whether the piece at given position has available moves
         """
-        if len(self.list_moves(pos))> 0:
-            return True
+        self._check_cache()
+        return self._piece_can_move(pos)
+
+    def _piece_can_move(self, pos):
+        """
+        Does the work of can_move, once the cache has been checked: uses the
+        cached moves if there are any, and otherwise looks at the squares 
+        next to the piece and two away from it without listing its moves
+        Args: 
+            pos (tuple) - a tuple representing the position of the Piece
+        Return (bool) whether the piece at given position has available moves
+        """
+        entry = self._moves_cache.get(pos)
+        if entry is not None:
+            return len(entry[0]) > 0
+        board = self.game_board
+        piece = board.get_piece(pos)
+        if piece is None:
+            return False
+        cells = board.cells
+        sq = board.square(pos)
+        dirs = KING_DIRECTIONS if piece.is_king else MAN_DIRECTIONS[piece.team]
+        for target in board.tables.steps[dirs][sq]:
+            if cells[target] == 0:
+                return True
+        opponents = OPPONENT_CODES[piece.team]
+        for over, land in board.tables.jumps[dirs][sq]:
+            if cells[over] in opponents and cells[land] == 0:
+                return True
         return False
         
     def is_valid_position(self,pos):
@@ -536,19 +1577,117 @@ class Game:
         if 0 <= pos[0] <= self.width - 1 and 0 <= pos[1] <= self.width - 1:
             return True
         return False 
-    def list_moves(self,pos):
+    def list_moves(self, pos, as_moves=False):
         """
-        Lists all the moves of a piece at a position
+        Lists all the moves of a piece at a position. The result is cached 
+        until the board changes, so it must not be modified by the caller.
+
+        With as_moves, each destination is given once as a Move that also
+        holds the jump sequence (the one find_correct_sequence would pick) and
+        the positions of the jumped pieces, so playing or scoring the move 
+        does not have to look for the sequence again.
         Parameters:
             pos(tup): the position 
+            as_moves(bool): list Move objects instead of positions
         Returns(list): returns a list of tuples of all the positions a piece can
-        go to
+        go to, or a list of Moves
+        """
+        self._check_cache()
+        entry = self._moves_cache.get(pos)
+        if entry is None:
+            positions, trails = self._find_moves(pos)
+            entry = [positions, trails, None]
+            self._moves_cache[pos] = entry
+        if not as_moves:
+            return entry[0]
+        if entry[2] is None:
+            entry[2] = self._make_moves(pos, entry[0], entry[1])
+        return entry[2]
+
+    def iter_moves(self, pos):
+        """
+        Yields the positions the piece at a position can go to, in the same 
+        order as list_moves, working them out as they are asked for: jump 
+        sequences are only searched for if the piece has a jump, and simple
+        moves are only looked at after the jumps. Nothing is yielded for an
+        empty square. The board must not change while iterating.
+        Parameters:
+            pos(tup): the position 
+        Returns(generator): the positions
+        """
+        self._check_cache()
+        entry = self._moves_cache.get(pos)
+        if entry is not None:
+            yield from entry[0]
+            return
+        piece = self.game_board.get_piece(pos)
+        if piece is None:
+            return
+        if self.can_jump(pos, piece.team, piece.is_king):
+            for trail in self._jump_trails(pos, piece.team, piece.is_king):
+                yield trail[-1]
+        yield from self._iter_steps(pos, (-1, 1) if piece.is_king 
+                                    else (piece.dir,))
+
+    def _find_moves(self, pos):
+        """
+        Generates what list_moves returns
+        Parameters:
+            pos(tup): the position 
+        Returns(tuple): list of tuples of all the positions a piece can go to,
+        and list of the jump sequences (tuples of landing positions) that the
+        first positions are the ends of
         """
         current_piece = self.game_board.get_piece(pos)
+        trails = self._jump_trails(pos, current_piece.team, 
+                                   current_piece.is_king)
         if current_piece.is_king is False:
-            return self.list_moves_piece(pos,current_piece.team)
+            steps = self._simple_moves(pos, (current_piece.dir,))
         else:
-            return self.list_moves_king(pos,current_piece.team)
+            steps = self._simple_moves(pos, (-1, 1))
+        return [trail[-1] for trail in trails] + steps, trails
+
+    def _make_moves(self, pos, positions, trails):
+        """
+        Turns the result of _find_moves into Move objects, one per destination.
+        A destination reached by several jump sequences gets the longest one,
+        or the first one found if there is a tie.
+        Parameters:
+            pos(tup): the position of the piece
+            positions(list): positions the piece can go to
+            trails(list): jump sequences, matching the start of positions
+        Returns(list): list of Moves
+        """
+        best = {}
+        for trail in trails:
+            end = trail[-1]
+            if end not in best or len(best[end]) < len(trail):
+                best[end] = trail
+        moves = []
+        for trail in best.values():
+            captured = []
+            prev = pos
+            for land in trail:
+                captured.append(((prev[0] + land[0]) // 2, 
+                                 (prev[1] + land[1]) // 2))
+                prev = land
+            moves.append(Move(pos, trail, tuple(captured)))
+        for end in positions[len(trails):]:
+            moves.append(Move(pos, (end,)))
+        return moves
+
+    def _lookup_move(self, old_pos, new_pos):
+        """
+        Finds the Move from one position to another
+        Parameters:
+            old_pos(tup): position of the piece
+            new_pos(tup): position it would move to
+        Returns(Move or None): the move, or None if it is not a valid move
+        """
+        for move in self.list_moves(old_pos, as_moves=True):
+            if move.path[-1] == new_pos:
+                return move
+        return None
         
     def can_jump(self,pos,team,is_king):
         """
@@ -558,42 +1697,20 @@ class Game:
             team: team of piece
         Returns(bool): If the piece can jump at that position
         """
-        current_spot = self.game_board.get_piece(pos)
-        directions = [-1,1]
-        direction = None
-        if team == "Red":
-            direction = -1
-        if team == "Black":
-            direction = 1
-        if (current_spot is None and is_king is False) or \
-        (current_spot is not None and is_king is False):
-            if self.is_valid_position((pos[0] + direction, pos[1] + 1)):
-                if (self.game_board.board[pos[0] + direction][pos[1] + 1] is not None
-                    and self.game_board.board[pos[0] + direction][pos[1] + 1].team != team):
-                    if (self.is_valid_position((pos[0] + 2* direction, pos[1] + 2)) and
-                        self.game_board.board[pos[0] + 2*direction][pos[1] + 2] is None):
-                        return True
-            if self.is_valid_position((pos[0] + direction, pos[1] - 1)):
-                if (self.game_board.board[pos[0] + direction][pos[1] - 1] is not None
-                    and self.game_board.board[pos[0] + direction][pos[1] - 1].team != team):
-                    if (self.is_valid_position((pos[0] + 2*direction, pos[1] - 2)) and
-                        self.game_board.board[pos[0] + 2*direction][pos[1] - 2] is None):
-                        return True
+        board = self.game_board
+        current_spot = board.get_piece(pos)
+        if is_king is False:
+            dirs = ROW_DIRECTIONS[-1] if team == "Red" else ROW_DIRECTIONS[1]
         elif (current_spot is None and is_king is True) or \
         (current_spot is not None and current_spot.is_king is True):
-            for i in directions:
-                if self.is_valid_position((pos[0] + i, pos[1] + 1)):
-                    if (self.game_board.board[pos[0] + i][pos[1] + 1] is not None
-                        and self.game_board.board[pos[0] + i][pos[1] + 1].team != team):
-                        if (self.is_valid_position((pos[0] + 2*i, pos[1] + 2)) and
-                            self.game_board.board[pos[0] + 2*i][pos[1] + 2] is None):
-                            return True
-                if self.is_valid_position((pos[0] + i, pos[1] - 1)):
-                    if (self.game_board.board[pos[0] + i][pos[1] - 1] is not None
-                        and self.game_board.board[pos[0] + i][pos[1] - 1].team != team):
-                        if (self.is_valid_position((pos[0] + 2*i, pos[1] - 2)) and
-                            self.game_board.board[pos[0] + 2*i][pos[1] - 2] is None):
-                            return True
+            dirs = KING_DIRECTIONS
+        else:
+            return False
+        cells = board.cells
+        opponents = OPPONENT_CODES[team]
+        for over, land in board.tables.jumps[dirs][board.square(pos)]:
+            if cells[over] in opponents and cells[land] == 0:
+                return True
         return False
     
     
@@ -605,35 +1722,7 @@ class Game:
             team: team of piece
         Returns(list): A list of lists of all the sequences a piece can jump through
         """
-        trails = []
-        current_piece = self.game_board.board[pos[0]][pos[1]]
-        direction = None
-        if team == "Red":
-            direction = -1
-        else:
-            direction = 1
-        if not self.can_jump(pos,team,False):
-            return []
-        if self.can_jump(pos,team,False):
-            if (self.is_valid_position(((pos[0] + direction),pos[1] + 1)) and
-                (self.game_board.board[pos[0] + direction][pos[1] + 1] is not None)):
-                if (self.game_board.board[(pos[0] + direction)][pos[1] + 1].team != team and 
-                    self.is_valid_position(((pos[0] + 2*direction),pos[1] + 2))):
-                    if self.game_board.board[pos[0] + 2*direction][pos[1] + 2] is None:
-                        if self.can_jump((pos[0] + 2*direction,pos[1] + 2),team,False) is False:
-                            trails.append([(pos[0] + 2*direction,pos[1] + 2)])
-                        for trail in self.jump_trail_piece((pos[0] + 2*direction,pos[1] + 2),team):
-                            trails.append([(pos[0] + 2*direction,pos[1] + 2)] + trail)
-            if (self.is_valid_position(((pos[0] + direction),pos[1] - 1)) and
-                (self.game_board.board[(pos[0] + direction)][pos[1] - 1] is not None)):
-                if ((self.game_board.board[(pos[0] + direction)][pos[1] - 1].team != team) and 
-                    self.is_valid_position(((pos[0] + 2*direction),pos[1] - 2))):
-                    if self.game_board.board[pos[0] + 2*direction][pos[1] - 2] is None:
-                        if self.can_jump((pos[0] + 2*direction,pos[1] - 2),team,False) is False:
-                            trails.append([(pos[0] + 2*direction,pos[1] - 2)])
-                        for trail in self.jump_trail_piece((pos[0] + 2*direction,pos[1] - 2),team):
-                            trails.append([(pos[0] + 2*direction,pos[1] - 2)] + trail)
-            return trails
+        return [list(trail) for trail in self._jump_trails(pos, team, False)]
     
     def jump_trail_king(self, pos,original_pos,prev_pos,already_jumped,team):
         """
@@ -641,49 +1730,85 @@ class Game:
         jump
             Parameters:
             pos(tup): position of the piece
-            team: team of piece
-            already_move(list): all the spots the king piece has already jumped 
+            original_pos(tup): position the king started jumping from
+            prev_pos(tup): position the king jumped from to get to pos, or None
+            already_jumped(list): all the spots the king piece has already jumped 
             through
+            team: team of piece
         Returns(list): A list of list of all the sequences a king piece 
         can jump throuogh
         """
-        trails = []
-        directions = [-1,1]
-        current_piece = self.game_board.board[pos[0]][pos[1]]
-        for i in directions:
-            if (self.is_valid_position(((pos[0] + i),pos[1] + 1)) and
-                self.game_board.board[pos[0] + i][pos[1] + 1] is not None):
-                if (self.game_board.board[(pos[0] + i)][pos[1] + 1].team !=team 
-                    and self.is_valid_position(((pos[0] + 2*i),pos[1] + 2))):
-                    if ((self.game_board.board[pos[0] + 2*i][pos[1] + 2] is None
-                        and ((pos[0] + 2*i),(pos[1] + 2))!= original_pos and 
-                        ((pos[0] + 2*i),(pos[1] + 2)) not in already_jumped)):
-                        if self.jump_trail_king((pos[0] + 2*i,pos[1] + 2),original_pos,pos,already_jumped + [pos],team) != []:
-                            for trail in (self.jump_trail_king((pos[0] + 2*i,pos[1] + 2),original_pos,pos,already_jumped + [pos],team)):
-                                trails.append(
-                                [((pos[0] + 2*i),(pos[1] + 2))] + trail)
-                        else:
-                            trails.append([((pos[0] + 2*i),(pos[1] + 2))])
-                    elif ((pos[0] + 2*i),(pos[1] + 2)) == original_pos and original_pos != prev_pos:
-                        trails.append([((pos[0] + 2*i),(pos[1] + 2))])
-            if (self.is_valid_position(((pos[0] + i),pos[1] - 1)) and
-                self.game_board.board[pos[0] + i][pos[1] - 1] is not None):
-                if (self.game_board.board[(pos[0] + i)][pos[1] - 1].team != team
-                    and self.is_valid_position(((pos[0] + 2*i),pos[1] - 2))):
-                    if (self.game_board.board[pos[0] + 2*i][pos[1] - 2] is None
-                        and ((pos[0] + 2*i),(pos[1] -2))!= original_pos and ((pos[0] + 2*i),(pos[1] - 2)) 
-                        not in already_jumped):
-                        if self.jump_trail_king((pos[0] + 2*i,pos[1] - 2),original_pos,pos,already_jumped + [pos],team) != []:
-                            for trail in (self.jump_trail_king((pos[0] + 2*i,pos[1] - 2),original_pos,pos, already_jumped + [pos],team)):
-                                trails.append(
-                                [((pos[0] + 2*i),(pos[1] - 2))] + trail)
+        visited = 0
+        for spot in already_jumped:
+            visited |= 1 << self.game_board.square(spot)
+        return [list(trail) for trail in self._jump_trails(
+            pos, team, True, original_pos, prev_pos, visited)]
+
+    def _jump_trails(self, pos, team, is_king, original_pos=None, 
+                     prev_pos=None, visited=0):
+        """
+        Lists every jump sequence a piece can make from pos, in the same order
+        and following the same rules as the original recursive search:
+        jumped pieces stay on the board while looking, only sequences that 
+        can't be continued are returned, and a king may not land on a spot it
+        has already jumped from. A king may end a sequence back on the spot it
+        started from, but not by jumping straight back to it.
+
+        Every branch is visited once. The spots already jumped from are kept
+        in a bitmask (bit game_board.square(spot)), and the sequences found 
+        from a spot are remembered for the rest of the call, so reaching the
+        same spot in the same state again costs nothing.
+        Parameters:
+            pos(tup): position of the piece
+            team(str): team of the piece
+            is_king(bool): whether to look at the jumps of a king
+            original_pos(tup): position the piece started from (defaults to 
+            pos)
+            prev_pos(tup): position the piece jumped from to get to pos
+            visited(int): bitmask of the spots already jumped from
+        Returns(list): list of tuples of landing positions, one per sequence
+        """
+        board = self.game_board
+        cells = board.cells
+        positions = board.positions
+        if original_pos is None:
+            original_pos = pos
+        if is_king:
+            jumps = board.tables.jumps[KING_DIRECTIONS]
+        elif team == "Red":
+            jumps = board.tables.jumps[ROW_DIRECTIONS[-1]]
+        else:
+            jumps = board.tables.jumps[ROW_DIRECTIONS[1]]
+        opponents = OPPONENT_CODES[team]
+        origin = board.square(original_pos)
+        memo = {}
+
+        def trails_from(sq, back_to_start, visited):
+            # back_to_start: whether landing on original_pos may end a 
+            # sequence here (it can't if we just jumped from there)
+            key = (sq, back_to_start, visited) if is_king else sq
+            trails = memo.get(key)
+            if trails is not None:
+                return trails
+            trails = []
+            here = 1 << sq
+            for over, land in jumps[sq]:
+                if cells[over] in opponents:
+                    if (cells[land] == 0 and land != origin and 
+                        not visited >> land & 1):
+                        rest = trails_from(land, sq != origin, visited | here)
+                        if rest:
+                            for trail in rest:
+                                trails.append((positions[land],) + trail)
                         else:
-                            trails.append([((pos[0] + 2*i),(pos[1] - 2))])
-                    elif ((pos[0] + 2*i),(pos[1] - 2)) == original_pos and \
-                    original_pos != prev_pos:
-                        trails.append([((pos[0] + 2*i),(pos[1] - 2))])
-                        
-        return trails
+                            trails.append((positions[land],))
+                    elif land == origin and back_to_start:
+                        trails.append((original_pos,))
+            memo[key] = trails
+            return trails
+
+        return trails_from(board.square(pos), original_pos != prev_pos, 
+                           visited)
    
     def list_moves_piece(self,pos,team):
         """
@@ -695,16 +1820,9 @@ class Game:
         """
         current_piece = self.game_board.get_piece(pos)
         positions = []
-        if self.can_jump(pos,team,False):
-            for trail in self.jump_trail_piece(pos,team):
-                positions.append(trail[len(trail) - 1])
-        if self.is_valid_position(((pos[0] + current_piece.dir),(pos[1] + 1))):
-            if self.game_board.board[pos[0] + current_piece.dir][pos[1] + 1] is None:
-                positions.append(((pos[0] + current_piece.dir),(pos[1] + 1)))
-        if self.is_valid_position(((pos[0] + current_piece.dir),(pos[1] - 1))):
-            if self.game_board.board[pos[0] + current_piece.dir][pos[1] - 1] is None:
-                positions.append(((pos[0] + current_piece.dir),(pos[1] - 1)))
-        return positions
+        for trail in self._jump_trails(pos, team, False):
+            positions.append(trail[-1])
+        return positions + self._simple_moves(pos, (current_piece.dir,))
         
     def list_moves_king(self,pos,team):
         """
@@ -714,21 +1832,37 @@ class Game:
             team(str): The team of the piece
         Returns(lst): List of all locations a king can go to
         """
-        current_piece = self.game_board.board[pos[0]][pos[1]]
         positions = []
-        directions = [-1,1]
-        if self.can_jump(pos,team,True):
-            for trail in self.jump_trail_king(pos,pos,None,[],team):
-                positions.append(trail[len(trail) - 1])
+        for trail in self._jump_trails(pos, team, True):
+            positions.append(trail[-1])
+        return positions + self._simple_moves(pos, (-1, 1))
+
+    def _simple_moves(self, pos, directions):
+        """
+        Lists the empty spots diagonally next to a position
+        Parameters:
+            pos(tup): The position of the piece
+            directions(tuple): the row directions (-1 and/or 1) to look in
+        Returns(lst): List of the empty neighbouring spots
+        """
+        return list(self._iter_steps(pos, directions))
+
+    def _iter_steps(self, pos, directions):
+        """
+        Yields what _simple_moves returns, one at a time
+        Parameters:
+            pos(tup): The position of the piece
+            directions(tuple): the row directions (-1 and/or 1) to look in
+        Returns(generator): the empty neighbouring spots
+        """
+        board = self.game_board
+        cells = board.cells
+        steps = board.tables.steps
+        sq = board.square(pos)
         for i in directions:
-            if self.is_valid_position(((pos[0] + i),(pos[1] + 1))):
-                if self.game_board.board[pos[0] + i][pos[1] + 1] is None:
-                    positions.append(((pos[0] + i),(pos[1]+1)))
-            if self.is_valid_position(((pos[0] + i),(pos[1] - 1))):
-                if self.game_board.board[pos[0] + i][pos[1]-1] is None:
-                    positions.append(((pos[0] + i),(pos[1] - 1)))
-        
-        return positions
+            for target in steps[ROW_DIRECTIONS[i]][sq]:
+                if cells[target] == 0:
+                    yield board.positions[target]
         
     def is_valid_move(self, curr_pos, new_pos):
         """
@@ -766,15 +1900,7 @@ class Game:
             bool: return True if neither team has any possible moves to make 
             (the draw condition), False otherwise
         """
-        if self.all_team_moves("Red") == {} and \
-        self.all_team_moves("Black") == {}:
-            return True
-        if self.since_piece_removed_black >= 40 or \
-        self.since_piece_removed_red >= 40: 
-            return True
-        if self.red_wants_to_draw and self.black_wants_to_draw: 
-            return True
-        return False
+        return self.status.draw_reason is not None
 
     def piece_at_pos(self,pos):
         """
@@ -803,6 +1929,7 @@ class Game:
             self.red_wants_to_draw = True
         elif team == "Black":
             self.black_wants_to_draw = True
+        self._status = None
     
     def response_to_draw(self,team,wants_to_draw):
         """
@@ -823,11 +1950,248 @@ class Game:
                 self.black_wants_to_draw = True
             else:
                 self.red_wants_to_draw = False
+        self._status = None
+
+class PieceSet(Set):
+    """
+    Read-only set of one team's pieces, backed by the Game's dictionary from
+    position to piece, so checking if a piece is in it takes O(1) time
+    """
+    __slots__ = ("_by_pos",)
+
+    def __init__(self, by_pos):
+        """
+        Constructor for the PieceSet class
+        Args:
+            by_pos(dict): dictionary from position to piece to show
+        """
+        self._by_pos = by_pos
+
+    @classmethod
+    def _from_iterable(cls, pieces):
+        # results of set operations like | and & are ordinary sets
+        return set(pieces)
+
+    def __contains__(self, piece):
+        pos = (getattr(piece, "y_pos", None), getattr(piece, "x_pos", None))
+        return self._by_pos.get(pos) is piece
+
+    def __iter__(self):
+        return iter(self._by_pos.values())
+
+    def __len__(self):
+        return len(self._by_pos)
+
+    def union(self, *others):
+        """
+        Returns a new set with the pieces in this set and in all the others
+        """
+        return set(self._by_pos.values()).union(*others)
+
+    def __repr__(self):
+        return f"PieceSet({set(self._by_pos.values())})"
+
+class BoardRows:
+    """
+    List-of-lists view of a MailboxBoard: rows[row][col] is the Piece at 
+    (row, col), or None. Setting rows[row][col] puts a piece there (or 
+    removes it when set to None).
+    """
+    __slots__ = ("_board",)
+
+    def __init__(self, board):
+        """
+        Constructor for the BoardRows class
+        Args:
+            board(MailboxBoard): the board to show
+        """
+        self._board = board
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("board row out of range")
+        return BoardRow(self._board, row)
+
+    def __len__(self):
+        return self._board._num_rows
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield BoardRow(self._board, row)
+
+class BoardRow:
+    """
+    One row of a BoardRows view
+    """
+    __slots__ = ("_board", "_row")
+
+    def __init__(self, board, row):
+        """
+        Constructor for the BoardRow class
+        Args:
+            board(MailboxBoard): the board to show
+            row(int): the row to show
+        """
+        self._board = board
+        self._row = row
+
+    def _pos(self, col):
+        if col < 0:
+            col += len(self)
+        if not 0 <= col < len(self):
+            raise IndexError("board column out of range")
+        return (self._row, col)
+
+    def __getitem__(self, col):
+        return self._board._piece_map().get(self._pos(col))
+
+    def __setitem__(self, col, piece):
+        pos = self._pos(col)
+        self._board.remove_piece(pos)
+        if piece is not None:
+            self._board._piece_map()[pos] = piece
+            self._board.cells[self._board.square(pos)] = \
+                piece_kind(piece.team, piece.is_king) + 1
+
+    def __len__(self):
+        return self._board._num_columns
+
+    def __iter__(self):
+        pieces = self._board._piece_map()
+        for col in range(len(self)):
+            yield pieces.get((self._row, col))
+
+class Move:
+    """
+    A move of one piece, along with the jumps it makes. It unpacks, indexes
+    and compares like the (old_pos, new_pos) pair used everywhere else, so it
+    can be given to anything that expects one.
+    """
+    __slots__ = ("origin", "path", "captured")
+
+    def __init__(self, origin, path, captured=()):
+        """
+        Constructor for the Move class
+        Args:
+            origin(tup): position the piece starts on
+            path(tuple): every position the piece lands on, in order (just 
+            the new position if the move is not a jump)
+            captured(tuple): positions of the pieces it jumps, in order
+        """
+        self.origin = origin
+        self.path = path
+        self.captured = captured
+
+    @property
+    def end(self):
+        """
+        Position the piece ends on
+        """
+        return self.path[-1]
+
+    @property
+    def num_jumps(self):
+        """
+        Number of jumps the move makes, like Game.num_jumps
+        """
+        return len(self.captured)
+
+    def __iter__(self):
+        yield self.origin
+        yield self.path[-1]
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        return (self.origin, self.path[-1])[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Move):
+            other = (other.origin, other.path[-1])
+        return (self.origin, self.path[-1]) == other
+
+    def __hash__(self):
+        return hash((self.origin, self.path[-1]))
+
+    def __repr__(self):
+        return f"Move({self.origin}, {self.path}, {self.captured})"
+
+class GameStatus(NamedTuple):
+    """
+    Whether a game is over and why, as given by Game.status
+    """
+    #the team that has won, or None. A team wins when the other resigns or
+    #can't move; if neither can move, this is "Red" (checked first), and
+    #draw_reason says the game is also a draw
+    winner: Optional[str]
+    #why the game is a draw ("no moves", "40 moves" or "agreed"), or None
+    draw_reason: Optional[str]
+    #moves a team has made since it last jumped a piece (the larger of the
+    #two teams' counts); the game is a draw when this reaches 40
+    moves_since_capture: int
+
+    @property
+    def is_done(self):
+        """
+        Whether the game is over
+        """
+        return self.winner is not None or self.draw_reason is not None
+
+class Snapshot(NamedTuple):
+    """
+    Everything Game.restore needs to put a game back the way it was
+    """
+    #the pieces on the board (bytes with one byte per square for Game, a 
+    #tuple of bitmasks for BitboardGame)
+    board: object
+    #the team whose turn it is
+    side_to_move: str
+    #since_piece_removed_red
+    since_red: int
+    #since_piece_removed_black
+    since_black: int
+    #whether red wants to draw
+    red_wants_to_draw: bool
+    #whether black wants to draw
+    black_wants_to_draw: bool
+    #the winner attribute ("Red", "Black" or None)
+    winner: Optional[str]
+    #position_hash
+    position_hash: int
+
+class UndoRecord(NamedTuple):
+    """
+    What Game.make_move changed, so that Game.unmake_move can change it back
+    """
+    #original position of the moved piece
+    old_pos: Tuple[int, int]
+    #position the piece was moved to
+    new_pos: Tuple[int, int]
+    #the Piece that was moved (for BitboardGame, a (team, is_king) pair)
+    piece: object
+    #the Pieces that were jumped and removed from the board (for 
+    #BitboardGame, the bitmasks of the men and kings that were removed)
+    captured: tuple
+    #whether the moved piece was made a king by the move
+    promoted: bool
+    #since_piece_removed_red before the move
+    since_red: int
+    #since_piece_removed_black before the move
+    since_black: int
+    #board version, cached moves and status from before the move
+    cache: Optional[tuple]
+    #position_hash and side_to_move from before the move
+    position: Optional[tuple] = None
 
 class Piece(): 
     """
     Class representing playable pieces on the board
     """
+    __slots__ = ("x_pos", "y_pos", "team", "is_king")
+
     def __init__(self, pos, team_color, is_king = False):
         """
         Constructor for the Piece class. Utilizes the x and y positions of the 
@@ -839,32 +2203,49 @@ class Piece():
             team(TeamColor) - the team the Piece is on
         Returns: None
         """
-        #Piece's position represented by an (int, int) tuple with (x,y) position
+        #Piece's position; pos gives it as a (row, col) tuple
         # Piece's x position or col
         self.x_pos = pos[1]
         # Piece's y position or row
         self.y_pos = pos[0]
-        #The team's position, which depends on the x_pos and y_pos attributes
-        self.pos = (self.y_pos,self.x_pos)
         # The team of the piece which is either "Red" or "Black"
         self.team = team_color
         #The attribute that describes if the piece is a king or not. By default 
         #it is false, but if the piece is a king the attribute is equal to True
         self.is_king = is_king
-        #The direction that the piece travels in on the board if it is not a king
-        self.dir = None
-        if self.team == "Red":
-            self.dir = -1
-        else:
-            self.dir = 1
-        # Color of the space that the Piece is on; by the rules, must always be 
-        # on a dark space, so raises an AssertionError if this doesn't happen as
-        # an additional verifier
-        if (self.x_pos + self.y_pos) % 2 == 1:
-            self.space_color = 'dark'
-        else:
-            self.space_color = 'light'
+        # By the rules, a Piece must always be on a dark space, so raises an 
+        # AssertionError if this doesn't happen as an additional verifier
         assert self.space_color == 'dark'
+
+    @property
+    def pos(self):
+        """
+        The piece's position
+        Returns(tup): (row, col), from y_pos and x_pos
+        """
+        return (self.y_pos, self.x_pos)
+
+    @pos.setter
+    def pos(self, pos):
+        self.y_pos = pos[0]
+        self.x_pos = pos[1]
+
+    @property
+    def dir(self):
+        """
+        The direction that the piece travels in on the board if it is not a 
+        king
+        Returns(int): -1 (up) for Red, 1 (down) for Black
+        """
+        return -1 if self.team == "Red" else 1
+
+    @property
+    def space_color(self):
+        """
+        Color of the space that the Piece is on
+        Returns(str): 'dark' or 'light'
+        """
+        return 'dark' if (self.x_pos + self.y_pos) % 2 == 1 else 'light'
     
     def __str__(self):
         """
@@ -892,14 +2273,7 @@ class Piece():
         """
         self.y_pos = pos[0]
         self.x_pos = pos[1]
-        self.pos = pos
         
-    def is_king(self):
-        """
-        Determines if a Piece object is a king or not
-        Returns (bool): whether or not its a king piece
-        """
-        return self.is_king
     def can_move(self, new_pos):
         '''
         Determines if Piece can move to the new position, based on the rules of 
@@ -11,13 +11,16 @@ Resources Consulted:
     - this was helpful in initializing the sprite class
 '''
 import os
+from itertools import chain
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 import pygame 
 
 from checkers import Board, Game, Piece, GameType
+from bitboard import BitboardGame
 from mocks import StubCheckerboard, MockGame
 from sprites import PieceSprite
-from bot import RandomBot, SmartBot
+from bot import AlphaBetaBot, RandomBot, SmartBot
+from mcts import DEFAULT_PLAYOUTS, MCTSBot
 import click
 from typing import Union
 
@@ -31,11 +34,14 @@ YELLOW = (255, 204, 0)
 GREEN = (75, 139, 59)
 GOLD = (255, 215, 0)
 
+#shortest time a bot takes to move (in milliseconds), so its moves can be seen
+BOT_DELAY_MS = 1000
+
 class CheckersPlayer():
     '''
     simple class to store player information
     '''
-    bot: Union[None, SmartBot, RandomBot]
+    bot: Union[None, SmartBot, RandomBot, AlphaBetaBot, MCTSBot]
 
     def __init__(self, bot = None):
         '''
@@ -54,6 +60,15 @@ class CheckersPlayer():
             self.color = self.bot._color
         else:
             self.color = None
+
+    def close(self):
+        '''
+        stops the bot's worker processes, if it has any
+
+        args: none
+        '''
+        if isinstance(self.bot, (AlphaBetaBot, MCTSBot)):
+            self.bot.close()
     
     def can_play_checkers (self, other):
         '''
@@ -138,7 +153,7 @@ class GUIPlayer():
         args: 
             None
         '''
-        all_pieces = self.game.red_pieces.union(self.game.black_pieces)
+        all_pieces = chain(self.game.red_pieces, self.game.black_pieces)
         for piece in all_pieces:
             sprite = PieceSprite(piece, self.sq_size)
             self.all_sprites_list.add(sprite)
@@ -152,9 +167,11 @@ class GUIPlayer():
 
         Args: None
         '''
-        pieces = self.game.red_pieces.union(self.game.black_pieces)
+        red_pieces = self.game.red_pieces
+        black_pieces = self.game.black_pieces
         for sprite in self.all_sprites_list:
-            if sprite.piece not in pieces:
+            if sprite.piece not in red_pieces and \
+            sprite.piece not in black_pieces:
                 sprite.kill() #will kill sprites that were jumped over
         self.all_sprites_list.update() #sets new pos for sprites that moved
 
@@ -258,8 +275,10 @@ class GUIPlayer():
         args: None
         '''
         assert self.curr_player.is_bot
-        pygame.time.wait(1000) #bot delay (edit later)
+        start = pygame.time.get_ticks()
         org_pos, new_pos = self.curr_player.bot.suggest_move(self.game)
+        #the time spent searching counts towards the bot delay
+        pygame.time.wait(max(0, BOT_DELAY_MS - (pygame.time.get_ticks() - start)))
         self.selected_piece = self.game.piece_at_pos((org_pos[0], org_pos[1]))
         self.move_selected_piece(new_pos[0], new_pos[1])
 
@@ -331,25 +350,46 @@ class GUIPlayer():
                               case_sensitive=False), default="real")
 @click.option('--num-piece-rows', type=click.INT, default=3)
 @click.option('--black-type',
-            type=click.Choice(['human', 'random-bot', 'smart-bot'], 
+            type=click.Choice(['human', 'random-bot', 'smart-bot', 
+                               'alphabeta-bot', 'mcts-bot'], 
                               case_sensitive=False), default="human")
 @click.option('--red-type',
-            type=click.Choice(['human', 'random-bot', 'smart-bot'], 
+            type=click.Choice(['human', 'random-bot', 'smart-bot', 
+                               'alphabeta-bot', 'mcts-bot'], 
                               case_sensitive=False), default="smart-bot")
-
-def cmd(mode, num_piece_rows, black_type, red_type):
+@click.option('--engine',
+            type=click.Choice(['grid', 'bitboard'],
+                              case_sensitive=False), default="grid")
+@click.option('--search-depth', type=click.INT, 
+              default=AlphaBetaBot.DEFAULT_DEPTH)
+@click.option('--bot-time', type=click.INT, default=None)
+@click.option('--playouts', type=click.INT, default=DEFAULT_PLAYOUTS)
+@click.option('--workers', type=click.INT, default=1)
+
+def cmd(mode, num_piece_rows, black_type, red_type, engine, search_depth,
+        bot_time, playouts, workers):
     '''
     allows checkers game to played from command line
 
     inputs:
         mode(str): whether game is running on real, stub, or mock
         num_piece_rows(int): number of rows of pieces
-        black_type(str): whether black player is a human, random bot, or
-        smart bot
-        red_type(str):whether black player is a human, random bot, or
-        smart bot
+        black_type(str): whether black player is a human, random bot, 
+        smart bot, alphabeta bot or mcts bot
+        red_type(str):whether black player is a human, random bot, 
+        smart bot, alphabeta bot or mcts bot
+        engine(str): which game engine the real mode uses, grid or bitboard
+        search_depth(int): number of moves alphabeta bots search ahead
+        bot_time(int): if given, milliseconds alphabeta and mcts bots search
+        each move for (alphabeta bots deepen the search until the time is up)
+        playouts(int): number of playouts mcts bots run per move, on each 
+        worker
+        workers(int): number of processes alphabeta and mcts bots search on
+        (0 for one per CPU)
     '''
-    if mode == "real":
+    if mode == "real" and engine == "bitboard":
+        game = BitboardGame(num_piece_rows)
+    elif mode == "real":
         game = Game(num_piece_rows)
     elif mode == "stub":
         game = StubCheckerboard(num_piece_rows)
@@ -360,6 +400,13 @@ def cmd(mode, num_piece_rows, black_type, red_type):
         player1 = CheckersPlayer()
     elif black_type == 'random-bot':
         player1 = CheckersPlayer(RandomBot(game, 'Black', 'Red'))
+    elif black_type == 'alphabeta-bot':
+        player1 = CheckersPlayer(AlphaBetaBot(game, 'Black', 'Red', 
+                                              search_depth, bot_time, 
+                                              workers=workers))
+    elif black_type == 'mcts-bot':
+        player1 = CheckersPlayer(MCTSBot(game, 'Black', 'Red', playouts, 
+                                         bot_time, workers))
     else:
         player1 = CheckersPlayer(SmartBot(game, 'Black', 'Red'))
 
@@ -367,11 +414,22 @@ def cmd(mode, num_piece_rows, black_type, red_type):
         player2 = CheckersPlayer()
     elif red_type == 'random-bot':
         player2= CheckersPlayer(RandomBot(game, 'Red', 'Black'))
+    elif red_type == 'alphabeta-bot':
+        player2 = CheckersPlayer(AlphaBetaBot(game, 'Red', 'Black', 
+                                              search_depth, bot_time, 
+                                              workers=workers))
+    elif red_type == 'mcts-bot':
+        player2 = CheckersPlayer(MCTSBot(game, 'Red', 'Black', playouts, 
+                                         bot_time, workers))
     else:
         player2 = CheckersPlayer(SmartBot(game, 'Red', 'Black'))
 
     gui = GUIPlayer(game, player1, player2)
-    gui.play_checkers()
+    try:
+        gui.play_checkers()
+    finally:
+        player1.close()
+        player2.close()
 
 if __name__ == "__main__":
     cmd()    
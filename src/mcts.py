@@ -0,0 +1,365 @@
+"""
+Monte Carlo tree search for Checkers
+
+MCTSBot picks moves with UCT: it grows a tree of positions from the current
+one, one position per playout. Each playout walks down the tree, at each
+position taking the move with the best upper confidence bound
+    wins / visits + EXPLORATION * sqrt(ln(parent visits) / visits)
+(so moves that have done well are tried more, but every move keeps getting
+tried now and then), adds one new position to the tree, and from there
+plays random moves, like RandomBot, until the game is over. The result (a
+win, loss or draw) is added to every position on the way down. The move
+played is the one the playouts tried the most.
+
+Playouts don't use Game: a position is the four bitmasks of
+BitboardGame._board_state, the team to move and the two draw counters, and
+moves are played with bitboard.piece_children, so a playout doesn't make
+any Piece objects. Results follow Game.status, counted the way simulate
+counts them: a team that can't move has lost (when neither team can move,
+Game.status names Red the winner, and so does a playout), and otherwise
+going 40 moves without a capture is a draw. Resigning and draw offers don't
+happen in playouts.
+
+With more than one worker, the search is root parallel: each worker process
+grows its own tree from the same position (with its own random moves), and
+the numbers of visits of the moves at the root are added up over the
+workers. Each worker gets the whole playout or time budget, so the bot gets
+stronger with every core it is given.
+
+Examples:
+    1) Pick a move with 2000 playouts:
+        bot = MCTSBot(game, "Black", "Red", playouts=2000)
+        old_pos, new_pos = bot.suggest_move(game)
+    2) Search for half a second on every core, then stop the workers:
+        bot = MCTSBot(game, "Black", "Red", time_limit_ms=500, workers=0)
+        old_pos, new_pos = bot.suggest_move(game)
+        bot.close()
+    3) Through the command line (see bot.py):
+        python3 src/bot.py --player1 mcts --player2 alphabeta --playouts 500
+"""
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from bitboard import TEAMS, children, geometry, movers, piece_children
+from checkers import MAN_DIRECTIONS
+
+# Weight of exploring in the upper confidence bound
+EXPLORATION = 1.4
+
+# Number of playouts per move (per worker) if there is no time limit
+DEFAULT_PLAYOUTS = 1000
+
+# A game is a draw once a team has gone this many moves without a capture,
+# as in Game.status
+DRAW_MOVES = 40
+
+# Result of a playout where neither team wins (the others are indexes into
+# TEAMS)
+DRAW = 2
+
+# Points a team gets for each result, by result: a win is 1, a draw is half
+POINTS = ((1, 0), (0, 1), (0.5, 0.5))
+
+
+class MCTSBot:
+    """
+    Bot that picks moves with Monte Carlo tree search (UCT), on one or more
+    processes
+    """
+    def __init__(self, game, color, opponent_color,
+                 playouts=DEFAULT_PLAYOUTS, time_limit_ms=None, workers=1,
+                 seed=None):
+        """
+        Constructor for the MCTSBot class
+        Parameters:
+            game(Game): initial game the bot will play on
+            color(str): the bot's team color
+            opponent_color(str): the opponent's color
+            playouts(int): playouts each worker runs per move, if there is
+            no time limit
+            time_limit_ms(int): time each move is searched for in
+            milliseconds, or None to run a number of playouts
+            workers(int): number of processes searching at once (0 for one
+            per CPU)
+            seed(int): seed for the random moves, or None
+        """
+        self._game = game
+        self._color = color
+        self._opponent_color = opponent_color
+        self._playouts = playouts
+        self._time_limit_ms = time_limit_ms
+        self._workers = workers or os.cpu_count() or 1
+        self._rng = random.Random(seed)
+        # the worker processes, started on the first search that uses them
+        self._pool = None
+        # number of visits of each move (as (old_pos, new_pos)) at the root
+        # of the last search, over every worker
+        self.visits = {}
+        # number of playouts of the last search, over every worker
+        self.playouts = 0
+
+    def suggest_move(self, game):
+        """
+        Suggests the move that the playouts tried the most
+        Parameters:
+            game(Game): the game to play, updated with each move
+        Returns(tuple): the suggested move as (old_pos, new_pos), or None if
+        the game is over
+        """
+        width = game.width
+        bits = [0, 0, 0, 0]
+        for sq, code in enumerate(game.to_cells()):
+            if code:
+                bits[code - 1] |= 1 << sq
+        # the search starts with the bot's own moves, even if the game has
+        # the other team to move
+        task = (width, bits, TEAMS.index(self._color),
+                (game.since_piece_removed_red,
+                 game.since_piece_removed_black),
+                self._playouts, self._time_limit_ms)
+        seeds = [self._rng.getrandbits(64) for _ in range(self._workers)]
+        if self._workers == 1:
+            results = [search_root(*task, seeds[0])]
+        else:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self._workers)
+            results = self._pool.starmap(search_root,
+                                         [task + (seed,) for seed in seeds])
+
+        visits = {}
+        self.playouts = 0
+        for root_visits, playouts in results:
+            self.playouts += playouts
+            for move, count in root_visits.items():
+                visits[move] = visits.get(move, 0) + count
+        self.visits = {(divmod(old_sq, width), divmod(new_sq, width)): count
+                       for (old_sq, new_sq), count in visits.items()}
+        if not self.visits:
+            return None
+        return max(self.visits, key=self.visits.get)
+
+    def close(self):
+        """
+        Stops the worker processes, if there are any. A bot that searches
+        on more than one worker has to be closed once it is no longer
+        needed.
+        Parameters: None
+        Returns: None
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+class Node:
+    """
+    A position in the search tree
+    """
+    __slots__ = ("bits", "t", "since", "outcome", "parent", "children",
+                 "untried", "visits", "points")
+
+    def __init__(self, geo, bits, t, since, parent=None):
+        """
+        Constructor for the Node class
+        Parameters:
+            geo(Geometry): tables for the board
+            bits(list): bitmasks of the red men, red kings, black men and
+            black kings
+            t(int): index in TEAMS of the team to move
+            since(tuple): moves since each team (Red, then Black) last
+            captured
+            parent(Node): the position before, or None for the root
+        """
+        self.bits = bits
+        self.t = t
+        self.since = since
+        # the game's result if it is over here (see outcome), or None
+        self.outcome = outcome(geo, bits, since)
+        self.parent = parent
+        # positions already in the tree, by the move (as (square moved
+        # from, square moved to)) that leads to them
+        self.children = {}
+        # moves that don't have a position in the tree yet, as
+        # (square moved from, square moved to, bitmasks after the move)
+        self.untried = None
+        # number of playouts through this position
+        self.visits = 0
+        # points of the playouts through this position, for the team that
+        # moved into it
+        self.points = 0.0
+
+
+def search_root(width, bits, t, since, playouts, time_limit_ms, seed):
+    """
+    Grows a search tree from a position, on this process
+    Parameters:
+        width(int): width of the board
+        bits(list): bitmasks of the red men, red kings, black men and black
+        kings
+        t(int): index in TEAMS of the team to move
+        since(tuple): moves since each team last captured
+        playouts(int): number of playouts to run, if there is no time limit
+        time_limit_ms(int): time to search for in milliseconds, or None
+        seed(int): seed for the random moves
+    Returns(tuple): the number of visits of each move at the root (by
+    (square moved from, square moved to)) and the number of playouts run
+    """
+    geo = geometry(width)
+    rng = random.Random(seed)
+    root = Node(geo, bits, t, since)
+    if root.outcome is not None:
+        return {}, 0
+    deadline = None
+    if time_limit_ms is not None:
+        deadline = time.perf_counter() + time_limit_ms / 1000
+    count = 0
+    while True:
+        if deadline is None:
+            if count >= playouts:
+                break
+        elif count and time.perf_counter() >= deadline:
+            break
+        node = _select(geo, root, rng)
+        result = node.outcome
+        if result is None:
+            result = playout(geo, list(node.bits), node.t, list(node.since),
+                             rng)
+        while node is not None:
+            node.visits += 1
+            node.points += POINTS[result][1 - node.t]
+            node = node.parent
+        count += 1
+    return ({move: child.visits for move, child in root.children.items()},
+            count)
+
+
+def _select(geo, root, rng):
+    """
+    Walks down the tree by the upper confidence bound, and adds a position
+    for a move that hasn't been tried yet
+    Parameters:
+        geo(Geometry): tables for the board
+        root(Node): the root of the tree
+        rng(random.Random): source of random numbers
+    Returns(Node): the added position, or the position the game ends in
+    """
+    node = root
+    while node.outcome is None:
+        if node.untried is None:
+            node.untried = list(children(geo, node.bits, node.t))
+            rng.shuffle(node.untried)
+        if node.untried:
+            old_sq, new_sq, child = node.untried.pop()
+            since = _next_since(node.bits, node.t, node.since, child)
+            new_node = Node(geo, child, 1 - node.t, since, node)
+            node.children[(old_sq, new_sq)] = new_node
+            return new_node
+        log_visits = math.log(node.visits)
+        node = max(node.children.values(),
+                   key=lambda child: child.points / child.visits +
+                   EXPLORATION * math.sqrt(log_visits / child.visits))
+    return node
+
+
+def playout(geo, bits, t, since, rng):
+    """
+    Plays random moves until the game is over: a random piece that can
+    move, then a random move of that piece, like RandomBot
+    Parameters:
+        geo(Geometry): tables for the board
+        bits(list): the four bitmasks
+        t(int): index in TEAMS of the team to move
+        since(list): moves since each team last captured
+        rng(random.Random): source of random numbers
+    Returns(int): the index in TEAMS of the winner, or DRAW
+    """
+    while True:
+        can_move = _movers(geo, bits, t)
+        stuck = [False, False]
+        stuck[t] = not can_move
+        stuck[1 - t] = not _movers(geo, bits, 1 - t)
+        result = _result(stuck[0], stuck[1], since)
+        if result is not None:
+            return result
+        squares = []
+        while can_move:
+            bit = can_move & -can_move
+            can_move ^= bit
+            squares.append(bit.bit_length() - 1)
+        _, child = rng.choice(list(piece_children(geo, bits, t,
+                                                  rng.choice(squares))))
+        since = _next_since(bits, t, since, child)
+        bits = child
+        t = 1 - t
+
+
+def outcome(geo, bits, since):
+    """
+    Works out whether the game is over, like Game.status
+    Parameters:
+        geo(Geometry): tables for the board
+        bits(list): the four bitmasks
+        since(tuple): moves since each team last captured
+    Returns(int): the index in TEAMS of the winner, DRAW, or None if the
+    game goes on
+    """
+    return _result(not _movers(geo, bits, 0), not _movers(geo, bits, 1), 
+                   since)
+
+
+def _result(red_stuck, black_stuck, since):
+    """
+    Works out whether the game is over from whether each team can move, in
+    the same order as Game.status: a team that can't move loses (Red wins
+    if neither team can), even after 40 moves without a capture
+    Parameters:
+        red_stuck(bool): whether Red can't move
+        black_stuck(bool): whether Black can't move
+        since(tuple): moves since each team last captured
+    Returns(int): the index in TEAMS of the winner, DRAW, or None if the
+    game goes on
+    """
+    if black_stuck:
+        return 0
+    if red_stuck:
+        return 1
+    if max(since) >= DRAW_MOVES:
+        return DRAW
+    return None
+
+
+def _movers(geo, bits, t):
+    """
+    Finds the pieces of a team that can move
+    Parameters:
+        geo(Geometry): tables for the board
+        bits(list): the four bitmasks
+        t(int): index in TEAMS of the team
+    Returns(int): bitmask of the pieces
+    """
+    men, kings = bits[2 * t], bits[2 * t + 1]
+    opponents = bits[2 - 2 * t] | bits[3 - 2 * t]
+    return movers(geo, men, kings, opponents,
+                  geo.full ^ (men | kings | opponents),
+                  MAN_DIRECTIONS[TEAMS[t]])
+
+
+def _next_since(bits, t, since, child):
+    """
+    Updates the draw counters for a move
+    Parameters:
+        bits(list): the four bitmasks before the move
+        t(int): index in TEAMS of the team that moved
+        since(tuple): moves since each team last captured, before the move
+        child(list): the four bitmasks after the move
+    Returns(tuple): the counters after the move
+    """
+    captured = (bits[2 - 2 * t] | bits[3 - 2 * t]) != \
+        (child[2 - 2 * t] | child[3 - 2 * t])
+    if t == 0:
+        return (0 if captured else since[0] + 1, since[1])
+    return (since[0], 0 if captured else since[1] + 1)
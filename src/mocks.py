@@ -1,3 +1,4 @@
+from itertools import chain
 from typing import Optional, List, Union
 
 # used in GUI
@@ -18,7 +19,7 @@ class StubCheckerboard:
         piece.update_pos(new_pos)
     
     def get_piece(self, row, col):
-        for piece in self.red_pieces.union(self.black_pieces):
+        for piece in chain(self.red_pieces, self.black_pieces):
             if piece.pos == (row, col):
                 return piece
         return None
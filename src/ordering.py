@@ -0,0 +1,184 @@
+"""
+Move ordering for Checkers searches
+
+Alpha-beta search prunes the most when the best move of each position is
+tried first. Game.all_team_moves gives the moves in the order the pieces
+happen to be stored in, which is close to the worst order, so searches put
+the moves through an orderer first. An orderer only sorts the moves and
+learns from the moves that cause cutoffs, so it can be used by any search
+that calls it:
+    new_search()                    once before each search
+    order(game, moves, ply)         sorts the moves of one team
+    cutoff(game, move, ply, depth)  a move was good enough to stop searching
+                                    the other moves of its position
+
+MoveOrderer tries the moves in this order:
+    1) jumps, the ones that jump the most pieces first (Move.num_jumps)
+    2) moves that crown a man, like Game.will_king
+    3) killer moves: the last KILLER_SLOTS moves that caused a cutoff at the
+       same number of moves into the search, since positions that far in
+       are often alike and the same move tends to refute them
+    4) the rest, by their history score: a score for each pair of from and
+       to squares that goes up by depth * depth each time the move causes a
+       cutoff, so moves that worked deep in the tree count the most
+
+Examples:
+    1) Search with the full ordering (AlphaBetaBot's default):
+        bot = AlphaBetaBot(game, "Black", "Red", orderer=MoveOrderer())
+    2) Search with jumps first only, and compare the number of positions:
+        bot = AlphaBetaBot(game, "Black", "Red", orderer=CaptureOrderer())
+    3) Through the command line (see bot.py):
+        python3 src/bot.py ordering -d 6
+"""
+
+# Number of killer moves kept for each number of moves into the search
+KILLER_SLOTS = 2
+
+# Sort scores of each kind of move; each one is above any score of the kinds
+# after it
+CAPTURE_SCORE = 1 << 48
+PROMOTION_SCORE = 1 << 44
+KILLER_SCORE = 1 << 40
+
+# History scores are halved once one goes over this, so that they stay below
+# KILLER_SCORE and newer cutoffs count more than old ones
+HISTORY_MAX = 1 << 32
+
+
+class Orderer:
+    """
+    Orderer that leaves the moves in the order they were generated in. The
+    other orderers are built on it.
+    """
+    def new_search(self):
+        """
+        Gets ready for a new search
+        Parameters: None
+        Returns: None
+        """
+
+    def order(self, game, moves, ply):
+        """
+        Sorts the moves of one team, the ones to try first first
+        Parameters:
+            game(Game): the game, in the position the moves are from
+            moves(list): the Moves
+            ply(int): number of moves played since the search started
+        Returns(list): the sorted moves (moves itself, sorted in place)
+        """
+        return moves
+
+    def cutoff(self, game, move, ply, depth):
+        """
+        Learns from a move that was good enough to stop the search of its
+        position
+        Parameters:
+            game(Game): the game, in the position the move is from
+            move(Move): the move
+            ply(int): number of moves played since the search started
+            depth(int): number of moves that were left to search
+        Returns: None
+        """
+
+
+class CaptureOrderer(Orderer):
+    """
+    Orderer that puts jumps first, the ones that jump the most pieces first
+    """
+    def order(self, game, moves, ply):
+        moves.sort(key=lambda move: -move.num_jumps)
+        return moves
+
+
+class MoveOrderer(Orderer):
+    """
+    Orderer that puts jumps first, then moves that crown a man, then killer
+    moves, then the rest by their history score
+    """
+    def __init__(self):
+        """
+        Constructor for the MoveOrderer class
+        Parameters: None
+        """
+        # the latest moves that caused a cutoff (as (old_pos, new_pos)),
+        # newest first, for each number of moves into the search
+        self.killers = []
+        # history score of each (from square, to square) pair, where a
+        # square is row * width + col
+        self.history = {}
+
+    def new_search(self):
+        """
+        Gets ready for a new search. Killer moves are forgotten, since the
+        positions at each ply are not the same any more, and history scores
+        are halved, so the new search learns its own.
+        Parameters: None
+        Returns: None
+        """
+        self.killers = []
+        self._age_history()
+
+    def order(self, game, moves, ply):
+        width = game.width
+        # the row each kind of man is crowned on, by its square's value
+        # (piece_kind plus 1): row 0 for Red men and the last row for Black
+        # men
+        crown_rows = {1: 0, 3: width - 1}
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+        cells = None
+        scores = []
+        for move in moves:
+            old_pos, new_pos = move
+            if move.num_jumps:
+                score = CAPTURE_SCORE * move.num_jumps
+            elif (old_pos, new_pos) in killers:
+                slot = killers.index((old_pos, new_pos))
+                score = KILLER_SCORE * (KILLER_SLOTS - slot)
+            else:
+                score = history.get((old_pos[0] * width + old_pos[1],
+                                     new_pos[0] * width + new_pos[1]), 0)
+            if new_pos[0] == 0 or new_pos[0] == width - 1:
+                if cells is None:
+                    cells = game.to_cells()
+                if crown_rows.get(cells[old_pos[0] * width + old_pos[1]]) \
+                        == new_pos[0]:
+                    score += PROMOTION_SCORE
+            scores.append(score)
+        # moves with the same score stay in the order they were in
+        order = sorted(range(len(moves)), key=scores.__getitem__, 
+                       reverse=True)
+        moves[:] = [moves[i] for i in order]
+        return moves
+
+    def cutoff(self, game, move, ply, depth):
+        old_pos, new_pos = move
+        width = game.width
+        key = (old_pos[0] * width + old_pos[1], new_pos[0] * width + new_pos[1])
+        score = self.history.get(key, 0) + depth * depth
+        self.history[key] = score
+        if score > HISTORY_MAX:
+            self._age_history()
+        if move.num_jumps:
+            # jumps are already tried first
+            return
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if (old_pos, new_pos) in killers:
+            killers.remove((old_pos, new_pos))
+        killers.insert(0, (old_pos, new_pos))
+        del killers[KILLER_SLOTS:]
+
+    def _age_history(self):
+        """
+        Halves every history score, dropping the ones that get to 0
+        Parameters: None
+        Returns: None
+        """
+        self.history = {key: score // 2 for key, score in self.history.items()
+                        if score > 1}
+
+
+# Orderers by the names the command line uses for them
+ORDERERS = {"none": Orderer, "captures": CaptureOrderer, "full": MoveOrderer}
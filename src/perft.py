@@ -0,0 +1,322 @@
+"""
+Perft (move path counting) for Checkers
+
+Game.perft counts the move sequences of a given length that can be played from
+a position. The counts only depend on the rules, so comparing them with the
+reference counts stored here catches move generation mistakes (including ones
+that only show up deep in a game), and timing them gives one number for how
+fast move generation is.
+
+The reference positions are the starting positions for n = 1 to 5 and a few
+positions with kings and long jump sequences. Positions are written as
+diagrams: one string per row, from row 0 down, with one character per column:
+    .   empty square
+    b   black piece     B   black king
+    r   red piece       R   red king
+
+Examples:
+    1) Check an engine against every reference count:
+        for row in check_reference(Game):
+            print(row)
+    2) Load a reference position:
+        game = reference_game(BitboardGame, "king ring")
+    3) Count on 8 processes that share a transposition table:
+        parallel_perft(BitboardGame(3), 9, workers=8)
+    4) Through the command line (see bot.py):
+        python3 src/bot.py perft --engine bitboard
+        python3 src/bot.py perft -s 3 -d 9 --workers 8
+"""
+import multiprocessing
+import os
+import time
+
+from transposition import SharedTable
+
+# Characters used in diagrams, by piece_kind
+PIECE_CHARS = "rRbB"
+
+# parallel_perft keeps splitting the tree until there are this many subtrees
+# per process, so processes that get small subtrees don't sit idle at the end
+TASKS_PER_WORKER = 16
+
+# Subtrees this many moves deep or less aren't split any further
+MIN_TASK_DEPTH = 3
+
+# Default size of the transposition table used by parallel_perft, in MB
+TABLE_MB = 64
+
+# Reference positions: name -> (n, diagram, side to move, counts), where
+# diagram is None for the starting position and counts[i] is the perft count
+# for depth i + 1
+REFERENCE = {
+    "start n=1": (1, None, "Black",
+                  (3, 9, 16, 29, 47, 74, 136)),
+    "start n=2": (2, None, "Black",
+                  (5, 25, 141, 770, 4222, 22223, 114847)),
+    "start n=3": (3, None, "Black",
+                  (7, 49, 379, 2872, 23582, 189143)),
+    "start n=4": (4, None, "Black",
+                  (9, 81, 793, 7654, 79010, 801609)),
+    "start n=5": (5, None, "Black",
+                  (11, 121, 1431, 16748, 207750)),
+    # a king that can jump around a square of pieces and end back where it
+    # started
+    "king ring": (3, [
+        "........",
+        "........",
+        "...R....",
+        "..b.b...",
+        "........",
+        "..b.b...",
+        "........",
+        "B.....r.",
+    ], "Red", (5, 37, 210, 1488, 7761, 53622)),
+    # a piece with branching jump sequences that meet again, and red pieces
+    # about to be crowned
+    "man ladder": (3, [
+        ".b......",
+        "..r.r.r.",
+        "........",
+        "..r.r.r.",
+        "........",
+        "..r.r...",
+        "........",
+        "B.......",
+    ], "Black", (3, 41, 178, 1948, 8633, 84593)),
+    # kings on a grid of pieces, with many long jump sequences
+    "king lattice": (3, [
+        ".R......",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        ".R......",
+        "........",
+    ], "Red", (10, 112, 618, 6218, 31663)),
+    "king lattice n=5": (5, [
+        ".R..........",
+        "..b.b.b.b.b.",
+        "............",
+        "..b.b.b.b.b.",
+        "............",
+        "..b.b.b.b.b.",
+        "............",
+        "..b.b.b.b.b.",
+        "............",
+        "..b.b.b.b.b.",
+        ".R..........",
+        "............",
+    ], "Red", (26, 653, 5326, 122777)),
+    # positions from random games, with kings on both sides
+    "midgame n=3": (3, [
+        ".....R..",
+        "b.b.....",
+        ".b......",
+        "..b.....",
+        ".r.....b",
+        "r.....r.",
+        ".r......",
+        "....B.B.",
+    ], "Black", (8, 45, 347, 2180, 18715, 125365)),
+    "midgame n=4": (4, [
+        ".....b....",
+        "b.........",
+        ".....r.b..",
+        "....b...b.",
+        ".b.R...b.b",
+        "..b.r.r...",
+        ".r.....r..",
+        "..r.r...b.",
+        ".........r",
+        "r...B...r.",
+    ], "Black", (14, 169, 2373, 29531)),
+}
+
+
+def parse_diagram(rows):
+    """
+    Turns a diagram into the flat board used by Game.set_position
+    Parameters:
+        rows(list): one string per row, as described at the top of this file
+    Returns(tuple): n (the number of rows of pieces the board size goes with)
+    and the flat board as bytes
+    """
+    width = len(rows)
+    if width < 4 or width % 2 == 1:
+        raise ValueError(f"a board can't be {width} rows tall")
+    cells = bytearray(width * width)
+    for row, line in enumerate(rows):
+        if len(line) != width:
+            raise ValueError(f"row {row} should be {width} squares wide")
+        for col, char in enumerate(line):
+            if char == ".":
+                continue
+            if char not in PIECE_CHARS:
+                raise ValueError(f"unknown piece {char!r} in row {row}")
+            if (row + col) % 2 == 0:
+                raise ValueError(f"piece on a light square at {(row, col)}")
+            cells[row * width + col] = PIECE_CHARS.index(char) + 1
+    return (width - 2) // 2, bytes(cells)
+
+
+def reference_game(game_class, name):
+    """
+    Makes a game set up in one of the reference positions
+    Parameters:
+        game_class(type): Game or a subclass of it, like BitboardGame
+        name(str): key of REFERENCE
+    Returns(Game): the game
+    """
+    n, diagram, side_to_move, _ = REFERENCE[name]
+    game = game_class(n)
+    if diagram is not None:
+        _, cells = parse_diagram(diagram)
+        game.set_position(cells, side_to_move)
+    return game
+
+
+def timed_perft(game, depth, divide=False, workers=1, table_mb=TABLE_MB):
+    """
+    Runs game.perft, or parallel_perft when more than one process is asked 
+    for, and times it
+    Parameters:
+        game(Game): the game
+        depth(int): number of moves in each sequence
+        divide(bool): count separately for each first move
+        workers(int): number of processes, or None for one per CPU
+        table_mb(int): size of parallel_perft's transposition table in MB
+    Returns(tuple): what game.perft returned, and the time it took in seconds
+    """
+    start = time.perf_counter()
+    if workers == 1:
+        result = game.perft(depth, divide)
+    else:
+        result = parallel_perft(game, depth, divide, workers, table_mb)
+    return result, time.perf_counter() - start
+
+
+def parallel_perft(game, depth, divide=False, workers=None, 
+                   table_mb=TABLE_MB):
+    """
+    Does what game.perft does on a pool of processes. The tree is split into 
+    subtrees (at the first move, and deeper when there are only a few first 
+    moves) which the processes count on their own copies of the game, 
+    sharing one transposition table so a position reached in two subtrees
+    is only counted once.
+    Parameters:
+        game(Game): the game; it is left as it was
+        depth(int): number of moves in each sequence
+        divide(bool): count separately for each first move
+        workers(int): number of processes, or None for one per CPU
+        table_mb(int): size of the transposition table in MB
+    Returns(int or dict): the number of sequences, or with divide, a
+    dict from each first move (old_pos, new_pos) to its count
+    """
+    if depth < 1:
+        return game.perft(depth, divide)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    counts, tasks = split_tree(game.clone(), depth, workers * TASKS_PER_WORKER)
+    table = SharedTable.with_size_mb(table_mb)
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(type(game), game._num_rows, 
+                                            table)) as pool:
+            for first_move, nodes in pool.imap_unordered(_count_subtree, 
+                                                         tasks):
+                counts[first_move] += nodes
+    finally:
+        table.close()
+        table.unlink()
+    if divide:
+        return counts
+    return sum(counts.values())
+
+
+def split_tree(game, depth, num_tasks):
+    """
+    Splits the move tree into subtrees, one level at a time, until there are
+    at least num_tasks of them or splitting again would make them too small. 
+    The tree is always split at the first move.
+    Parameters:
+        game(Game): the game; it is changed
+        depth(int): number of moves in each sequence, at least 1
+        num_tasks(int): number of subtrees wanted
+    Returns(tuple): a dict from each first move (old_pos, new_pos) to 0, and
+    a list of (first move, Snapshot, moves left) tuples, one per subtree
+    """
+    tasks = [(None, game.snapshot(), depth)]
+    counts = None
+    while counts is None or len(tasks) < num_tasks and depth > MIN_TASK_DEPTH:
+        subtrees = []
+        for first_move, snapshot, _ in tasks:
+            game.restore(snapshot)
+            for moves in game.all_team_moves(game.side_to_move, 
+                                             as_moves=True).values():
+                for move in moves:
+                    record = game.make_move(move)
+                    subtrees.append((first_move or (move.origin, move.end), 
+                                     game.snapshot(), depth - 1))
+                    game.unmake_move(record)
+        if counts is None:
+            counts = {first_move: 0 for first_move, _, _ in subtrees}
+        tasks = subtrees
+        depth -= 1
+    return counts, tasks
+
+
+# The game and transposition table of a parallel_perft worker process
+_worker_game = None
+_worker_table = None
+
+
+def _init_worker(game_class, n, table):
+    """
+    Sets up a parallel_perft worker process
+    Parameters:
+        game_class(type): class of the game being counted
+        n(int): number of rows of pieces the board size goes with
+        table(SharedTable): the shared transposition table
+    Returns: None
+    """
+    global _worker_game, _worker_table
+    _worker_game = game_class(n)
+    _worker_table = table
+
+
+def _count_subtree(task):
+    """
+    Counts one subtree made by split_tree, in a worker process
+    Parameters:
+        task(tuple): (first move, Snapshot, moves left)
+    Returns(tuple): the first move and the count
+    """
+    first_move, snapshot, depth = task
+    _worker_game.restore(snapshot)
+    return first_move, _worker_game.perft(depth, table=_worker_table)
+
+
+def check_reference(game_class, max_depth=None, workers=1, 
+                    table_mb=TABLE_MB):
+    """
+    Runs perft on every reference position, at its deepest stored depth (or
+    max_depth if that is smaller)
+    Parameters:
+        game_class(type): Game or a subclass of it, like BitboardGame
+        max_depth(int): deepest depth to run, or None for no limit
+        workers(int): number of processes, or None for one per CPU
+        table_mb(int): size of parallel_perft's transposition table in MB
+    Returns(list): one (name, depth, expected count, count, seconds) tuple
+    per reference position
+    """
+    results = []
+    for name, (_, _, _, counts) in REFERENCE.items():
+        depth = len(counts)
+        if max_depth is not None:
+            depth = min(depth, max_depth)
+        game = reference_game(game_class, name)
+        nodes, seconds = timed_perft(game, depth, workers=workers, 
+                                     table_mb=table_mb)
+        results.append((name, depth, counts[depth - 1], nodes, seconds))
+    return results
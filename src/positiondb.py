@@ -0,0 +1,299 @@
+"""
+Position database for Checkers
+
+A position database keeps every position of many games in a file that is
+memory-mapped rather than read, so analysis code can look at any position of
+any game without loading the rest. All positions are the same size, so
+position p of game k is found with one lookup in the index.
+
+A database is two files:
+    <path>      DB_HEADER (magic, format version and n), then one record per
+                position: the position as Game.to_bytes encodes it (the side
+                to move, the draw counters and a bitmask over the dark
+                squares for each kind of piece) and the move played from it
+                as two unsigned 16-bit squares (row * width + col), or NO_MOVE
+                twice for the last position of a game
+    <path>.idx  one unsigned 64-bit number per game: the index of its first
+                record, followed by the total number of records
+
+PositionDB.records (and the views it hands out) is a NumPy structured array
+with the fields of record_dtype, so whole batches of positions can be worked
+on without copying them; np.unpackbits(records["pieces"], axis=-1,
+bitorder="little") turns the bitmasks into one byte per dark square.
+
+Examples:
+    1) Save the games of a simulation:
+        with PositionDBWriter("games.db", 3) as writer:
+            simulate(game, 1000, bots, writer)
+    2) Get position 10 of game 5 as a Game:
+        db = PositionDB("games.db")
+        game = db.game_at(5, 10)
+    3) Count the positions where Red is to move, without copying them:
+        (db.records["flags"] & RED_TO_MOVE).astype(bool).sum()
+    4) Through the command line (see bot.py):
+        python3 src/bot.py -n 1000 --record games.db --record-format db
+"""
+import os
+import struct
+
+import numpy as np
+
+from bitboard import BitboardGame
+from checkers import RED_TO_MOVE
+from records import read_records
+
+# Start of the data file: magic, format version and n
+DB_HEADER = struct.Struct("<4sBH")
+DB_MAGIC = b"CKDB"
+DB_VERSION = 1
+
+# Square given for the move of the last position of a game
+NO_MOVE = 0xFFFF
+
+# A record's move
+MOVE = struct.Struct("<HH")
+
+
+def record_dtype(n):
+    """
+    Returns the NumPy type of one record of a database of boards for n
+    Parameters:
+        n(int): number of rows of pieces the board size goes with
+    Returns(numpy.dtype): a structured type with the fields n, flags,
+    since_red and since_black (POSITION_HEADER), pieces (one row of bitmask
+    bytes per piece_kind), origin and end
+    """
+    width = 2 * n + 2
+    size = (width * width // 2 + 7) // 8
+    return np.dtype([("n", "<u2"), ("flags", "u1"), ("since_red", "<u2"),
+                     ("since_black", "<u2"), ("pieces", "u1", (4, size)),
+                     ("origin", "<u2"), ("end", "<u2")])
+
+
+class PositionDBWriter:
+    """
+    Adds games to a position database. Has the same write method as
+    records.RecordWriter, so it can be given to simulate as its recorder.
+    """
+    def __init__(self, path, n):
+        """
+        Constructor for the PositionDBWriter class. Makes the database, or
+        opens it to add more games if it already exists.
+        Parameters:
+            path(str): the data file; the index is path + ".idx"
+            n(int): number of rows of pieces the board size goes with
+        """
+        # number of rows of pieces the board size goes with
+        self.n = n
+        # game the moves are played on to get the positions
+        self._game = BitboardGame(n)
+        # size of one record in bytes
+        self._record_size = record_dtype(n).itemsize
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            stored = _read_header(path)
+            if stored != n:
+                raise ValueError(f"{path} holds boards for n = {stored}, "
+                                 f"not {n}")
+        self._data = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        if self._data.tell() == 0:
+            self._data.write(DB_HEADER.pack(DB_MAGIC, DB_VERSION, n))
+            self._index.write(struct.pack("<Q", 0))
+        # number of records in the file
+        self._count = ((self._data.tell() - DB_HEADER.size) //
+                       self._record_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds a game
+        Parameters:
+            record(GameRecord): the game; the moves are not checked
+        Returns: None
+        """
+        if record.n != self.n:
+            raise ValueError(f"game is for n = {record.n}, not {self.n}")
+        game = self._game
+        width = game.width
+        game.reset_game()
+        chunks = []
+        for old_pos, new_pos in record.moves:
+            chunks.append(game.to_bytes())
+            chunks.append(MOVE.pack(old_pos[0] * width + old_pos[1],
+                                    new_pos[0] * width + new_pos[1]))
+            game.move_piece(old_pos, new_pos, game.side_to_move)
+        chunks.append(game.to_bytes())
+        chunks.append(MOVE.pack(NO_MOVE, NO_MOVE))
+        self._data.write(b"".join(chunks))
+        self._count += len(record.moves) + 1
+        self._index.write(struct.pack("<Q", self._count))
+
+    def close(self):
+        """
+        Writes out what is left to write and closes the files
+        Parameters: None
+        Returns: None
+        """
+        self._data.close()
+        self._index.close()
+
+
+class PositionDB:
+    """
+    Read-only view of a position database
+    """
+    def __init__(self, path):
+        """
+        Constructor for the PositionDB class. Maps the files into memory.
+        Parameters:
+            path(str): the data file; the index is path + ".idx"
+        """
+        # number of rows of pieces the board size goes with
+        self.n = _read_header(path)
+        dtype = record_dtype(self.n)
+        count = (os.path.getsize(path) - DB_HEADER.size) // dtype.itemsize
+        # every position of every game, one record each (see record_dtype)
+        self.records = _map(path, dtype, DB_HEADER.size, count)
+        # index of the first record of each game, then the number of records
+        self.offsets = _map(path + ".idx", np.dtype("<u8"), 0,
+                            os.path.getsize(path + ".idx") // 8)
+        if len(self.offsets) == 0 or self.offsets[-1] > count:
+            raise ValueError(f"{path}.idx doesn't match {path}")
+
+    def __len__(self):
+        """
+        Returns(int): number of games
+        """
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        """
+        Goes through the games
+        Returns(generator): the records of each game (see game)
+        """
+        for k in range(len(self)):
+            yield self.game(k)
+
+    def game(self, k):
+        """
+        Returns the positions of one game, without copying them
+        Parameters:
+            k(int): number of the game, from 0
+        Returns(numpy.ndarray): the game's records, one per position from the
+        starting position to the last one
+        """
+        if not 0 <= k < len(self):
+            raise IndexError(f"there is no game {k}")
+        return self.records[self.offsets[k]:self.offsets[k + 1]]
+
+    def position(self, k, ply):
+        """
+        Returns one position of a game
+        Parameters:
+            k(int): number of the game, from 0
+            ply(int): number of moves played before the position
+        Returns(numpy.void): the position's record
+        """
+        records = self.game(k)
+        if not 0 <= ply < len(records):
+            raise IndexError(f"game {k} has no position {ply}")
+        return records[ply]
+
+    def moves(self, k):
+        """
+        Returns the moves of one game
+        Parameters:
+            k(int): number of the game, from 0
+        Returns(list): the moves as (old_pos, new_pos) tuples
+        """
+        records = self.game(k)[:-1]
+        width = 2 * self.n + 2
+        return [(divmod(int(origin), width), divmod(int(end), width))
+                for origin, end in zip(records["origin"], records["end"])]
+
+    def game_at(self, k, ply, game=None):
+        """
+        Sets a game up in one position of a game in the database
+        Parameters:
+            k(int): number of the game, from 0
+            ply(int): number of moves played before the position
+            game(Game): game of the database's size to set up, or None for a
+            new BitboardGame
+        Returns(Game): the game
+        """
+        if game is None:
+            game = BitboardGame(self.n)
+        data = self.position(k, ply).tobytes()
+        game.load_bytes(data[:len(data) - MOVE.size])
+        return game
+
+    def close(self):
+        """
+        Lets go of the mapped files; they are unmapped once the views handed
+        out are gone too
+        Parameters: None
+        Returns: None
+        """
+        self.records = np.empty(0, self.records.dtype)
+        self.offsets = np.zeros(1, self.offsets.dtype)
+
+
+def build_position_db(records_path, path):
+    """
+    Makes a position database (or adds to one) from a file written by
+    records.RecordWriter
+    Parameters:
+        records_path(str): the record file
+        path(str): the database's data file
+    Returns(int): the number of games added
+    """
+    writer = None
+    count = 0
+    try:
+        for record in read_records(records_path):
+            if writer is None:
+                writer = PositionDBWriter(path, record.n)
+            writer.write(record)
+            count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _read_header(path):
+    """
+    Reads the start of a database's data file
+    Parameters:
+        path(str): the data file
+    Returns(int): n
+    """
+    with open(path, "rb") as file:
+        header = file.read(DB_HEADER.size)
+    if len(header) < DB_HEADER.size:
+        raise ValueError(f"{path} is not a position database")
+    magic, version, n = DB_HEADER.unpack(header)
+    if magic != DB_MAGIC or version != DB_VERSION:
+        raise ValueError(f"{path} is not a position database")
+    return n
+
+
+def _map(path, dtype, offset, count):
+    """
+    Maps part of a file into memory as a read-only array
+    Parameters:
+        path(str): the file
+        dtype(numpy.dtype): type of each item
+        offset(int): where the items start, in bytes
+        count(int): number of items
+    Returns(numpy.ndarray): the items (an empty array when there are none,
+    since an empty map can't be made)
+    """
+    if count == 0:
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype, "r", offset, (count,))
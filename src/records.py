@@ -0,0 +1,161 @@
+"""
+Game records for Checkers
+
+A record is the size of the board, the moves of one game and how it ended.
+RecordWriter streams records to a file as games finish, so a long simulation
+can be looked at afterwards (or its games played again on another engine)
+without running it again. There are two formats, and both only ever append
+to the file:
+    jsonl   one JSON object per line:
+            {"n": 3, "moves": [[[5, 0], [4, 1]], ...], "winner": "Red",
+             "draw_reason": null}
+    binary  RECORD_MAGIC, then per game RECORD_HEADER (n, number of moves,
+            winner and draw reason as indexes into WINNERS and DRAW_REASONS)
+            followed by each move as two unsigned 16-bit squares
+            (row * width + col): where the piece was and where it ends
+
+Examples:
+    1) Record the games of a simulation:
+        with RecordWriter("games.jsonl") as writer:
+            simulate(game, 1000, bots, writer)
+    2) Read them back:
+        for record in read_records("games.jsonl"):
+            print(record.winner, len(record.moves))
+    3) Through the command line (see bot.py):
+        python3 src/bot.py -n 1000 --record games.bin --record-format binary
+"""
+import array
+import json
+import struct
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+
+# Start of a binary record file
+RECORD_MAGIC = b"CKRC\x01"
+
+# Start of each game in a binary record file: n, number of moves, winner and
+# draw reason
+RECORD_HEADER = struct.Struct("<HIBB")
+
+# Values of a record's winner and draw_reason, by their index in the binary
+# format
+WINNERS = (None, "Red", "Black")
+DRAW_REASONS = (None, "no moves", "40 moves", "agreed")
+
+# Size of the write buffer of a RecordWriter, in bytes
+BUFFER_BYTES = 1 << 20
+
+FORMATS = ("jsonl", "binary")
+
+
+class GameRecord(NamedTuple):
+    """
+    The moves of one game and how it ended
+    """
+    #number of rows of pieces the board size goes with
+    n: int
+    #the moves in the order they were played, as (old_pos, new_pos)
+    moves: List[Tuple[Tuple[int, int], Tuple[int, int]]]
+    #the team that won, or None
+    winner: Optional[str]
+    #why the game is a draw (see GameStatus), or None
+    draw_reason: Optional[str]
+
+
+class RecordWriter:
+    """
+    Appends GameRecords to a file, buffering the writes
+    """
+    def __init__(self, path, record_format="jsonl"):
+        """
+        Constructor for the RecordWriter class. Opens the file, adding to it
+        if it already exists.
+        Parameters:
+            path(str): file to write to
+            record_format(str): "jsonl" or "binary"
+        """
+        if record_format not in FORMATS:
+            raise ValueError(f"unknown record format {record_format!r}")
+        # "jsonl" or "binary"
+        self.record_format = record_format
+        # the open file
+        self._file = open(path, "ab", buffering=BUFFER_BYTES)
+        if record_format == "binary" and self._file.tell() == 0:
+            self._file.write(RECORD_MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds a game to the file
+        Parameters:
+            record(GameRecord): the game
+        Returns: None
+        """
+        if self.record_format == "jsonl":
+            self._file.write(json.dumps(record._asdict(),
+                                        separators=(",", ":")).encode())
+            self._file.write(b"\n")
+            return
+        width = 2 * record.n + 2
+        if width * width > 1 << 16:
+            raise ValueError("binary records only fit boards up to 256 wide")
+        squares = array.array("H", [row * width + col
+                                    for move in record.moves
+                                    for row, col in move])
+        if sys.byteorder == "big":
+            squares.byteswap()
+        self._file.write(RECORD_HEADER.pack(
+            record.n, len(record.moves), WINNERS.index(record.winner),
+            DRAW_REASONS.index(record.draw_reason)))
+        self._file.write(squares.tobytes())
+
+    def close(self):
+        """
+        Writes out what is left in the buffer and closes the file
+        Parameters: None
+        Returns: None
+        """
+        self._file.close()
+
+
+def read_records(path):
+    """
+    Reads the games in a file written by RecordWriter, in either format
+    Parameters:
+        path(str): the file
+    Returns(generator): the GameRecords, in the order they were written
+    """
+    with open(path, "rb") as file:
+        if file.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            file.seek(0)
+            for line in file:
+                if line.strip():
+                    fields = json.loads(line)
+                    fields["moves"] = [(tuple(old_pos), tuple(new_pos)) for
+                                       old_pos, new_pos in fields["moves"]]
+                    yield GameRecord(**fields)
+            return
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) < RECORD_HEADER.size:
+                raise ValueError(f"{path} ends in the middle of a game")
+            n, num_moves, winner, draw_reason = RECORD_HEADER.unpack(header)
+            squares = array.array("H")
+            try:
+                squares.fromfile(file, 2 * num_moves)
+            except EOFError:
+                raise ValueError(f"{path} ends in the middle of a game") \
+                    from None
+            if sys.byteorder == "big":
+                squares.byteswap()
+            width = 2 * n + 2
+            positions = [divmod(sq, width) for sq in squares]
+            yield GameRecord(n, list(zip(positions[::2], positions[1::2])),
+                             WINNERS[winner], DRAW_REASONS[draw_reason])
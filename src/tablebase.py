@@ -0,0 +1,474 @@
+"""
+Endgame tablebases for Checkers
+
+A tablebase holds the result of perfect play (a win, loss or draw for the
+side to move, and how many moves it takes) for every position with at most
+a given number of pieces on a board of a given size. It is built by
+retrograde analysis: positions where a team can't move are decided first,
+and then positions are decided from the positions their moves lead to, in
+order of how many moves the game has left, until nothing more can be
+decided; positions left over are draws.
+
+Positions are split up by their material: (red men, red kings, black men,
+black kings). A move either keeps the material the same or goes to material
+with fewer pieces (a jump) or fewer men (a crowning), so materials are
+solved from the fewest pieces and men up, and every move out of a material
+leads to one that is already solved. Within a material a position's index is
+a perfect hash of where the pieces are: the rank of the red men's dark
+squares among all ways of choosing them, then of the red kings' among the
+squares left, and so on, then the side to move.
+
+Results follow Game.status: a team that can't move has lost, and a position
+where neither team can move is a draw. The 40-move rule and draw offers are
+not looked at, so a win can take longer than the 40-move rule allows.
+
+The file is TB_HEADER, one MATERIAL_ENTRY per material, then one unsigned
+16-bit entry per position: the result (UNKNOWN, DRAW, WIN or LOSS) in the
+top two bits and the number of moves (plies) until the game ends in the
+rest. UNKNOWN is only left for positions that can't happen (men on the row
+they would have been crowned on). Tablebase maps the entries into memory, so
+a probe only reads one of them.
+
+Examples:
+    1) Solve every position with up to 4 pieces on a 6x6 board:
+        build_tablebase(2, 4, "n2.tb")
+    2) Look a position up:
+        tablebase = Tablebase("n2.tb")
+        tablebase.probe(game)    # like TablebaseEntry("win", 7), or None
+    3) Pick the best move (None if the position isn't in the tablebase):
+        tablebase.best_move(game)
+    4) Through the command line (see bot.py):
+        python3 src/bot.py tablebase -s 2 -k 4 -o n2.tb
+        python3 src/bot.py -s 2 --tablebase n2.tb
+"""
+import itertools
+import os
+import struct
+from bisect import bisect
+from math import comb
+from typing import NamedTuple
+
+import numpy as np
+
+from bitboard import TEAMS, children, geometry, movers
+from checkers import MAN_DIRECTIONS, dark_cells
+
+# Start of a tablebase file: magic, format version, n, the most pieces a
+# position can have and the number of materials
+TB_HEADER = struct.Struct("<4sBHBI")
+TB_MAGIC = b"CKTB"
+TB_VERSION = 1
+
+# One material: the number of red men, red kings, black men and black kings,
+# and the index of the material's first entry
+MATERIAL_ENTRY = struct.Struct("<4BQ")
+
+# Results stored in the top bits of an entry, for the side to move
+UNKNOWN = 0
+DRAW = 1
+WIN = 2
+LOSS = 3
+RESULT_NAMES = {DRAW: "draw", WIN: "win", LOSS: "loss"}
+
+# Bits of an entry below the result, which hold the number of moves
+RESULT_SHIFT = 14
+DISTANCE_MASK = (1 << RESULT_SHIFT) - 1
+
+class TablebaseEntry(NamedTuple):
+    """
+    What a tablebase knows about a position
+    """
+    #"win", "loss" or "draw", for the side to move
+    result: str
+    #number of moves (of both teams) until the game is over with best play;
+    #0 for a draw
+    distance: int
+
+
+class Tablebase:
+    """
+    Read-only, memory-mapped tablebase
+    """
+    def __init__(self, path):
+        """
+        Constructor for the Tablebase class. Maps the file into memory.
+        Parameters:
+            path(str): a file written by build_tablebase
+        """
+        with open(path, "rb") as file:
+            header = file.read(TB_HEADER.size)
+            if len(header) < TB_HEADER.size:
+                raise ValueError(f"{path} is not a tablebase")
+            magic, version, n, max_pieces, num_materials = \
+                TB_HEADER.unpack(header)
+            if magic != TB_MAGIC or version != TB_VERSION:
+                raise ValueError(f"{path} is not a tablebase")
+            table = file.read(MATERIAL_ENTRY.size * num_materials)
+        # number of rows of pieces the board size goes with
+        self.n = n
+        # the most pieces a position in the tablebase has
+        self.max_pieces = max_pieces
+        # board size and indexing of every material
+        self._layout = Layout(n)
+        # index of the first entry of each material
+        self._offsets = {}
+        for i in range(num_materials):
+            *material, offset = MATERIAL_ENTRY.unpack_from(
+                table, i * MATERIAL_ENTRY.size)
+            self._offsets[tuple(material)] = offset
+        start = TB_HEADER.size + len(table)
+        # every entry of every material
+        self.entries = np.memmap(path, np.dtype("<u2"), "r", start,
+                                 ((os.path.getsize(path) - start) // 2,))
+
+    def probe(self, game):
+        """
+        Looks up the current position of a game
+        Parameters:
+            game(Game): the game, of the tablebase's board size
+        Returns(TablebaseEntry): the result, or None if the position isn't
+        in the tablebase
+        """
+        if game.width != self._layout.width:
+            return None
+        return self.probe_squares(self._layout.groups(game.to_cells()),
+                                  game.side_to_move)
+
+    def probe_squares(self, groups, side_to_move):
+        """
+        Looks up a position given by where its pieces are
+        Parameters:
+            groups(tuple): sorted lists of the dark squares (see
+            checkers.dark_cells) of the red men, red kings, black men and
+            black kings
+            side_to_move(str): the team whose turn it is
+        Returns(TablebaseEntry): the result, or None if the position isn't
+        in the tablebase
+        """
+        offset = self._offsets.get(tuple(len(squares) for squares in groups))
+        if offset is None:
+            return None
+        index = self._layout.index(groups, side_to_move == "Red")
+        value = int(self.entries[offset + index])
+        result = value >> RESULT_SHIFT
+        if result == UNKNOWN:
+            return None
+        if result == DRAW:
+            return TablebaseEntry("draw", 0)
+        return TablebaseEntry(RESULT_NAMES[result], value & DISTANCE_MASK)
+
+    def best_move(self, game):
+        """
+        Picks the move with the best result for the side to move: the
+        quickest win, otherwise a draw, otherwise the slowest loss
+        Parameters:
+            game(Game): the game; it is left as it was
+        Returns(Move): the move, or None if the position isn't in the
+        tablebase or the side to move can't move
+        """
+        if self.probe(game) is None:
+            return None
+        best = None
+        best_score = None
+        for moves in game.all_team_moves(game.side_to_move,
+                                         as_moves=True).values():
+            for move in moves:
+                record = game.make_move(move)
+                entry = self.probe(game)
+                game.unmake_move(record)
+                if entry is None:
+                    return None
+                # the entry is for the other team
+                if entry.result == "loss":
+                    score = (0, entry.distance)
+                elif entry.result == "draw":
+                    score = (1, 0)
+                else:
+                    score = (2, -entry.distance)
+                if best_score is None or score < best_score:
+                    best = move
+                    best_score = score
+        return best
+
+    def counts(self):
+        """
+        Counts the positions with each result
+        Parameters: None
+        Returns(dict): the number of positions that are a "win", "loss" or
+        "draw" for the side to move
+        """
+        found = np.bincount(self.entries >> RESULT_SHIFT, minlength=4)
+        return {name: int(found[result])
+                for result, name in RESULT_NAMES.items()}
+
+    def close(self):
+        """
+        Lets go of the mapped file; it is unmapped once the entries handed
+        out are gone too
+        Parameters: None
+        Returns: None
+        """
+        self.entries = np.empty(0, self.entries.dtype)
+
+
+class Layout:
+    """
+    The board's dark squares and the perfect hash of the positions of each
+    material
+    """
+    def __init__(self, n):
+        """
+        Constructor for the Layout class
+        Parameters:
+            n(int): number of rows of pieces the board size goes with
+        """
+        # Width/length of the board
+        self.width = 2 * n + 2
+        # number of dark squares
+        self.num_dark = self.width * self.width // 2
+        # square (row * width + col) of each dark square
+        half = self.width // 2
+        self.squares = [2 * i + (i // half + 1) % 2
+                        for i in range(self.num_dark)]
+
+    def groups(self, cells):
+        """
+        Finds where the pieces are on a flat board
+        Parameters:
+            cells(bytes): one byte per square, as in MailboxBoard.to_cells
+        Returns(tuple): sorted lists of the dark squares of the red men, red
+        kings, black men and black kings
+        """
+        groups = ([], [], [], [])
+        for i, code in enumerate(dark_cells(cells, self.width)):
+            if code:
+                groups[code - 1].append(i)
+        return groups
+
+    def size(self, material):
+        """
+        Returns the number of entries of a material
+        Parameters:
+            material(tuple): numbers of red men, red kings, black men and
+            black kings
+        Returns(int): the number of entries (two per placement of the
+        pieces, one for each side to move)
+        """
+        size = 2
+        free = self.num_dark
+        for count in material:
+            size *= comb(free, count)
+            free -= count
+        return size
+
+    def index(self, groups, red_to_move):
+        """
+        Works out the index of a position within its material
+        Parameters:
+            groups(tuple): sorted lists of the dark squares of the red men,
+            red kings, black men and black kings
+            red_to_move(bool): whether Red is the side to move
+        Returns(int): the index
+        """
+        index = 0
+        free = self.num_dark
+        taken = []
+        for squares in groups:
+            k = len(squares)
+            # lexicographic rank of the squares, numbered among the free ones
+            rank = comb(free, k) - 1
+            for i, sq in enumerate(squares):
+                rank -= comb(free - 1 - (sq - bisect(taken, sq)), k - i)
+            index = index * comb(free, k) + rank
+            free -= k
+            if k:
+                taken = sorted(taken + squares)
+        return index * 2 + red_to_move
+
+    def placements(self, material):
+        """
+        Goes through every placement of a material's pieces, in index order
+        Parameters:
+            material(tuple): numbers of red men, red kings, black men and
+            black kings
+        Returns(generator): tuples of sorted lists of the dark squares of the
+        red men, red kings, black men and black kings
+        """
+        def place(free, counts):
+            if not counts:
+                yield ()
+                return
+            for chosen in itertools.combinations(range(len(free)), counts[0]):
+                squares = [free[i] for i in chosen]
+                rest = [sq for sq in free if sq not in squares]
+                for others in place(rest, counts[1:]):
+                    yield (squares,) + others
+
+        return place(list(range(self.num_dark)), material)
+
+
+def build_tablebase(n, max_pieces, path, progress=None):
+    """
+    Solves every position with up to max_pieces pieces and writes the
+    tablebase. The time and memory it takes grow quickly with max_pieces and
+    the board size: 4 pieces on a 6x6 board take seconds, 4 pieces on an
+    8x8 board minutes.
+    Parameters:
+        n(int): number of rows of pieces the board size goes with
+        max_pieces(int): the most pieces a position can have, below 256
+        path(str): file to write
+        progress: function called with each material and its number of
+        entries as it is solved, or None
+    Returns(Tablebase): the tablebase, read back from the file
+    """
+    layout = Layout(n)
+    materials = [material for material in
+                 itertools.product(range(max_pieces + 1), repeat=4)
+                 if sum(material) <= max_pieces]
+    # fewest pieces first, then fewest men, so moves out of a material always
+    # lead to a material that is already solved
+    materials.sort(key=lambda m: (sum(m), m[0] + m[2], m))
+    solved = {}
+    for material in materials:
+        solved[material] = _solve(layout, material, solved)
+        if progress is not None:
+            progress(material, len(solved[material]))
+
+    with open(path, "wb") as file:
+        file.write(TB_HEADER.pack(TB_MAGIC, TB_VERSION, n, max_pieces,
+                                  len(materials)))
+        offset = 0
+        for material in materials:
+            file.write(MATERIAL_ENTRY.pack(*material, offset))
+            offset += len(solved[material])
+        for material in materials:
+            file.write(solved[material].astype("<u2").tobytes())
+    return Tablebase(path)
+
+
+def _solve(layout, material, solved):
+    """
+    Solves every position of one material
+    Parameters:
+        layout(Layout): the board's layout
+        material(tuple): numbers of red men, red kings, black men and black
+        kings
+        solved(dict): entries of the materials solved so far, by material
+    Returns(numpy.ndarray): the material's entries
+    """
+    geo = geometry(layout.width)
+    squares = layout.squares
+    size = layout.size(material)
+    values = [UNKNOWN] * size
+    # moves to positions of this material whose results aren't known yet,
+    # and are not losses for the other team
+    remaining = [0] * size
+    # one more than the most moves the other team needs to win, over the
+    # moves that have been found to lose
+    longest = [0] * size
+    # whether a position has a move that draws or wins, so it can't lose
+    can_hold = [False] * size
+    # positions to decide, by the number of moves the game has left
+    buckets = {}
+    # moves within the material, as (from, to) indexes
+    sources = []
+    targets = []
+
+    for base, groups in enumerate(layout.placements(material)):
+        bits = [0, 0, 0, 0]
+        for kind, group in enumerate(groups):
+            for i in group:
+                bits[kind] |= 1 << squares[i]
+        # men on the row they would have been crowned on can't happen
+        if bits[0] & geo.promotion_rows["Red"] or \
+                bits[2] & geo.promotion_rows["Black"]:
+            continue
+        empty = geo.full ^ (bits[0] | bits[1] | bits[2] | bits[3])
+        stuck = [movers(geo, bits[2 * t], bits[2 * t + 1],
+                        bits[2 - 2 * t] | bits[3 - 2 * t], empty,
+                        MAN_DIRECTIONS[team]) == 0
+                 for t, team in enumerate(TEAMS)]
+        for t, team in enumerate(TEAMS):
+            # Red to move is the odd index
+            i = base * 2 + (t == 0)
+            if stuck[0] and stuck[1]:
+                values[i] = DRAW << RESULT_SHIFT
+                continue
+            if stuck[t] or stuck[1 - t]:
+                buckets.setdefault(0, []).append((i, LOSS if stuck[t]
+                                                  else WIN))
+                continue
+            quickest = None
+            for _, _, child in children(geo, bits, t):
+                child_groups = _groups(child)
+                child_material = tuple(len(g) for g in child_groups)
+                if child_material == material:
+                    sources.append(i)
+                    targets.append(layout.index(child_groups, t == 1))
+                    remaining[i] += 1
+                    continue
+                value = int(solved[child_material][
+                    layout.index(child_groups, t == 1)])
+                result = value >> RESULT_SHIFT
+                distance = (value & DISTANCE_MASK) + 1
+                if result == LOSS:
+                    if quickest is None or distance < quickest:
+                        quickest = distance
+                elif result == WIN:
+                    longest[i] = max(longest[i], distance)
+                else:
+                    can_hold[i] = True
+            if quickest is not None:
+                can_hold[i] = True
+                buckets.setdefault(quickest, []).append((i, WIN))
+            elif remaining[i] == 0 and not can_hold[i]:
+                buckets.setdefault(longest[i], []).append((i, LOSS))
+
+    # the moves into each position, sorted by the position they lead to
+    sources = np.array(sources, np.int64)
+    targets = np.array(targets, np.int64)
+    order = np.argsort(targets, kind="stable")
+    parents = sources[order].tolist()
+    starts = np.searchsorted(targets[order], np.arange(size + 1)).tolist()
+
+    distance = 0
+    while buckets:
+        for i, result in buckets.pop(distance, ()):
+            if values[i]:
+                continue
+            values[i] = result << RESULT_SHIFT | distance
+            for parent in parents[starts[i]:starts[i + 1]]:
+                if values[parent]:
+                    continue
+                if result == LOSS:
+                    buckets.setdefault(distance + 1, []).append((parent, WIN))
+                    continue
+                remaining[parent] -= 1
+                longest[parent] = max(longest[parent], distance + 1)
+                if remaining[parent] == 0 and not can_hold[parent]:
+                    buckets.setdefault(longest[parent], []).append(
+                        (parent, LOSS))
+        distance += 1
+
+    # what is left (apart from positions that can't happen) is a draw
+    for i in range(size):
+        if values[i] == UNKNOWN and (remaining[i] or can_hold[i]):
+            values[i] = DRAW << RESULT_SHIFT
+    return np.array(values, np.uint16)
+
+
+def _groups(bits):
+    """
+    Turns the four bitmasks of a position into lists of dark squares
+    Parameters:
+        bits(list): bitmasks of the red men, red kings, black men and black
+        kings
+    Returns(tuple): sorted lists of the dark squares (square // 2) of each
+    """
+    groups = ([], [], [], [])
+    for kind, mask in enumerate(bits):
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            groups[kind].append((bit.bit_length() - 1) // 2)
+    return groups
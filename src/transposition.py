@@ -0,0 +1,190 @@
+"""
+Shared transposition table for Checkers
+
+SharedTable is a fixed-size hash table of 64-bit numbers kept in a
+multiprocessing.shared_memory block, so every process of a multiprocessing
+pool can read and write the same table. Entries are looked up by a position's
+position_hash and a depth (the number of moves searched from it), and hold one
+number, like a perft count. A table made with deeper=True also finds values
+stored with a deeper search than the one asked for, for values that only get
+better with depth, like search scores (perft counts are only right at their
+own depth).
+
+There are no locks. Each entry is two 64-bit words, the data and the key
+XORed with the data, written one after the other. If two processes write the
+same entry at once a reader can see one word from each write, but then the
+key it gets back by XORing the words doesn't match, so the entry just looks
+empty.
+
+Each hash picks a bucket of two entries: the first is only replaced by
+searches at least as deep as the one stored there, and the second is always
+replaced, so deep results stay in the table while shallow ones keep moving
+through it.
+
+Examples:
+    1) Make a table of about 64 MB and store and look up a count:
+        table = SharedTable.with_size_mb(64)
+        table.store(game.position_hash, 5, 12345)
+        table.probe(game.position_hash, 5)
+    2) Use it from another process (the table can be pickled, and is opened
+       again by name there):
+        pool = multiprocessing.Pool(4, initializer=init, initargs=(table,))
+    3) Make a table whose probes also find deeper searches' values:
+        table = SharedTable.with_size_mb(16, deeper=True)
+    4) Free the shared memory when every process is done with it:
+        table.close()
+        table.unlink()
+"""
+import random
+from multiprocessing import shared_memory
+
+# Size of one entry in bytes: a key word and a data word
+ENTRY_BYTES = 16
+
+# Bits of the data word that hold the depth; the rest hold the value
+DEPTH_BITS = 8
+DEPTH_MASK = (1 << DEPTH_BITS) - 1
+
+# Largest number a 64-bit word holds
+MASK_64 = (1 << 64) - 1
+
+# Random numbers mixed into the key for each depth, so the same position at
+# different depths lands in different buckets
+_rng = random.Random(0x7AB1E)
+DEPTH_KEYS = tuple(_rng.getrandbits(64) for _ in range(1 << DEPTH_BITS))
+
+
+class SharedTable:
+    """
+    Transposition table in shared memory that processes can use at the same
+    time without locking
+    """
+    def __init__(self, num_buckets, name=None, deeper=False):
+        """
+        Constructor for the SharedTable class. Makes a new block of shared
+        memory, or opens an existing one when given its name.
+        Parameters:
+            num_buckets(int): number of buckets of two entries
+            name(str): name of the shared memory block of an existing table,
+            or None to make a new one
+            deeper(bool): whether probes also find values stored with a
+            deeper search
+        """
+        if num_buckets < 1:
+            raise ValueError("a table needs at least one bucket")
+        # number of buckets of two entries
+        self.num_buckets = num_buckets
+        # whether probes also find values stored with a deeper search
+        self.deeper = deeper
+        # the block of shared memory; the creating process owns it
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=name is None,
+            size=num_buckets * 2 * ENTRY_BYTES)
+        # the block as unsigned 64-bit words: [key ^ data, data] per entry
+        self._words = self._shm.buf.cast("Q")
+
+    @classmethod
+    def with_size_mb(cls, megabytes, deeper=False):
+        """
+        Makes a new table that takes up about a given amount of memory
+        Parameters:
+            megabytes(int): size of the table in MB
+            deeper(bool): whether probes also find values stored with a
+            deeper search
+        Returns(SharedTable): the table
+        """
+        return cls(max(1, megabytes * 2 ** 20 // (2 * ENTRY_BYTES)),
+                   deeper=deeper)
+
+    @property
+    def name(self):
+        """
+        Name of the shared memory block, which other processes open the
+        table by
+        Returns(str): the name
+        """
+        return self._shm.name
+
+    def __reduce__(self):
+        """
+        Pickles the table as its name, so unpickling it in another process
+        opens the same shared memory
+        """
+        return (SharedTable, (self.num_buckets, self.name, self.deeper))
+
+    def probe(self, key, depth):
+        """
+        Looks a position up
+        Parameters:
+            key(int): 64-bit hash of the position
+            depth(int): depth the value was found with (or the least depth,
+            in a table made with deeper=True)
+        Returns(int or None): the stored value, or None if it isn't there
+        """
+        words = self._words
+        if self.deeper:
+            index = (key % self.num_buckets) * 4
+            for i in (index, index + 2):
+                data = words[i + 1]
+                if words[i] ^ data == key and data & DEPTH_MASK >= depth:
+                    return data >> DEPTH_BITS
+            return None
+        key ^= DEPTH_KEYS[depth]
+        index = (key % self.num_buckets) * 4
+        for i in (index, index + 2):
+            data = words[i + 1]
+            if words[i] ^ data == key and data & DEPTH_MASK == depth:
+                return data >> DEPTH_BITS
+        return None
+
+    def store(self, key, depth, value):
+        """
+        Saves the value for a position, replacing an older entry in its
+        bucket
+        Parameters:
+            key(int): 64-bit hash of the position
+            depth(int): depth the value was found with, below 256
+            value(int): value to save, below 2 ** 56
+        Returns: None
+        """
+        if not self.deeper:
+            key ^= DEPTH_KEYS[depth]
+        data = (value << DEPTH_BITS | depth) & MASK_64
+        words = self._words
+        index = (key % self.num_buckets) * 4
+        stored = words[index + 1]
+        # in a table made with deeper=True a deeper value of the same 
+        # position isn't replaced by a shallower one
+        if depth >= stored & DEPTH_MASK or not self.deeper and \
+                words[index] ^ stored == key:
+            words[index + 1] = data
+            words[index] = key ^ data
+        else:
+            words[index + 3] = data
+            words[index + 2] = key ^ data
+
+    def clear(self):
+        """
+        Empties the table
+        Parameters: None
+        Returns: None
+        """
+        self._shm.buf[:] = bytes(len(self._shm.buf))
+
+    def close(self):
+        """
+        Stops using the table in this process
+        Parameters: None
+        Returns: None
+        """
+        self._words.release()
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory once every process has closed the table. Only
+        the process that made the table should call this.
+        Parameters: None
+        Returns: None
+        """
+        self._shm.unlink()
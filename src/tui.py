@@ -8,8 +8,10 @@ import click
 from colorama import Fore, Style, Back
 
 from checkers import Board, Game, Piece, GameType
+from bitboard import BitboardGame
 from mocks import MockGame, Piece, MockCheckerboard, StubCheckerboard
-from bot import RandomBot, SmartBot
+from bot import AlphaBetaBot, RandomBot, SmartBot
+from mcts import DEFAULT_PLAYOUTS, MCTSBot
 
 
 TOP_ROW_LIGHT = Fore.WHITE + "\u250c" + "\u2500" + "\u2510"
@@ -37,22 +39,35 @@ class TUIPlayer:
     The TUIPlayer can be a human using the keyboard or a bot.
     """
     name: str
-    bot: Union[None, RandomBot, SmartBot]
+    bot: Union[None, RandomBot, SmartBot, AlphaBetaBot, MCTSBot]
     game: GameType
     team: str
     bot_delay: float
 
     def __init__(self, player_num: int,  player_type: str, game: GameType, 
-                team: str, opponent_team: str, bot_delay: float):
+                team: str, opponent_team: str, bot_delay: float,
+                search_depth: int = AlphaBetaBot.DEFAULT_DEPTH,
+                time_limit_ms: Union[None, int] = None,
+                playouts: int = DEFAULT_PLAYOUTS, workers: int = 1):
         """
         Args:
             n: the player's number (1 or 2)
-            player_type: "human", "random-bot", or "smart-bot"
+            player_type: "human", "random-bot", "smart-bot", 
+                "alphabeta-bot" or "mcts-bot"
             game: the Game object being used
             team: the team the player is on ("Black" or "Red")
             opponent_team: the other player's team
             bot_delay: When playing as a bot, the artificial delay before making
-                the next move (in seconds)
+                the next move (in seconds); the time spent searching counts
+                towards it
+            search_depth: number of moves an alphabeta bot searches ahead
+            time_limit_ms: time an alphabeta or mcts bot searches each move
+                for (in milliseconds), or None to search to search_depth (or 
+                run playouts playouts)
+            playouts: number of playouts an mcts bot runs per move, on each
+                worker
+            workers: number of processes an alphabeta or mcts bot searches 
+                on (0 for one per CPU)
         """
         self.game = game
         self.board = game.game_board
@@ -69,7 +84,21 @@ class TUIPlayer:
         elif player_type == "smart-bot":
             self.name = f"Smart Bot {player_num}"
             self.bot = SmartBot(game, team, opponent_team)
-
+        elif player_type == "alphabeta-bot":
+            self.name = f"Alpha-Beta Bot {player_num}"
+            self.bot = AlphaBetaBot(game, team, opponent_team, search_depth,
+                                    time_limit_ms, workers=workers)
+        elif player_type == "mcts-bot":
+            self.name = f"MCTS Bot {player_num}"
+            self.bot = MCTSBot(game, team, opponent_team, playouts,
+                               time_limit_ms, workers)
+
+    def close(self) -> None:
+        """
+        Stops the bot's worker processes, if it has any
+        """
+        if isinstance(self.bot, (AlphaBetaBot, MCTSBot)):
+            self.bot.close()
 
     def get_move(self) -> list:
         """
@@ -82,8 +111,9 @@ class TUIPlayer:
             tuple is the ending position (x, y)
         """
         if self.bot is not None:
-            time.sleep(self.bot_delay)
+            start = time.perf_counter()
             space = self.bot.suggest_move(self.game)
+            time.sleep(max(0, self.bot_delay - (time.perf_counter() - start)))
             # Print prompt with column already filled in
             print(Style.BRIGHT + f"{self.name}> " + Style.RESET_ALL 
                   + str(space[1]), str(space[0]))
@@ -297,26 +327,50 @@ def play_checkers(game:GameType, players: Dict[str, TUIPlayer]) -> None:
                               case_sensitive=False), default="real")
 @click.option('--num-piece-rows', type=click.INT, default=3)
 @click.option('--player1',
-            type=click.Choice(['human', 'random-bot', 'smart-bot'], 
+            type=click.Choice(['human', 'random-bot', 'smart-bot', 
+                               'alphabeta-bot', 'mcts-bot'], 
                               case_sensitive=False), default="human")
 @click.option('--player2',
-            type=click.Choice(['human', 'random-bot', 'smart-bot'], 
+            type=click.Choice(['human', 'random-bot', 'smart-bot', 
+                               'alphabeta-bot', 'mcts-bot'], 
                               case_sensitive=False), default="human")
 @click.option('--bot-delay', type=click.FLOAT, default=0.5)
-
-def cmd(mode, num_piece_rows, player1, player2, bot_delay):
+@click.option('--engine',
+            type=click.Choice(['grid', 'bitboard'],
+                              case_sensitive=False), default="grid")
+@click.option('--search-depth', type=click.INT, 
+              default=AlphaBetaBot.DEFAULT_DEPTH)
+@click.option('--bot-time', type=click.INT, default=None)
+@click.option('--playouts', type=click.INT, default=DEFAULT_PLAYOUTS)
+@click.option('--workers', type=click.INT, default=1)
+
+def cmd(mode, num_piece_rows, player1, player2, bot_delay, engine, 
+        search_depth, bot_time, playouts, workers):
     """
     Allows function to run from command line.
     Args:
         mode(str): what mode the game should run in (full/stub/mock)
         num-piece-rows(int): number of rows of pieces per team on the board
-        player1(str): player 1's type: either a human, smart bot, or random bot
-        player2(str): player 2's type: either a human, smart bot, or random bot
+        player1(str): player 1's type: either a human, smart bot, random bot,
+            alphabeta bot or mcts bot
+        player2(str): player 2's type: either a human, smart bot, random bot,
+            alphabeta bot or mcts bot
         bot_delay(float): if using bots, the delay in seconds between each bot's
             movements
+        engine(str): which game engine the real mode uses (grid/bitboard)
+        search_depth(int): number of moves alphabeta bots search ahead
+        bot_time(int): if given, the time in milliseconds alphabeta and mcts
+            bots search each move for (alphabeta bots deepen the search until 
+            it is up)
+        playouts(int): number of playouts mcts bots run per move, on each 
+            worker
+        workers(int): number of processes alphabeta and mcts bots search on
+            (0 for one per CPU)
     """
 
-    if mode == "real":
+    if mode == "real" and engine == "bitboard":
+        game = BitboardGame(num_piece_rows)
+    elif mode == "real":
         game = Game(num_piece_rows)
     elif mode == "stub":
         game = StubCheckerboard(num_piece_rows)
@@ -327,12 +381,18 @@ def cmd(mode, num_piece_rows, player1, player2, bot_delay):
         # implemented.
         game = MockGame(num_piece_rows)
 
-    player1 = TUIPlayer(1, player1, game, "Black", "Red", bot_delay)
-    player2 = TUIPlayer(2, player2, game, "Red", "Black", bot_delay)
+    player1 = TUIPlayer(1, player1, game, "Black", "Red", bot_delay, 
+                        search_depth, bot_time, playouts, workers)
+    player2 = TUIPlayer(2, player2, game, "Red", "Black", bot_delay, 
+                        search_depth, bot_time, playouts, workers)
 
     players = {"Black": player1, "Red": player2}
 
-    play_checkers(game, players)
+    try:
+        play_checkers(game, players)
+    finally:
+        player1.close()
+        player2.close()
 
 
 if __name__ == "__main__":